@@ -1,49 +1,69 @@
+import argparse
 import json
 import logging
 import os
 import sys
 import traceback
 import zipfile
+from typing import Optional
 
+from refiner.models.output import Output
 from refiner.refine import Refiner
+from refiner.transformer.base_transformer import ReusableEngine
 from refiner.config import settings
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 
-def run() -> None:
+def run(
+    input_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    encryption_key: Optional[str] = None,
+    engine: Optional[ReusableEngine] = None,
+    resume: Optional[bool] = None
+) -> Output:
     """Transform all input files into the database."""
-    input_files_exist = os.path.isdir(settings.INPUT_DIR) and bool(os.listdir(settings.INPUT_DIR))
+    input_dir = input_dir or settings.INPUT_DIR
+    output_dir = output_dir or settings.OUTPUT_DIR
+    input_files_exist = os.path.isdir(input_dir) and bool(os.listdir(input_dir))
 
     if not input_files_exist:
-        raise FileNotFoundError(f"No input files found in {settings.INPUT_DIR}")
-    extract_input()
+        raise FileNotFoundError(f"No input files found in {input_dir}")
+    extract_input(input_dir)
 
-    refiner = Refiner()
+    refiner = Refiner(input_dir, output_dir, encryption_key, engine, resume)
     output = refiner.transform()
     
-    output_path = os.path.join(settings.OUTPUT_DIR, "output.json")
+    output_path = os.path.join(output_dir, "output.json")
     with open(output_path, 'w') as f:
         json.dump(output.model_dump(), f, indent=2)    
     logging.info(f"Data transformation complete: {output}")
+    return output
 
 
-def extract_input() -> None:
+def extract_input(input_dir: Optional[str] = None) -> None:
     """
     If the input directory contains any zip files, extract them
+    :param input_dir: Directory to scan (defaults to INPUT_DIR)
     :return:
     """
-    for input_filename in os.listdir(settings.INPUT_DIR):
-        input_file = os.path.join(settings.INPUT_DIR, input_filename)
+    input_dir = input_dir or settings.INPUT_DIR
+    for input_filename in os.listdir(input_dir):
+        input_file = os.path.join(input_dir, input_filename)
 
         if zipfile.is_zipfile(input_file):
             with zipfile.ZipFile(input_file, 'r') as zip_ref:
-                zip_ref.extractall(settings.INPUT_DIR)
+                zip_ref.extractall(input_dir)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refine input files into an encrypted database")
+    parser.add_argument('--resume', action='store_true', default=None,
+                        help="Continue an interrupted run from its checkpoint journal")
+    args = parser.parse_args()
+
     try:
-        run()
+        run(resume=args.resume)
     except Exception as e:
         logging.error(f"Error during data transformation: {e}")
         traceback.print_exc()
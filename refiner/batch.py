@@ -0,0 +1,227 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from pydantic import ValidationError
+
+from refiner.config import settings
+from refiner.models.job import RefinementJob
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Worker held by each pool process, so its warm engine and HTTP session serve all of that process's jobs
+_worker = None
+
+
+def read_manifest(manifest_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream job entries from a manifest.
+
+    The manifest is JSON Lines, one RefinementJob per line: `input_dir` (a directory or a
+    single input file), `output_dir`, `encryption_key` and optionally `job_id`. Jobs without
+    an id are identified by their line number.
+
+    Args:
+        manifest_path: Path to the manifest
+
+    Yields:
+        Raw job entries
+    """
+    with open(manifest_path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {'job_id': str(line_number), 'error': f"Invalid manifest line: {e}"}
+                continue
+            entry.setdefault('job_id', str(line_number))
+            yield entry
+
+
+def _init_worker() -> None:
+    """Create the warm worker of a pool process."""
+    global _worker
+    from refiner.worker import RefinementWorker
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Jobs belong to different users, so they must not share a cross-run duplicate filter; the
+    # batch already warned about it once, so clear it before the worker would warn in every process
+    settings.DEDUP_FILTER_PATH = None
+    # Jobs already run in parallel, each one parses its own files
+    settings.PARSE_WORKERS = 0
+    _worker = RefinementWorker()
+
+
+def _run_job(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one manifest job in a pool process.
+    Any failure is captured in the result, so one bad job never affects the others.
+
+    Args:
+        entry: Raw job entry from the manifest
+
+    Returns:
+        Job result without the encryption key
+    """
+    result = {'job_id': entry.get('job_id')}
+    started = time.monotonic()
+    staging_dir = None
+    try:
+        job = RefinementJob.model_validate(entry)
+        if not job.encryption_key:
+            raise ValueError("Batch jobs require their own encryption_key")
+        result['output_dir'] = job.output_dir
+
+        # A single input file is refined from a private directory holding only that file
+        if os.path.isfile(job.input_dir):
+            staging_dir = tempfile.mkdtemp(prefix=f"refiner-{job.job_id}-")
+            os.symlink(os.path.abspath(job.input_dir), os.path.join(staging_dir, os.path.basename(job.input_dir)))
+            job = job.model_copy(update={'input_dir': staging_dir})
+
+        output = _worker.run_job(job)
+        result.update(status='succeeded', refinement_url=output.refinement_url)
+    except ValidationError as e:
+        error = e.errors()[0]
+        result.update(status='failed', error=f"Invalid job: {'.'.join(map(str, error['loc']))}: {error['msg']}")
+    except Exception as e:
+        result.update(status='failed', error=f"{type(e).__name__}: {e}")
+    finally:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    result['seconds'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def _failed_result(entry: Dict[str, Any], error: str, seconds: float = 0.0) -> Dict[str, Any]:
+    """Return the result of a job that failed outside of _run_job."""
+    return {'job_id': entry.get('job_id'), 'status': 'failed', 'error': error, 'seconds': round(seconds, 3)}
+
+
+def run_batch(manifest_path: str, results: TextIO, max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run all jobs of a manifest on a bounded pool of worker processes.
+
+    Every job writes its own db.libsql.pgp and output.json to its output directory.
+    The manifest is read lazily and at most two jobs per worker are queued at a time,
+    so memory stays flat for manifests of any length.
+
+    A job whose worker process dies (for example when it is killed for running out of
+    memory) breaks the whole pool, and every job still queued on it fails with it. The
+    pool is then rebuilt and those jobs are run again one at a time, so only the job
+    that takes its worker down again is recorded as failed.
+
+    Args:
+        manifest_path: Path to the JSON Lines manifest
+        results: Stream receiving one JSON result line per job, in completion order
+        max_workers: Number of worker processes (defaults to BATCH_WORKERS, or the CPU count)
+
+    Returns:
+        Counts of succeeded and failed jobs with the batch duration
+    """
+    max_workers = max_workers or settings.BATCH_WORKERS or os.cpu_count()
+    if settings.DEDUP_FILTER_PATH:
+        logging.warning("DEDUP_FILTER_PATH is ignored in batch mode, jobs belong to different users")
+
+    counts = {'succeeded': 0, 'failed': 0}
+    started = time.monotonic()
+
+    def record(result: Dict[str, Any]) -> None:
+        counts[result['status']] += 1
+        results.write(json.dumps(result) + '\n')
+        results.flush()
+        if result['status'] == 'failed':
+            logging.warning(f"Job {result['job_id']} failed: {result['error']}")
+
+    executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+    # Manifest entry of every job submitted but not yet recorded
+    pending: Dict[Future, Dict[str, Any]] = {}
+
+    def settle(futures: Iterable[Future]) -> List[Dict[str, Any]]:
+        """Record finished jobs, returning the entries of jobs lost with a broken pool."""
+        crashed = []
+        for future in futures:
+            entry = pending.pop(future)
+            try:
+                record(future.result())
+            except BrokenProcessPool:
+                crashed.append(entry)
+            except Exception as e:
+                record(_failed_result(entry, f"{type(e).__name__}: {e}"))
+        return crashed
+
+    def collect() -> None:
+        nonlocal executor
+        crashed = settle(wait(pending, return_when=FIRST_COMPLETED).done)
+        if not crashed:
+            return
+
+        # A dead worker fails every job still on the pool, jobs that finished before are kept
+        crashed.extend(settle(wait(pending).done))
+        executor.shutdown(wait=True)
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        logging.warning(f"A worker process died, running {len(crashed)} interrupted jobs again one at a time")
+        for entry in crashed:
+            job_started = time.monotonic()
+            try:
+                record(executor.submit(_run_job, entry).result())
+            except BrokenProcessPool:
+                seconds = time.monotonic() - job_started
+                record(_failed_result(entry, "Worker process died while running the job", seconds))
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+
+    try:
+        for entry in read_manifest(manifest_path):
+            if 'error' in entry:
+                record(_failed_result(entry, entry['error']))
+                continue
+            if len(pending) >= max_workers * 2:
+                collect()
+            pending[executor.submit(_run_job, entry)] = entry
+        while pending:
+            collect()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    seconds = time.monotonic() - started
+    total = counts['succeeded'] + counts['failed']
+    return {
+        **counts,
+        'jobs': total,
+        'seconds': round(seconds, 3),
+        'jobs_per_second': round(total / seconds, 3) if seconds else 0.0,
+    }
+
+
+# Run with: python -m refiner.batch manifest.jsonl --workers 8 --results results.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many refinement jobs, each with its own key, in one invocation")
+    parser.add_argument('manifest', help="JSON Lines manifest of jobs (input_dir, output_dir, encryption_key, job_id)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--results', default=None, help="File receiving one JSON result per job (defaults to stdout)")
+    args = parser.parse_args()
+
+    try:
+        if args.results:
+            with open(args.results, 'w') as results_file:
+                summary = run_batch(args.manifest, results_file, args.workers)
+        else:
+            summary = run_batch(args.manifest, sys.stdout, args.workers)
+        logging.info(f"Batch complete: {json.dumps(summary)}")
+        sys.exit(1 if summary['failed'] else 0)
+    except Exception as e:
+        logging.error(f"Batch failed: {e}")
+        traceback.print_exc()
+        sys.exit(2)
@@ -0,0 +1,187 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from refiner.utils.ipfs import PINATA_FILE_API_PATH, PINATA_JSON_API_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Bytes of a request body read between bandwidth checks
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class FakePinningServer:
+    """
+    Local stand-in for the Pinata pinning API used in load tests.
+
+    Implements pinFileToIPFS and pinJSONToIPFS and answers with a content-derived
+    IpfsHash. Every request is delayed by a configurable latency, request bodies are
+    read no faster than the configured bandwidth, and a configurable share of
+    requests fails with HTTP 500. Requests are served concurrently.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        bandwidth: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            host: Interface to bind
+            port: Port to listen on, 0 picks a free port
+            latency: Seconds added to every response
+            jitter: Maximum random seconds added on top of the latency
+            error_rate: Fraction of requests answered with HTTP 500
+            bandwidth: Maximum upload rate in bytes per second, unlimited if None
+            seed: Optional seed for latency jitter and injected errors
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bandwidth = bandwidth
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as PINATA_API_URL."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self) -> Tuple[float, bool]:
+        """Draw the delay and failure of one request."""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            self.requests += 1
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _handler(self):
+        pinning_server = self
+
+        class PinningRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, status: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _read_body(self) -> bytes:
+                remaining = int(self.headers.get('Content-Length', 0))
+                digest = hashlib.sha256()
+                started = time.monotonic()
+                received = 0
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, READ_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    remaining -= len(chunk)
+                    received += len(chunk)
+                    if pinning_server.bandwidth:
+                        # Sleep until the bytes received so far fit the bandwidth
+                        ahead = received / pinning_server.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                with pinning_server._lock:
+                    pinning_server.bytes_received += received
+                return digest.digest()
+
+            def do_POST(self):
+                if self.path not in (PINATA_FILE_API_PATH, PINATA_JSON_API_PATH):
+                    self._respond(404, {'error': 'Not found'})
+                    return
+                if not self.headers.get('pinata_api_key') or not self.headers.get('pinata_secret_api_key'):
+                    self._respond(401, {'error': 'Missing API credentials'})
+                    return
+
+                content_digest = self._read_body()
+                delay, failed = pinning_server._draw()
+                time.sleep(delay)
+                if failed:
+                    self._respond(500, {'error': 'Injected failure'})
+                    return
+
+                size = int(self.headers.get('Content-Length', 0))
+                self._respond(200, {
+                    'IpfsHash': 'Qm' + base64.b32encode(content_digest).decode().rstrip('=').lower()[:44],
+                    'PinSize': size,
+                    'Timestamp': datetime.now(timezone.utc).isoformat(),
+                })
+
+            def log_message(self, format, *args):
+                pass
+
+        return PinningRequestHandler
+
+    def start(self) -> 'FakePinningServer':
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        """Return request counters."""
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'bytes_received': self.bytes_received}
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the fake server's latency, error and bandwidth options to a parser."""
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random seconds added to the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail with HTTP 500")
+    parser.add_argument('--bandwidth', type=float, default=None, help="Maximum upload rate in bytes per second")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for jitter and injected errors")
+
+
+# Run with: python -m refiner.bench.fake_pinning --port 8081 --latency 0.2 --error-rate 0.01
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Pinata pinning API")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind")
+    parser.add_argument('--port', type=int, default=8081, help="Port to listen on")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakePinningServer(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.bandwidth, args.seed
+    )
+    logging.info(f"Fake pinning service listening on {server.url}, set PINATA_API_URL={server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info(f"Stopped: {server.stats()}")
+    finally:
+        server.server_close()
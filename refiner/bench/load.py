@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from refiner.bench.fake_pinning import FakePinningServer, add_server_arguments
+from refiner.config import settings
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def _init_worker(api_url: str) -> None:
+    """Point a worker process at the pinning service and silence per-job logging; errors are summarized."""
+    settings.PINATA_API_URL = api_url
+    settings.PINATA_API_KEY = settings.PINATA_API_KEY or 'load-test'
+    settings.PINATA_API_SECRET = settings.PINATA_API_SECRET or 'load-test'
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+
+def _run_job(input_dir: str, job_dir: str, encryption_key: str) -> Tuple[float, Optional[str]]:
+    """
+    Run one end-to-end refinement (extract, transform, encrypt, upload) in a fresh job directory.
+
+    Returns:
+        Tuple of (job latency in seconds, error message or None)
+    """
+    from refiner.__main__ import run
+
+    job_input_dir = os.path.join(job_dir, 'input')
+    job_output_dir = os.path.join(job_dir, 'output')
+    shutil.copytree(input_dir, job_input_dir)
+    os.makedirs(job_output_dir)
+
+    started = time.perf_counter()
+    try:
+        run(job_input_dir, job_output_dir, encryption_key)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - started
+    shutil.rmtree(job_dir, ignore_errors=True)
+    return latency, error
+
+
+def summarize_latencies(latencies: List[float], errors: List[str], wall_seconds: float) -> Dict[str, Any]:
+    """
+    Summarize the job latencies of a load test.
+
+    Args:
+        latencies: Latencies of the successful jobs in seconds
+        errors: Error messages of the failed jobs
+        wall_seconds: Wall-clock duration of the test
+
+    Returns:
+        Job counts, throughput and latency percentiles
+    """
+    summary = {
+        'jobs': len(latencies) + len(errors),
+        'succeeded': len(latencies),
+        'failed': len(errors),
+        'wall_seconds': round(wall_seconds, 3),
+        'jobs_per_second': round(len(latencies) / wall_seconds, 3) if wall_seconds else 0.0,
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(np.asarray(latencies), [50, 95, 99])
+        summary.update({
+            'latency_p50': round(float(p50), 4),
+            'latency_p95': round(float(p95), 4),
+            'latency_p99': round(float(p99), 4),
+            'latency_max': round(max(latencies), 4),
+        })
+    if errors:
+        # Group identical errors so a failing run doesn't print one line per job
+        summary['errors'] = {message: errors.count(message) for message in sorted(set(errors))}
+    return summary
+
+
+def run_load_test(
+    input_dir: str,
+    jobs: int,
+    concurrency: int,
+    api_url: str,
+    encryption_key: str,
+    work_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run many end-to-end refinements in parallel worker processes.
+
+    Args:
+        input_dir: Input directory copied into every job
+        jobs: Number of refinements to run
+        concurrency: Number of refinements running at the same time
+        api_url: Base URL of the pinning service
+        encryption_key: Key to encrypt the refinements with
+        work_dir: Directory for job files (defaults to a temporary directory)
+
+    Returns:
+        Load test summary
+    """
+    root = work_dir or tempfile.mkdtemp(prefix='refiner-load-')
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker, initargs=(api_url,)) as executor:
+        futures = [
+            executor.submit(_run_job, input_dir, os.path.join(root, f'job-{index}'), encryption_key)
+            for index in range(jobs)
+        ]
+        for future in as_completed(futures):
+            latency, error = future.result()
+            if error:
+                errors.append(error)
+            else:
+                latencies.append(latency)
+    wall_seconds = time.perf_counter() - started
+
+    if not work_dir:
+        shutil.rmtree(root, ignore_errors=True)
+    return summarize_latencies(latencies, errors, wall_seconds)
+
+
+# Run with: python -m refiner.bench.load --jobs 200 --concurrency 8 --latency 0.2 --error-rate 0.01
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test end-to-end refinements against a local pinning service")
+    parser.add_argument('--input-dir', default=settings.INPUT_DIR, help="Input directory copied into every job")
+    parser.add_argument('--jobs', type=int, default=50, help="Number of refinements to run")
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count(), help="Refinements running at the same time")
+    parser.add_argument('--api-url', default=None, help="Use this pinning service instead of starting a local one")
+    parser.add_argument('--work-dir', default=None, help="Directory for job files (defaults to a temporary directory)")
+    parser.add_argument('--output', default=None, help="Also write the summary to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    api_url = args.api_url
+    if not api_url:
+        server = FakePinningServer(
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            bandwidth=args.bandwidth, seed=args.seed
+        ).start()
+        api_url = server.url
+
+    try:
+        summary = run_load_test(
+            args.input_dir, args.jobs, args.concurrency, api_url,
+            settings.REFINEMENT_ENCRYPTION_KEY or 'load-test', args.work_dir
+        )
+        if server:
+            summary['pinning_service'] = server.stats()
+    finally:
+        if server:
+            server.stop()
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
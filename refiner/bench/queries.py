@@ -0,0 +1,355 @@
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from refiner.config import settings
+from refiner.transformer.credit_statement_transformer import CreditStatementTransformer
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'input', 'credit_statement.json')
+
+CATEGORIES = ('FOOD', 'SHOPPING', 'TRANSPORT', 'TRAVEL', 'ENTERTAINMENT', 'UTILITIES', 'HEALTH', 'GROCERIES')
+FRAUD_INDICATORS = ('velocity_spike', 'new_merchant_burst', 'foreign_atm', 'card_testing', 'odd_hours')
+
+# Representative downstream queries, written against the union of all attached refinements.
+# Parameters are filled from the synthetic data so every query selects real rows.
+QUERY_CATALOG = {
+    'spend_by_category': """
+        SELECT category_primary, COUNT(*), SUM(amount) FROM transactions
+        GROUP BY category_primary
+    """,
+    'date_range_total': """
+        SELECT COUNT(*), SUM(amount) FROM transactions
+        WHERE transaction_date BETWEEN :start_date AND :end_date
+    """,
+    'statement_date_range': """
+        SELECT COUNT(*), SUM(amount) FROM transactions
+        WHERE record_id = :record_id AND transaction_date BETWEEN :start_date AND :end_date
+    """,
+    'statement_transactions': """
+        SELECT transaction_date, amount, merchant_id FROM transactions
+        WHERE record_id = :record_id ORDER BY transaction_date
+    """,
+    'transaction_lookup': """
+        SELECT * FROM transactions WHERE transaction_id = :transaction_id
+    """,
+    'top_merchants': """
+        SELECT merchant_id, SUM(amount) AS spent FROM transactions
+        GROUP BY merchant_id ORDER BY spent DESC LIMIT 10
+    """,
+    'monthly_category_spend': """
+        SELECT strftime('%Y-%m', transaction_date) AS month, SUM(amount) FROM transactions
+        WHERE category_primary = :category GROUP BY month
+    """,
+    'utilization_by_brand': """
+        SELECT a.card_brand, AVG(f.closing_balance / a.credit_limit) FROM statements s
+        JOIN financial_summaries f ON f.record_id = s.record_id
+        JOIN account_info a ON a.record_id = s.record_id
+        GROUP BY a.card_brand
+    """,
+    'category_breakdown_json': """
+        SELECT c.key, SUM(json_extract(c.value, '$.amount')) FROM spending_patterns p,
+        json_each(p.category_breakdown) c GROUP BY c.key
+    """,
+    'fraud_indicator_json': """
+        SELECT f.value, COUNT(*) FROM risk_metrics r, json_each(r.fraud_indicators) f
+        GROUP BY f.value
+    """,
+    'category_breakdown_normalized': """
+        SELECT category, SUM(value) FROM spending_categories WHERE metric = 'amount'
+        GROUP BY category
+    """,
+    'fraud_indicator_normalized': """
+        SELECT indicator, COUNT(*) FROM fraud_indicators GROUP BY indicator
+    """,
+}
+
+
+def read_bytes() -> Optional[int]:
+    """Return the bytes this process has read through read syscalls, None where /proc is unavailable."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def synthetic_statements(
+    template: Dict[str, Any],
+    refinement: int,
+    transactions: int,
+    months: int = 12,
+    merchants: int = 200,
+    rng: Optional[random.Random] = None
+) -> List[Dict[str, Any]]:
+    """
+    Generate the monthly statements of one synthetic refinement.
+
+    Args:
+        template: Statement used for the fields that are not generated
+        refinement: Index of the refinement, used in record and transaction IDs
+        transactions: Number of transactions over all statements
+        months: Number of monthly statements, starting January 2024
+        merchants: Size of the merchant pool
+        rng: Random generator
+
+    Returns:
+        Raw statements as read from input files
+    """
+    rng = rng or random.Random(refinement)
+    statements = []
+    per_month = [transactions // months + (1 if month < transactions % months else 0) for month in range(months)]
+    for month in range(months):
+        start = date(2024 + month // 12, month % 12 + 1, 1)
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        record_id = f"stmt_{refinement}_{month:02d}"
+
+        statement = copy.deepcopy(template)
+        statement['statement_metadata'].update({
+            'record_id': record_id,
+            'statement_date': end.isoformat(),
+            'statement_period': {'start_date': start.isoformat(), 'end_date': end.isoformat()},
+            'days_in_period': end.day,
+            'payment_due_date': (end + timedelta(days=25)).isoformat(),
+        })
+
+        breakdown: Dict[str, Dict[str, float]] = {}
+        statement_transactions = []
+        for index in range(per_month[month]):
+            merchant = rng.randrange(merchants)
+            category = CATEGORIES[merchant % len(CATEGORIES)]
+            day = start + timedelta(days=rng.randrange(end.day))
+            amount = round(rng.lognormvariate(3.5, 1.0), 2)
+            statement_transactions.append({
+                'transaction_id': f"txn_{refinement}_{month:02d}_{index}",
+                'transaction_date': day.isoformat(),
+                'posting_date': day.isoformat(),
+                'description': f"MERCHANT {merchant} STORE #{merchant * 7 % 1000}",
+                'amount': amount,
+                'transaction_type': 'PURCHASE',
+                'day_of_week': day.isoweekday(),
+                'day_of_month': day.day,
+                'is_weekend': day.isoweekday() > 5,
+                'merchant_name': f"Merchant {merchant}",
+                'merchant_id': f"merch_{merchant}",
+                'category_primary': category,
+                'channel': 'POS' if merchant % 3 else 'ONLINE',
+                'is_recurring': merchant % 10 == 0,
+            })
+            totals = breakdown.setdefault(category, {'count': 0, 'amount': 0.0})
+            totals['count'] += 1
+            totals['amount'] = round(totals['amount'] + amount, 2)
+
+        statement['transactions'] = statement_transactions
+        statement['spending_patterns']['total_transactions'] = len(statement_transactions)
+        statement['spending_patterns']['category_distribution'] = breakdown
+        statement['risk_metrics']['fraud_indicators'] = rng.sample(FRAUD_INDICATORS, rng.randrange(3))
+        statements.append(statement)
+    return statements
+
+
+def build_refinements(
+    template: Dict[str, Any],
+    output_dir: str,
+    refinements: int,
+    transactions: int,
+    seed: int = 0
+) -> List[str]:
+    """
+    Build refined databases from synthetic statements with the current settings.
+
+    Args:
+        template: Statement used for the fields that are not generated
+        output_dir: Directory the databases are written to
+        refinements: Number of databases to build
+        transactions: Transactions per database
+        seed: Seed of the synthetic data
+
+    Returns:
+        Paths of the databases
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for refinement in range(refinements):
+        db_path = os.path.join(output_dir, f"refinement-{refinement}.libsql")
+        transformer = CreditStatementTransformer(db_path)
+        for statement in synthetic_statements(template, refinement, transactions, rng=random.Random(seed + refinement)):
+            transformer.process(statement)
+        transformer.engine.dispose()
+        paths.append(db_path)
+    return paths
+
+
+def connect_refinements(db_paths: List[str]) -> sqlite3.Connection:
+    """
+    Attach refined databases read-only and expose every table as a view over all of them.
+
+    Args:
+        db_paths: Paths of the refined databases
+
+    Returns:
+        Connection whose unqualified table names span all refinements
+    """
+    connection = sqlite3.connect(':memory:', uri=True)
+    for index, db_path in enumerate(db_paths):
+        connection.execute(f"ATTACH DATABASE ? AS r{index}", (f"file:{os.path.abspath(db_path)}?mode=ro",))
+
+    tables = [row[0] for row in connection.execute("SELECT name FROM r0.sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        union = ' UNION ALL '.join(f"SELECT * FROM r{index}.{table}" for index in range(len(db_paths)))
+        connection.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return connection
+
+
+def replay_queries(
+    db_paths: List[str],
+    parameters: Dict[str, Any],
+    repeats: int = 5,
+    catalog: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Replay the query catalog against attached refinements.
+
+    Every run uses a new connection, so SQLite's page cache starts empty and the pages
+    read are the pages the query plan touches.
+
+    Args:
+        db_paths: Paths of the refined databases
+        parameters: Named query parameters
+        repeats: Runs per query
+        catalog: Queries by name (defaults to QUERY_CATALOG)
+
+    Returns:
+        Latency percentiles in milliseconds, pages read and result rows per query
+    """
+    catalog = catalog or QUERY_CATALOG
+    page_size = sqlite3.connect(db_paths[0]).execute("PRAGMA page_size").fetchone()[0]
+    results = {}
+    for name, sql in catalog.items():
+        latencies = []
+        pages = []
+        rows = 0
+        try:
+            for _ in range(repeats):
+                connection = connect_refinements(db_paths)
+                before = read_bytes()
+                started = time.perf_counter()
+                rows = len(connection.execute(sql, parameters).fetchall())
+                latencies.append(time.perf_counter() - started)
+                after = read_bytes()
+                if before is not None and after is not None:
+                    pages.append((after - before) / page_size)
+                connection.close()
+        except sqlite3.OperationalError as e:
+            # Queries on tables this layout doesn't create, e.g. the normalized child tables
+            results[name] = {'error': str(e)}
+            continue
+
+        p50, p95 = np.percentile(np.asarray(latencies) * 1000, [50, 95])
+        results[name] = {
+            'latency_p50_ms': round(float(p50), 3),
+            'latency_p95_ms': round(float(p95), 3),
+            'pages_read': round(float(np.median(pages))) if pages else None,
+            'rows': rows,
+        }
+    return results
+
+
+def run_query_benchmark(
+    scales: List[int],
+    refinements: int,
+    repeats: int = 5,
+    work_dir: Optional[str] = None,
+    seed: int = 0,
+    template_path: str = TEMPLATE_PATH
+) -> Dict[str, Any]:
+    """
+    Build synthetic refinements at several scales and replay the query catalog against them.
+
+    Args:
+        scales: Transactions per refinement, one benchmark per value
+        refinements: Number of refinements attached together
+        repeats: Runs per query
+        work_dir: Directory for the databases (defaults to a temporary directory)
+        seed: Seed of the synthetic data
+        template_path: Statement used for the fields that are not generated
+
+    Returns:
+        Benchmark report
+    """
+    attach_limit = sqlite3.connect(':memory:').getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if refinements > attach_limit:
+        logging.warning(f"SQLite attaches at most {attach_limit} databases, using {attach_limit} refinements")
+        refinements = attach_limit
+
+    with open(template_path, 'r') as f:
+        template = json.load(f)
+
+    root = work_dir or tempfile.mkdtemp(prefix='refiner-queries-')
+    report = {
+        'layout': {
+            'CLUSTERED_TRANSACTIONS': settings.CLUSTERED_TRANSACTIONS,
+            'NORMALIZE_JSON_COLUMNS': settings.NORMALIZE_JSON_COLUMNS,
+        },
+        'refinements': refinements,
+        'scales': [],
+    }
+    try:
+        for transactions in scales:
+            started = time.perf_counter()
+            db_paths = build_refinements(template, os.path.join(root, str(transactions)), refinements, transactions, seed)
+            build_seconds = time.perf_counter() - started
+            logging.info(f"Built {refinements} refinements of {transactions} transactions in {build_seconds:.1f}s")
+
+            parameters = {
+                'start_date': '2024-03-01',
+                'end_date': '2024-03-14',
+                'record_id': 'stmt_0_02',
+                'transaction_id': f"txn_0_02_{transactions // 24}",
+                'category': CATEGORIES[0],
+            }
+            report['scales'].append({
+                'transactions_per_refinement': transactions,
+                'db_bytes': sum(os.path.getsize(path) for path in db_paths),
+                'build_seconds': round(build_seconds, 3),
+                'queries': replay_queries(db_paths, parameters, repeats),
+            })
+    finally:
+        if not work_dir:
+            shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+# Run with: python -m refiner.bench.queries --scales 1000 10000 --refinements 8
+# Compare layouts by re-running with e.g. CLUSTERED_TRANSACTIONS=true or NORMALIZE_JSON_COLUMNS=true
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay representative queries against synthetic refined databases")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000], help="Transactions per refinement")
+    parser.add_argument('--refinements', type=int, default=8, help="Refinements attached together")
+    parser.add_argument('--repeats', type=int, default=5, help="Runs per query")
+    parser.add_argument('--work-dir', default=None, help="Keep the databases in this directory")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument('--template', default=TEMPLATE_PATH, help="Statement used for the fields that are not generated")
+    parser.add_argument('--output', default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = run_query_benchmark(args.scales, args.refinements, args.repeats, args.work_dir, args.seed, args.template)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -15,7 +15,7 @@ class Settings(BaseSettings):
         description="Directory where output files will be written"
     )
     
-    REFINEMENT_ENCRYPTION_KEY: str = Field(
+    REFINEMENT_ENCRYPTION_KEY: Optional[str] = Field(
         default=None,
         description="Key to symmetrically encrypt the refinement. This is derived from the original file encryption key"
     )
@@ -89,6 +89,32 @@ class Settings(BaseSettings):
         description="Minimum transaction amount for validation"
     )
     
+    ENABLE_QUALITY_GATE: bool = Field(
+        default=True,
+        description="Reject statements whose quality score is below MIN_QUALITY_SCORE before they are written to the database"
+    )
+    
+    # Duplicate Transaction Configuration
+    DUPLICATE_POLICY: str = Field(
+        default="drop",
+        description="How duplicate transaction IDs are handled (drop keeps the first occurrence, merge lets later non-null values override earlier ones)"
+    )
+    
+    DEDUP_FILTER_PATH: Optional[str] = Field(
+        default=None,
+        description="Optional path of a persisted bloom filter of transaction IDs used to detect duplicates across runs"
+    )
+    
+    DEDUP_FILTER_CAPACITY: int = Field(
+        default=10000000,
+        description="Expected number of transaction IDs in the cross-run bloom filter"
+    )
+    
+    DEDUP_FILTER_ERROR_RATE: float = Field(
+        default=0.001,
+        description="False positive rate of the cross-run bloom filter. With the drop policy, this fraction of new transactions may be dropped"
+    )
+    
     # Privacy Configuration
     ANONYMIZATION_METHOD: str = Field(
         default="k_anonymity",
@@ -105,11 +131,51 @@ class Settings(BaseSettings):
         description="K-value for k-anonymity privacy preservation"
     )
     
+    PSEUDONYMIZATION_SECRET: Optional[str] = Field(
+        default=None,
+        description="Per-DLP secret for keyed BLAKE2b pseudonymization of identifiers. Pseudonymization is disabled when unset"
+    )
+    
+    PSEUDONYMIZE_FIELDS: List[str] = Field(
+        default=["merchant_id", "card_identifier", "location"],
+        description="Identifier fields replaced with keyed pseudonyms when PSEUDONYMIZATION_SECRET is set. Locations keep their city/state"
+    )
+    
+    PSEUDONYMIZATION_DIGEST_SIZE: int = Field(
+        default=16,
+        description="Length in bytes (1-64) of pseudonym digests; pseudonyms are hex encoded at twice this length"
+    )
+    
+    PSEUDONYMIZATION_CACHE_SIZE: int = Field(
+        default=100000,
+        description="Maximum number of pseudonyms cached per run for repeated values"
+    )
+    
     DIFFERENTIAL_PRIVACY_EPSILON: float = Field(
         default=1.0,
         description="Epsilon value for differential privacy"
     )
     
+    DP_NOISE_MECHANISM: str = Field(
+        default="laplace",
+        description="Noise mechanism used when ANONYMIZATION_METHOD is differential_privacy (laplace, gaussian)"
+    )
+    
+    DP_DELTA: float = Field(
+        default=1e-5,
+        description="Delta value for the gaussian differential privacy mechanism, spent once per noised column"
+    )
+    
+    DP_AMOUNT_SENSITIVITY: float = Field(
+        default=100.0,
+        description="Sensitivity assumed for monetary columns when adding differential privacy noise"
+    )
+    
+    DP_NOISE_SEED: Optional[int] = Field(
+        default=None,
+        description="Seed for differential privacy noise, for reproducible tests only. Leave unset in production"
+    )
+    
     # Processing Configuration
     BATCH_SIZE: int = Field(
         default=1000,
@@ -118,7 +184,12 @@ class Settings(BaseSettings):
     
     MAX_MEMORY_USAGE_MB: int = Field(
         default=512,
-        description="Maximum memory usage in MB for processing"
+        description="Maximum memory usage in MB for processing, parse worker processes included"
+    )
+    
+    MEMORY_TRACEMALLOC: bool = Field(
+        default=False,
+        description="Track Python heap allocations with tracemalloc in addition to RSS (adds CPU overhead)"
     )
     
     ENABLE_STREAMING: bool = Field(
@@ -126,6 +197,137 @@ class Settings(BaseSettings):
         description="Enable streaming processing for large datasets"
     )
     
+    STREAMING_THRESHOLD_MB: float = Field(
+        default=64.0,
+        description="Input files larger than this are validated as they are read instead of being loaded whole, when ENABLE_STREAMING is set"
+    )
+    
+    PLAN_SMALL_FILE_TRANSACTIONS: int = Field(
+        default=100,
+        description="Input files estimated to hold at most this many transactions are written together with neighbouring small files in one commit"
+    )
+    
+    PLAN_GROUP_TRANSACTIONS: int = Field(
+        default=1000,
+        description="Estimated transactions per shared commit of small input files"
+    )
+    
+    # Worker Mode Configuration
+    WORKER_SPOOL_DIR: Optional[str] = Field(
+        default=None,
+        description="Spool directory the long-running worker takes job files from (python -m refiner.worker)"
+    )
+    
+    WORKER_POLL_INTERVAL: float = Field(
+        default=1.0,
+        description="Seconds the worker waits between scans of an empty spool directory"
+    )
+    
+    WORKER_HTTP_HOST: str = Field(
+        default="127.0.0.1",
+        description="Interface the worker's local HTTP job endpoint binds to"
+    )
+    
+    WORKER_HTTP_PORT: Optional[int] = Field(
+        default=None,
+        description="Port of the worker's local HTTP job endpoint"
+    )
+    
+    PII_AUDIT_MAX_EXAMPLES: int = Field(
+        default=20,
+        description="Number of sampled PII detections kept in the audit summary"
+    )
+    
+    PII_AUDIT_LOG_INTERVAL: float = Field(
+        default=10.0,
+        description="Minimum seconds between PII audit progress log lines"
+    )
+    
+    PII_AUDIT_IN_OUTPUT: bool = Field(
+        default=False,
+        description="Include the PII audit summary in output.json"
+    )
+    
+    ENABLE_MERCHANT_ENRICHMENT: bool = Field(
+        default=False,
+        description="Canonicalize merchant names and fill missing primary categories from the merchant dictionary"
+    )
+    
+    MERCHANT_DICTIONARY_PATH: Optional[str] = Field(
+        default=None,
+        description="JSON merchant dictionary of names, categories and patterns (defaults to the bundled refiner/data/merchants.json)"
+    )
+    
+    MERCHANT_INDEX_PATH: Optional[str] = Field(
+        default=None,
+        description="Compiled, memory-mapped merchant index, rebuilt when the dictionary changes (defaults to the dictionary path with .idx)"
+    )
+    
+    STATISTICS_GRANULARITY: str = Field(
+        default="coarse",
+        description="Granularity of the statistics manifest in output.json: none, coarse (month dates, bucketed amounts, Bloom filters of pseudonymized columns only) or exact"
+    )
+    
+    STATISTICS_DISTINCT_LIMIT: int = Field(
+        default=64,
+        description="Largest value set listed explicitly in an exact statistics manifest, larger sets are published as Bloom filters"
+    )
+    
+    STATISTICS_BLOOM_ERROR_RATE: float = Field(
+        default=0.01,
+        description="False positive rate of the Bloom filters in the statistics manifest"
+    )
+    
+    STATISTICS_AMOUNT_BUCKET: float = Field(
+        default=100.0,
+        description="Bucket width that amount ranges are widened to in a coarse statistics manifest"
+    )
+    
+    VERIFY_ENCRYPTION: bool = Field(
+        default=True,
+        description="Stream-decrypt the encrypted database before upload and check it against the hash of the built database"
+    )
+    
+    BATCH_WORKERS: Optional[int] = Field(
+        default=None,
+        description="Worker processes of python -m refiner.batch (defaults to the CPU count)"
+    )
+    
+    PARSE_WORKERS: int = Field(
+        default=0,
+        description="Processes parsing, validating and sanitizing input files while the main process writes the database (0 parses in the main process)"
+    )
+    
+    PARSE_QUEUE_SIZE: Optional[int] = Field(
+        default=None,
+        description="Parsed input files held for the database writer at a time (defaults to twice PARSE_WORKERS)"
+    )
+    
+    RESUME_FROM_CHECKPOINT: bool = Field(
+        default=False,
+        description="Continue an interrupted refinement from the checkpoint journal in the output directory"
+    )
+    
+    CLUSTERED_TRANSACTIONS: bool = Field(
+        default=False,
+        description="Store transactions in a WITHOUT ROWID table clustered by (record_id, transaction_date) and insert them in that order"
+    )
+    
+    NORMALIZE_JSON_COLUMNS: bool = Field(
+        default=False,
+        description="Also flatten the JSON columns into narrow, indexed child tables"
+    )
+    
+    ENABLE_COLUMNAR_EXPORT: bool = Field(
+        default=False,
+        description="Also export the refined tables to encrypted Parquet files (requires pyarrow)"
+    )
+    
+    COLUMNAR_EXPORT_COMPRESSION: str = Field(
+        default="zstd",
+        description="Compression codec of the Parquet export: zstd, snappy, gzip or none"
+    )
+    
     # Input Format Configuration
     SUPPORTED_INPUT_FORMATS: List[str] = Field(
         default=["json", "zip", "csv"],
@@ -147,6 +349,11 @@ class Settings(BaseSettings):
         default=None,
         description="Pinata API secret"
     )
+    
+    PINATA_API_URL: str = Field(
+        default="https://api.pinata.cloud",
+        description="Base URL of the Pinata-compatible pinning API, e.g. a local stand-in for load tests"
+    )
 
     IPFS_GATEWAY_URL: str = Field(
         default="https://gray-active-shark-225.mypinata.cloud/ipfs",
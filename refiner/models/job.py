@@ -0,0 +1,9 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class RefinementJob(BaseModel):
+    input_dir: str
+    output_dir: str
+    encryption_key: Optional[str] = None  # Falls back to REFINEMENT_ENCRYPTION_KEY
+    job_id: Optional[str] = None
+    resume: Optional[bool] = None  # Falls back to RESUME_FROM_CHECKPOINT
\ No newline at end of file
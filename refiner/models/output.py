@@ -1,8 +1,16 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic import BaseModel
 
 from refiner.models.offchain_schema import OffChainSchema
 
 class Output(BaseModel):
     refinement_url: Optional[str] = None
-    schema: Optional[OffChainSchema] = None
\ No newline at end of file
+    statistics: Optional[Dict[str, Any]] = None
+    schema: Optional[OffChainSchema] = None
+    privacy_budget: Optional[Dict[str, Any]] = None
+    quality: Optional[Dict[str, Any]] = None
+    deduplication: Optional[Dict[str, Any]] = None
+    memory: Optional[Dict[str, Any]] = None
+    columnar_exports: Optional[Dict[str, str]] = None
+    integrity: Optional[Dict[str, Any]] = None
+    pii_audit: Optional[Dict[str, Any]] = None
\ No newline at end of file
@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, ForeignKey, DateTime, Date, Boolean, JSON, Text
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, DateTime, Date, Boolean, JSON, Text, Index, PrimaryKeyConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from refiner.config import settings
 
 # Base model for SQLAlchemy
 Base = declarative_base()
@@ -65,7 +66,7 @@ class FinancialSummary(Base):
 class TransactionRecord(Base):
     __tablename__ = 'transactions'
     
-    transaction_id = Column(String, primary_key=True)
+    transaction_id = Column(String, primary_key=not settings.CLUSTERED_TRANSACTIONS)
     record_id = Column(String, ForeignKey('statements.record_id'), nullable=False)
     transaction_date = Column(Date, nullable=False)
     posting_date = Column(Date, nullable=True)
@@ -90,6 +91,16 @@ class TransactionRecord(Base):
     payment_method = Column(String, nullable=True)
     
     statement = relationship("StatementRecord", back_populates="transactions")
+    
+    if settings.CLUSTERED_TRANSACTIONS:
+        # Cluster rows by statement and date in a WITHOUT ROWID table so range scans read contiguous pages.
+        # The ORM still identifies rows by transaction_id, which a unique index keeps unique and fast to look up.
+        __table_args__ = (
+            PrimaryKeyConstraint('record_id', 'transaction_date', 'transaction_id'),
+            Index('ix_transactions_transaction_id', 'transaction_id', unique=True),
+            {'sqlite_with_rowid': False},
+        )
+        __mapper_args__ = {'primary_key': [transaction_id]}
 
 class SpendingPattern(Base):
     __tablename__ = 'spending_patterns'
@@ -128,3 +139,84 @@ class EngineeredFeature(Base):
     geographic_spending_patterns = Column(JSON, nullable=True)
     
     statement = relationship("StatementRecord", back_populates="engineered_features")
+
+
+# Narrow child tables flattened from the JSON columns above, created when NORMALIZE_JSON_COLUMNS is enabled.
+# Nested values are stored one leaf per row: `metric` is the leaf's path (e.g. "amount" or "hours.night"),
+# numeric and boolean leaves go to `value` and text leaves to `text_value`.
+class SpendingCategory(Base):
+    __tablename__ = 'spending_categories'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    category = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=True)
+    text_value = Column(String, nullable=True)
+    
+    __table_args__ = (Index('ix_spending_categories_category_metric', 'category', 'metric'),)
+
+class MerchantFrequency(Base):
+    __tablename__ = 'merchant_frequencies'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    merchant = Column(String, primary_key=True)
+    count = Column(Integer, nullable=True)
+    
+    __table_args__ = (Index('ix_merchant_frequencies_merchant', 'merchant'),)
+
+class SeasonalPattern(Base):
+    __tablename__ = 'seasonal_patterns'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    period = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=True)
+    text_value = Column(String, nullable=True)
+    
+    __table_args__ = (Index('ix_seasonal_patterns_period_metric', 'period', 'metric'),)
+
+class RecurringTransaction(Base):
+    __tablename__ = 'recurring_transactions'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=True)
+    text_value = Column(String, nullable=True)
+    
+    __table_args__ = (Index('ix_recurring_transactions_metric_text_value', 'metric', 'text_value'),)
+
+class FraudIndicator(Base):
+    __tablename__ = 'fraud_indicators'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    indicator = Column(String, primary_key=True)
+    
+    __table_args__ = (Index('ix_fraud_indicators_indicator', 'indicator'),)
+
+class TimingPattern(Base):
+    __tablename__ = 'timing_patterns'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    bucket = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=True)
+    text_value = Column(String, nullable=True)
+    
+    __table_args__ = (Index('ix_timing_patterns_bucket_metric', 'bucket', 'metric'),)
+
+class GeographicPattern(Base):
+    __tablename__ = 'geographic_patterns'
+    
+    record_id = Column(String, ForeignKey('statements.record_id'), primary_key=True)
+    region = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=True)
+    text_value = Column(String, nullable=True)
+    
+    __table_args__ = (Index('ix_geographic_patterns_region_metric', 'region', 'metric'),)
+
+NORMALIZED_MODELS = (
+    SpendingCategory, MerchantFrequency, SeasonalPattern, RecurringTransaction,
+    FraudIndicator, TimingPattern, GeographicPattern
+)
\ No newline at end of file
@@ -1,57 +1,320 @@
 import json
 import logging
 import os
+from contextlib import closing
+from typing import Any, Callable, Dict, Iterator, Optional
 
 from refiner.models.offchain_schema import OffChainSchema
 from refiner.models.output import Output
+from refiner.transformer.base_transformer import ReusableEngine
 from refiner.transformer.credit_statement_transformer import CreditStatementTransformer
+from refiner.transformer.parallel import parse_statement_files
+from refiner.transformer.statement_parser import PreparedStatement
 from refiner.config import settings
-from refiner.utils.encrypt import encrypt_file
+from refiner.utils.encrypt import EncryptionContext
 from refiner.utils.ipfs import upload_file_to_ipfs, upload_json_to_ipfs
+from refiner.utils.privacy import PrivacyAccountant
+from refiner.utils.quality import DataQualityError, QualityGate, summarize_quality_reports
+from refiner.utils.dedup import TransactionDeduplicator
+from refiner.utils.memory import MemoryGovernor
+from refiner.utils.pseudonymize import Pseudonymizer
+from refiner.utils.checkpoint import (
+    CheckpointJournal, file_fingerprint,
+    STAGE_DB_BUILT, STAGE_SCHEMA_UPLOADED, STAGE_ENCRYPTED, STAGE_DB_UPLOADED, STAGE_COLUMNAR_UPLOADED
+)
+from refiner.utils.columnar import ColumnarExporter
+from refiner.utils.statistics import build_statistics_manifest
+from refiner.utils.planner import STRATEGY_GROUPED, STRATEGY_STREAMING, log_plan, plan_input, scan_input
 
 class Refiner:
-    def __init__(self):
-        self.db_path = os.path.join(settings.OUTPUT_DIR, 'db.libsql')
+    def __init__(
+        self,
+        input_dir: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        encryption_key: Optional[str] = None,
+        engine: Optional[ReusableEngine] = None,
+        resume: Optional[bool] = None
+    ):
+        """
+        Initialize the refiner for one refinement job.
+        
+        Args:
+            input_dir: Directory containing input files (defaults to INPUT_DIR)
+            output_dir: Directory where output files are written (defaults to OUTPUT_DIR)
+            encryption_key: Key to encrypt the refinement with (defaults to REFINEMENT_ENCRYPTION_KEY)
+            engine: Optional engine kept warm across jobs by a long-running worker
+            resume: Continue an interrupted run from its checkpoint (defaults to RESUME_FROM_CHECKPOINT)
+        """
+        self.input_dir = input_dir or settings.INPUT_DIR
+        self.output_dir = output_dir or settings.OUTPUT_DIR
+        self.encryption_key = encryption_key or settings.REFINEMENT_ENCRYPTION_KEY
+        self.engine = engine
+        self.resume = settings.RESUME_FROM_CHECKPOINT if resume is None else resume
+        self.db_path = os.path.join(self.output_dir, 'db.libsql')
+        self.checkpoint_path = os.path.join(self.output_dir, 'checkpoint.json')
+        self._encryption_context = None
+
+    @property
+    def encryption_context(self) -> EncryptionContext:
+        """Context encrypting all artifacts of this run, created when the first one is encrypted."""
+        if self._encryption_context is None:
+            self._encryption_context = EncryptionContext(self.encryption_key)
+        return self._encryption_context
 
     def transform(self) -> Output:
         """Transform all input files into the database."""
+        if not self.encryption_key:
+            raise ValueError("No refinement encryption key provided")
+        
         logging.info("Starting data transformation")
         output = Output()
+        journal = CheckpointJournal(self.checkpoint_path, self.resume)
+        memory_governor = MemoryGovernor()
+        
+        privacy_accountant = None
+        if settings.ANONYMIZATION_METHOD == 'differential_privacy':
+            privacy_accountant = PrivacyAccountant()
+        
+        quality_gate = QualityGate(memory_governor=memory_governor) if settings.ENABLE_QUALITY_GATE else None
+        quality_reports = []
+
+        deduplicator = TransactionDeduplicator()
+        pseudonymizer = Pseudonymizer() if settings.PSEUDONYMIZATION_SECRET else None
+        
+        resumed = journal.has_progress
+        columnar_exporter = None
+        if settings.ENABLE_COLUMNAR_EXPORT and not journal.stage(STAGE_COLUMNAR_UPLOADED):
+            columnar_exporter = ColumnarExporter(os.path.join(self.output_dir, 'parquet'))
+        
+        # All input files are refined into a single database, kept if an earlier attempt was interrupted
+        transformer = CreditStatementTransformer(
+            self.db_path, privacy_accountant, quality_gate, deduplicator, memory_governor, pseudonymizer, self.engine,
+            resume=resumed, columnar_exporter=columnar_exporter
+        )
+        transformed_files = 0
 
-        # Iterate through files and transform data
-        for input_filename in os.listdir(settings.INPUT_DIR):
-            input_file = os.path.join(settings.INPUT_DIR, input_filename)
+        # Find the files left to refine
+        pending_files = {}
+        for input_filename in sorted(os.listdir(self.input_dir)):
+            input_file = os.path.join(self.input_dir, input_filename)
             if os.path.splitext(input_file)[1].lower() == '.json':
-                with open(input_file, 'r') as f:
-                    input_data = json.load(f)
+                entry = journal.file_entry(input_filename, file_fingerprint(input_file))
+                if entry['done']:
+                    if entry.get('quality'):
+                        quality_reports.append(entry['quality'])
+                    if not entry.get('rejected'):
+                        transformed_files += 1
+                    logging.info(f"Skipping {input_filename}, already refined")
+                    continue
+                pending_files[input_filename] = entry
+
+        # Plan the work from a scan of the input, and log the plan for tuning
+        parallel = bool(settings.PARSE_WORKERS) and len(pending_files) > 1
+        plan = plan_input(
+            scan_input(self.input_dir), list(pending_files),
+            in_progress=[name for name, entry in pending_files.items() if entry['statement_saved']]
+        )
+        log_plan(plan)
+
+        # Parse the files, in worker processes if configured, and write them in plan order from this process
+        with closing(self._parse_statements(plan, pending_files, transformer, memory_governor, parallel)) as parsed_statements:
+            for unit in plan['units']:
+                grouped = []
+                for input_filename in unit['files']:
+                    entry = pending_files[input_filename]
+                    try:
+                        prepared = next(parsed_statements)()
+                    except DataQualityError as e:
+                        quality_reports.append(e.report)
+                        journal.complete_file(input_filename, quality=e.report, rejected=True)
+                        logging.warning(f"Skipping {input_filename}: {e}")
+                        continue
+                    # The quality gate already accepted a statement whose records were saved
+                    quality_report = entry.get('quality') or prepared.quality_report
+                    if quality_report:
+                        quality_reports.append(quality_report)
+                    if unit['strategy'] == STRATEGY_GROUPED:
+                        grouped.append((input_filename, prepared))
+                        continue
 
-                    # Transform credit statement data
-                    transformer = CreditStatementTransformer(self.db_path)
-                    transformer.process(input_data)
+                    # Transform credit statement data, committing progress batch by batch
+                    def on_commit(offset: int) -> None:
+                        journal.record_progress(input_filename, offset, quality=quality_report)
+
+                    transformer.process_prepared(prepared, entry['offset'], entry['statement_saved'], on_commit)
+                    journal.complete_file(input_filename)
+                    transformed_files += 1
                     logging.info(f"Transformed {input_filename}")
-                    
-                    # Create a schema based on the SQLAlchemy schema
-                    schema = OffChainSchema(
-                        name=settings.SCHEMA_NAME,
-                        version=settings.SCHEMA_VERSION,
-                        description=settings.SCHEMA_DESCRIPTION,
-                        dialect=settings.SCHEMA_DIALECT,
-                        schema=transformer.get_schema()
-                    )
-                    output.schema = schema
-                        
-                    # Upload the schema to IPFS
-                    schema_file = os.path.join(settings.OUTPUT_DIR, 'schema.json')
-                    with open(schema_file, 'w') as f:
-                        json.dump(schema.model_dump(), f, indent=4)
-                        schema_ipfs_hash = upload_json_to_ipfs(schema.model_dump())
-                        logging.info(f"Schema uploaded to IPFS with hash: {schema_ipfs_hash}")
-                    
-                    # Encrypt and upload the database to IPFS
-                    encrypted_path = encrypt_file(settings.REFINEMENT_ENCRYPTION_KEY, self.db_path)
-                    ipfs_hash = upload_file_to_ipfs(encrypted_path)
-                    output.refinement_url = f"{settings.IPFS_GATEWAY_URL}/{ipfs_hash}"
-                    continue
+
+                # Small files share a single commit
+                if grouped:
+                    transformer.process_group([prepared for _, prepared in grouped])
+                    journal.complete_files({
+                        input_filename: {'quality': prepared.quality_report} for input_filename, prepared in grouped
+                    })
+                    transformed_files += len(grouped)
+                    logging.info(f"Transformed {', '.join(input_filename for input_filename, _ in grouped)}")
+
+        # Add differential privacy noise to the statement records, once for the whole run
+        if privacy_accountant:
+            transformer.apply_privacy()
+
+        output.deduplication = deduplicator.report()
+        # Fingerprint the finished database so the encrypted copy can be checked against it
+        db_built = journal.stage(STAGE_DB_BUILT)
+        if not db_built:
+            db_built = {'transformed_files': transformed_files, 'db_sha256': file_fingerprint(self.db_path)}
+            journal.complete_stage(STAGE_DB_BUILT, **db_built)
+
+        if transformed_files:
+            # Create a schema based on the SQLAlchemy schema
+            schema = OffChainSchema(
+                name=settings.SCHEMA_NAME,
+                version=settings.SCHEMA_VERSION,
+                description=settings.SCHEMA_DESCRIPTION,
+                dialect=settings.SCHEMA_DIALECT,
+                schema=transformer.get_schema()
+            )
+            output.schema = schema
+                
+            # Upload the schema to IPFS
+            schema_file = os.path.join(self.output_dir, 'schema.json')
+            with open(schema_file, 'w') as f:
+                json.dump(schema.model_dump(), f, indent=4)
+            uploaded_schema = journal.stage(STAGE_SCHEMA_UPLOADED)
+            if uploaded_schema:
+                schema_ipfs_hash = uploaded_schema['ipfs_hash']
+            else:
+                schema_ipfs_hash = upload_json_to_ipfs(schema.model_dump())
+                journal.complete_stage(STAGE_SCHEMA_UPLOADED, ipfs_hash=schema_ipfs_hash)
+            logging.info(f"Schema uploaded to IPFS with hash: {schema_ipfs_hash}")
+            
+            # Encrypt and upload the database to IPFS, skipping whatever an earlier attempt finished
+            encrypted = journal.stage(STAGE_ENCRYPTED)
+            if encrypted and os.path.exists(encrypted['path']):
+                encrypted_path = encrypted['path']
+            else:
+                encrypted_path = self.encryption_context.encrypt_file(self.db_path)
+                if settings.VERIFY_ENCRYPTION:
+                    self.encryption_context.verify_file(encrypted_path, db_built['db_sha256'])
+                    logging.info("Encrypted database verified against the built database")
+                journal.complete_stage(STAGE_ENCRYPTED, path=encrypted_path, verified=settings.VERIFY_ENCRYPTION)
+            output.integrity = {
+                'db_sha256': db_built['db_sha256'],
+                'verified': journal.stage(STAGE_ENCRYPTED)['verified'],
+            }
+            uploaded_db = journal.stage(STAGE_DB_UPLOADED)
+            if uploaded_db:
+                ipfs_hash = uploaded_db['ipfs_hash']
+            else:
+                ipfs_hash = upload_file_to_ipfs(encrypted_path)
+                journal.complete_stage(STAGE_DB_UPLOADED, ipfs_hash=ipfs_hash)
+            # Only a published refinement holds this run's IDs, so a failed run can be retried from scratch
+            deduplicator.save()
+            output.refinement_url = f"{settings.IPFS_GATEWAY_URL}/{ipfs_hash}"
+            # Publish a zone map so downstream systems can skip this refinement without decrypting it
+            output.statistics = build_statistics_manifest(
+                transformer.engine, transformer.get_tables(), pseudonymized_columns=transformer.pseudonymize_fields
+            )
+
+            if settings.ENABLE_COLUMNAR_EXPORT:
+                output.columnar_exports = self._upload_columnar_export(journal, columnar_exporter, transformer, resumed)
+
+        if quality_gate:
+            output.quality = summarize_quality_reports(quality_reports)
+
+        pii_audit = transformer.pii_audit.report()
+        logging.info(f"PII audit: {json.dumps({key: pii_audit[key] for key in ('flagged_fields', 'by_type')})}")
+        if settings.PII_AUDIT_IN_OUTPUT:
+            output.pii_audit = pii_audit
+
+        if privacy_accountant:
+            output.privacy_budget = privacy_accountant.report()
+            logging.info(f"Differential privacy budget spent: {output.privacy_budget['epsilon_spent']}")
+
+        output.memory = memory_governor.report()
+        logging.info(f"Memory high-water mark: {output.memory['high_water_rss_mb']} MB")
 
         logging.info("Data transformation completed successfully")
-        return output
\ No newline at end of file
+        return output
+
+    def _parse_statements(
+        self,
+        plan: Dict[str, Any],
+        pending_files: Dict[str, Dict[str, Any]],
+        transformer: CreditStatementTransformer,
+        memory_governor: MemoryGovernor,
+        parallel: bool
+    ) -> Iterator[Callable[[], PreparedStatement]]:
+        """
+        Parse the input files of a plan, in plan order.
+        
+        In parallel mode, files are parsed in PARSE_WORKERS worker processes ahead of the
+        writer, largest first and as far as the memory governor leaves headroom. Streamed
+        files are only validated there; the writer reads their rows from the file itself,
+        batch by batch, so they are not copied between processes. Otherwise each file is
+        read and parsed in this process when the writer gets to it.
+        
+        Args:
+            plan: Execution plan from plan_input
+            pending_files: Checkpoint entry of each file left to refine
+            transformer: Transformer writing the database
+            memory_governor: Governor that holds back reading input while there is no memory headroom
+            parallel: Whether to parse in worker processes
+            
+        Yields:
+            Callables returning the parsed statements, raising DataQualityError for rejected ones
+        """
+        # The quality gate already accepted a statement whose records were saved
+        files = [
+            (os.path.join(self.input_dir, input_filename), not pending_files[input_filename]['statement_saved'],
+             unit['strategy'] == STRATEGY_STREAMING)
+            for unit in plan['units'] for input_filename in unit['files']
+        ]
+        if parallel:
+            # Closing this generator stops the parse workers if the writer stops early
+            with closing(parse_statement_files(files, memory_governor=memory_governor)) as worker_results:
+                yield from worker_results
+            return
+        
+        for input_file, check_quality, streaming in files:
+            def parse(input_file: str = input_file, check_quality: bool = check_quality,
+                      streaming: bool = streaming) -> PreparedStatement:
+                # Free memory, or shrink batches, before reading more input
+                memory_governor.throttle()
+                return transformer.parser.parse_file(input_file, check_quality, streaming)
+            yield parse
+
+    def _upload_columnar_export(
+        self,
+        journal: CheckpointJournal,
+        columnar_exporter: Optional[ColumnarExporter],
+        transformer: CreditStatementTransformer,
+        resumed: bool
+    ) -> Dict[str, str]:
+        """
+        Finish, encrypt and upload the Parquet copy of the refined tables.
+        
+        Args:
+            journal: Checkpoint journal of the run
+            columnar_exporter: Exporter that captured the written rows, None if the upload already completed
+            transformer: Transformer that built the database
+            resumed: Whether the run continued an interrupted attempt
+            
+        Returns:
+            Gateway URL of the encrypted Parquet file per table
+        """
+        uploaded = journal.stage(STAGE_COLUMNAR_UPLOADED)
+        if uploaded:
+            return uploaded['urls']
+        
+        # Rows written by an interrupted attempt, or changed by merges, were not captured
+        if resumed or columnar_exporter.stale:
+            columnar_exporter.rebuild_from_database(transformer.engine)
+        
+        urls = {}
+        for table_name, parquet_path in columnar_exporter.close().items():
+            encrypted_path = self.encryption_context.encrypt_file(parquet_path)
+            urls[table_name] = f"{settings.IPFS_GATEWAY_URL}/{upload_file_to_ipfs(encrypted_path)}"
+        journal.complete_stage(STAGE_COLUMNAR_UPLOADED, urls=urls)
+        return urls
\ No newline at end of file
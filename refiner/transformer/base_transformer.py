@@ -1,11 +1,45 @@
-from typing import Dict, Any, List
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Dict, Any, List, Optional, Sequence
+from sqlalchemy import Table, create_engine, insert, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 from refiner.models.refined import Base
+from refiner.transformer.column_batch import ColumnBatch
+from refiner.utils.memory import MemoryGovernor
+from refiner.utils.columnar import ColumnarExporter
 import sqlite3
 import os
 import logging
 
+class ReusableEngine:
+    """
+    A single SQLAlchemy engine that can be pointed at a different database file per job.
+    Reusing one engine keeps its compiled statement cache warm across refinements.
+    """
+    
+    def __init__(self):
+        self.db_path = None
+        # NullPool opens a fresh connection to the current database file on every checkout
+        self.engine = create_engine('sqlite://', creator=self._connect, poolclass=NullPool)
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self.db_path is None:
+            raise RuntimeError("ReusableEngine is not bound to a database file")
+        return sqlite3.connect(self.db_path)
+    
+    def bind(self, db_path: str) -> Engine:
+        """
+        Point the engine at a database file.
+        
+        Args:
+            db_path: Path to the database file
+            
+        Returns:
+            The shared engine
+        """
+        self.db_path = db_path
+        return self.engine
+
 class DataTransformer:
     """
     Base class for transforming JSON data into SQLAlchemy models.
@@ -13,21 +47,51 @@ class DataTransformer:
     to customize the transformation process for their specific data.
     """
     
-    def __init__(self, db_path: str):
-        """Initialize the transformer with a database path."""
+    def __init__(
+        self,
+        db_path: str,
+        memory_governor: Optional[MemoryGovernor] = None,
+        engine: Optional[ReusableEngine] = None,
+        resume: bool = False,
+        columnar_exporter: Optional[ColumnarExporter] = None
+    ):
+        """
+        Initialize the transformer with a database path.
+        
+        Args:
+            db_path: Path to the database file
+            memory_governor: Optional governor that sizes insert batches to the memory budget
+            engine: Optional engine reused across database files instead of creating a new one
+            resume: Keep an existing database written by an interrupted run instead of recreating it
+            columnar_exporter: Optional exporter that receives every written row for the Parquet copy
+        """
         self.db_path = db_path
+        self.memory_governor = memory_governor
+        self.reusable_engine = engine
+        self.resume = resume
+        self.columnar_exporter = columnar_exporter
+        # Records that update rows already written by an earlier process() call.
+        # Subclasses fill this when they detect such duplicates.
+        self.pending_merges: List[Base] = []
         self._initialize_database()
     
     def _initialize_database(self) -> None:
         """
         Initialize or recreate the database and its tables.
+        When resuming, an existing database is kept and only missing tables are created.
         """
         if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-            logging.info(f"Deleted existing database at {self.db_path}")
+            if self.resume:
+                logging.info(f"Resuming with existing database at {self.db_path}")
+            else:
+                os.remove(self.db_path)
+                logging.info(f"Deleted existing database at {self.db_path}")
         
-        self.engine = create_engine(f'sqlite:///{self.db_path}')
-        Base.metadata.create_all(self.engine)
+        if self.reusable_engine:
+            self.engine = self.reusable_engine.bind(self.db_path)
+        else:
+            self.engine = create_engine(f'sqlite:///{self.db_path}')
+        Base.metadata.create_all(self.engine, tables=self.get_tables())
         self.Session = sessionmaker(bind=self.engine)
     
     def transform(self, data: Dict[str, Any]) -> List[Base]:
@@ -42,6 +106,15 @@ class DataTransformer:
         """
         raise NotImplementedError("Subclasses must implement transform method")
     
+    def get_tables(self) -> List[Table]:
+        """
+        Return the tables to create in the database.
+        
+        Returns:
+            Tables in dependency order
+        """
+        return Base.metadata.sorted_tables
+
     def get_schema(self):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -57,20 +130,100 @@ class DataTransformer:
     def process(self, data: Dict[str, Any]) -> None:
         """
         Process the data transformation and save to database.
-        If the database already exists, it will be deleted and recreated.
+        The database itself is prepared when the transformer is created: an existing one is
+        kept when resuming and recreated otherwise.
         
         Args:
             data: Dictionary containing the JSON data
         """
+        # Transform data into model instances
+        self.save_models(self.transform(data))
+
+    def save_models(self, models: List[Base], batches: Sequence[ColumnBatch] = ()) -> None:
+        """
+        Save model instances, column batches and any pending merges in a single transaction.
+        
+        Args:
+            models: Model instances to insert
+            batches: Column batches to insert after the model instances
+        """
         session = self.Session()
         try:
-            # Transform data into model instances
-            models = self.transform(data)
-            for model in models:
-                session.add(model)
+            self._add_in_batches(session, models)
+            for batch in batches:
+                self._insert_batch(session, batch)
+            for model in self.pending_merges:
+                self._merge_into_existing(session, model)
             session.commit()
         except Exception as e:
             session.rollback()
             raise e
         finally:
-            session.close()
\ No newline at end of file
+            self.pending_merges = []
+            session.close()
+
+    def _add_in_batches(self, session: Session, models: List[Base]) -> None:
+        """
+        Add model instances to the session batch by batch.
+        Each batch is flushed and released so the session never holds more than one batch of pending objects.
+        
+        Args:
+            session: Active database session
+            models: Model instances to add; the list is cleared as batches are written
+        """
+        offset = 0
+        while offset < len(models):
+            batch_size = self.memory_governor.next_batch_size() if self.memory_governor else len(models)
+            batch = models[offset:offset + batch_size]
+            session.add_all(batch)
+            session.flush()
+            if self.columnar_exporter:
+                self.columnar_exporter.add(batch)
+            session.expunge_all()
+            models[offset:offset + batch_size] = [None] * len(batch)
+            offset += len(batch)
+    
+    def _insert_batch(self, session: Session, batch: ColumnBatch) -> None:
+        """
+        Insert a column batch with executemany, chunk by chunk.
+        Parameter rows only exist for the chunk being written, and no ORM instances are created.
+        
+        Args:
+            session: Active database session
+            batch: Rows to insert
+        """
+        batch.fill_defaults()
+        statement = insert(batch.table)
+        offset = 0
+        while offset < len(batch):
+            batch_size = self.memory_governor.next_batch_size() if self.memory_governor else len(batch)
+            chunk = batch.slice(offset, offset + batch_size)
+            session.execute(statement, list(chunk.rows()))
+            if self.columnar_exporter:
+                self.columnar_exporter.add_columns(batch.table.name, chunk.columns)
+            offset += len(chunk)
+    
+    def _merge_into_existing(self, session: Session, model: Base) -> None:
+        """
+        Copy the non-null values of a record onto the stored row with the same primary key.
+        The record is inserted if no such row exists.
+        
+        Args:
+            session: Active database session
+            model: Record carrying the values to merge
+        """
+        mapper = inspect(type(model))
+        existing = session.get(type(model), tuple(mapper.primary_key_from_instance(model)))
+        if existing is None:
+            session.add(model)
+            if self.columnar_exporter:
+                self.columnar_exporter.add([model])
+            return
+        
+        for column in mapper.columns:
+            value = getattr(model, column.key)
+            if value is not None:
+                setattr(existing, column.key, value)
+        if self.columnar_exporter:
+            # The exported copy of the row no longer matches the database
+            self.columnar_exporter.stale = True
\ No newline at end of file
@@ -0,0 +1,84 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Type
+
+from sqlalchemy import Table
+
+from refiner.models.refined import Base
+
+
+class ColumnBatch:
+    """
+    Column-oriented batch of rows.
+
+    Holds one list per column instead of one object per row, so sanitization, parsing
+    and quality checks run over whole columns and the writer inserts the rows with
+    executemany, without building an ORM instance per row.
+    """
+
+    __slots__ = ('columns', 'table')
+
+    def __init__(self, columns: Dict[str, List[Any]], table: Optional[Table] = None):
+        """
+        Initialize the batch.
+
+        Args:
+            columns: Values per column name, all of the same length
+            table: Table the rows are written to, None while the batch still holds unrefined values
+        """
+        self.columns = columns
+        self.table = table
+
+    def __reduce__(self):
+        # Send the table by name, the refined metadata is the same in every process
+        return _restore_batch, (self.columns, self.table.name if self.table is not None else None)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def slice(self, start: int, stop: int) -> 'ColumnBatch':
+        """Return the rows from start up to stop as a new batch."""
+        return ColumnBatch({name: values[start:stop] for name, values in self.columns.items()}, self.table)
+
+    def take(self, indices: Sequence[int]) -> 'ColumnBatch':
+        """Return the rows at the given indices, in that order, as a new batch."""
+        return ColumnBatch({name: [values[i] for i in indices] for name, values in self.columns.items()}, self.table)
+
+    def merge_row(self, target: int, source: int) -> None:
+        """Copy the non-null values of one row onto another."""
+        for values in self.columns.values():
+            if values[source] is not None:
+                values[target] = values[source]
+
+    def fill_defaults(self) -> None:
+        """Replace missing values with the scalar column defaults, as the ORM does on insert."""
+        for column in self.table.columns:
+            if column.name in self.columns and column.default is not None and column.default.is_scalar:
+                default = column.default.arg
+                self.columns[column.name] = [default if value is None else value for value in self.columns[column.name]]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield the rows as parameter dictionaries."""
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+    def to_models(self, model: Type[Base], indices: Optional[Sequence[int]] = None) -> List[Base]:
+        """
+        Build ORM instances for some or all rows.
+
+        Args:
+            model: Model class of the batch's table
+            indices: Rows to build, all rows if None
+
+        Returns:
+            Model instances
+        """
+        batch = self if indices is None else self.take(indices)
+        return [model(**row) for row in batch.rows()]
+
+
+def _restore_batch(columns: Dict[str, List[Any]], table_name: Optional[str]) -> ColumnBatch:
+    """Rebuild a batch received from another process."""
+    return ColumnBatch(columns, Base.metadata.tables[table_name] if table_name else None)
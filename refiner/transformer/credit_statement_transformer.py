@@ -1,20 +1,28 @@
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import Table
 from refiner.models.refined import Base
-from refiner.transformer.base_transformer import DataTransformer
+from refiner.transformer.base_transformer import DataTransformer, ReusableEngine
+from refiner.transformer.column_batch import ColumnBatch
+from refiner.transformer.statement_parser import PreparedStatement, StatementParser, StreamedTransactions
 from refiner.models.refined import (
     StatementRecord, AccountInfo, FinancialSummary, TransactionRecord,
-    SpendingPattern, RiskMetric, EngineeredFeature
+    SpendingPattern, RiskMetric, EngineeredFeature,
+    SpendingCategory, MerchantFrequency, SeasonalPattern, RecurringTransaction,
+    FraudIndicator, TimingPattern, GeographicPattern, NORMALIZED_MODELS
 )
 from refiner.models.unrefined import CreditStatement
-from refiner.utils.date import parse_timestamp
-from refiner.utils.pii import (
-    sanitize_transaction_description,
-    mask_merchant_location,
-    validate_card_identifier_format,
-    detect_sensitive_transaction_data
-)
-
+from refiner.utils.date import parse_date
+from refiner.utils.pii import validate_card_identifier_format
+from refiner.utils.privacy import PrivacyAccountant
+from refiner.utils.quality import QualityGate
+from refiner.utils.dedup import TransactionDeduplicator
+from refiner.utils.memory import MemoryGovernor
+from refiner.utils.pseudonymize import Pseudonymizer
+from refiner.utils.columnar import ColumnarExporter
+from refiner.utils.normalize import flatten_json, keyed_leaves
+from refiner.utils.audit import PIIAuditLog
+from refiner.utils.merchants import load_merchant_index
+from refiner.config import settings
 
 class CreditStatementTransformer(DataTransformer):
     """
@@ -22,19 +30,214 @@ class CreditStatementTransformer(DataTransformer):
     Converts raw credit statement JSON into normalized database records.
     """
     
-    def transform(self, data: Dict[str, Any]) -> List[Base]:
+    def __init__(
+        self,
+        db_path: str,
+        privacy_accountant: Optional[PrivacyAccountant] = None,
+        quality_gate: Optional[QualityGate] = None,
+        deduplicator: Optional[TransactionDeduplicator] = None,
+        memory_governor: Optional[MemoryGovernor] = None,
+        pseudonymizer: Optional[Pseudonymizer] = None,
+        engine: Optional[ReusableEngine] = None,
+        resume: bool = False,
+        columnar_exporter: Optional[ColumnarExporter] = None
+    ):
+        """
+        Initialize the transformer.
+        
+        Args:
+            db_path: Path to the database file
+            privacy_accountant: Optional accountant whose noise apply_privacy adds to the written statement records
+            quality_gate: Optional gate that rejects statements below the quality threshold
+            deduplicator: Optional deduplicator applied to transactions before insert
+            memory_governor: Optional governor that sizes batches to the memory budget
+            pseudonymizer: Optional keyed pseudonymizer applied to PSEUDONYMIZE_FIELDS
+            engine: Optional engine reused across database files
+            resume: Keep the database written by an interrupted run
+            columnar_exporter: Optional exporter writing the refined tables to Parquet
+        """
+        self.privacy_accountant = privacy_accountant
+        self.quality_gate = quality_gate
+        self.deduplicator = deduplicator
+        self.pseudonymizer = pseudonymizer
+        self.pseudonymize_fields = frozenset(settings.PSEUDONYMIZE_FIELDS) if pseudonymizer else frozenset()
+        self.normalize_json_columns = settings.NORMALIZE_JSON_COLUMNS
+        self.pii_audit = PIIAuditLog(pseudonymizer=pseudonymizer)
+        merchant_index = load_merchant_index() if settings.ENABLE_MERCHANT_ENRICHMENT else None
+        self.parser = StatementParser(quality_gate, pseudonymizer, merchant_index)
+        super().__init__(db_path, memory_governor, engine, resume, columnar_exporter)
+        
+        # Transactions committed by the interrupted attempt must still count as seen
+        if resume and deduplicator:
+            session = self.Session()
+            try:
+                deduplicator.seed(row[0] for row in session.query(TransactionRecord.transaction_id))
+            finally:
+                session.close()
+    
+    def process(self, data: Dict[str, Any]) -> None:
         """
-        Transform raw credit statement data into SQLAlchemy model instances.
+        Transform a statement and save it to the database, writing its transactions as a column batch.
         
         Args:
             data: Dictionary containing credit statement data
             
+        Raises:
+            DataQualityError: If the statement is below the quality threshold
+        """
+        prepared = self.audit(self.parser.parse(data))
+        self.save_models(
+            self.create_statement_models(prepared.statement),
+            [self.create_transaction_batch(prepared.transactions)]
+        )
+    
+    def process_prepared(
+        self,
+        prepared: PreparedStatement,
+        transaction_offset: int = 0,
+        statement_saved: bool = False,
+        on_commit: Optional[Callable[[int], None]] = None
+    ) -> None:
+        """
+        Write a statement parsed by a StatementParser, in separately committed batches.
+        Parsing may have run in another process.
+        
+        A crash between a commit and its on_commit call is safe to resume: statement records
+        already in the database are not inserted again, and transactions committed again are
+        recognized by the deduplicator, which a resumed run seeds with the stored IDs.
+        
+        The transactions of a streamed file are read from the file one batch at a time, so
+        only the batch being written is held in memory.
+        
+        Args:
+            prepared: Parsed statement with its sanitized transaction rows
+            transaction_offset: Number of transactions committed by an earlier attempt
+            statement_saved: Whether an earlier attempt already committed the statement-level records
+            on_commit: Called after every commit with the number of transactions committed so far
+        """
+        self.audit(prepared, transaction_offset)
+        
+        if not statement_saved:
+            # An interrupted attempt may have committed the statement records without recording it
+            if not self.stored_statements([prepared.statement.statement_metadata.record_id]):
+                self.save_models(self.create_statement_models(prepared.statement))
+            if on_commit:
+                on_commit(transaction_offset)
+        
+        offset = transaction_offset
+        for batch in self._transaction_batches(prepared, transaction_offset):
+            self.save_models([], [self.create_transaction_batch(batch)])
+            offset += len(batch)
+            if on_commit:
+                on_commit(offset)
+    
+    def _transaction_batches(self, prepared: PreparedStatement, offset: int) -> Iterator[ColumnBatch]:
+        """Yield the transaction rows of a statement from an offset on, one batch per commit."""
+        transactions = prepared.transactions
+        if isinstance(transactions, StreamedTransactions):
+            record_id = prepared.statement.statement_metadata.record_id
+            for batch, pii_detections in self.parser.read_transactions(prepared, offset, self._next_batch_size):
+                self._record_pii(record_id, batch['transaction_id'], pii_detections)
+                yield batch
+            return
+        while offset < len(transactions):
+            batch = transactions.slice(offset, offset + self._next_batch_size())
+            yield batch
+            offset += len(batch)
+    
+    def _next_batch_size(self) -> int:
+        """Return the number of transactions to write in the next batch."""
+        if not self.memory_governor:
+            return settings.BATCH_SIZE
+        # Free memory, or shrink batches, before reading more input
+        self.memory_governor.throttle()
+        return self.memory_governor.next_batch_size()
+    
+    def process_group(self, prepared_statements: List[PreparedStatement]) -> None:
+        """
+        Write several parsed statements in a single transaction.
+        Used for small files, where a commit per file would cost more than writing them.
+        Statements already in the database were committed, with their transactions, by an
+        interrupted attempt that did not get to record it, and are skipped.
+        
+        Args:
+            prepared_statements: Parsed statements, written in order
+        """
+        stored = self.stored_statements(prepared.statement.statement_metadata.record_id for prepared in prepared_statements)
+        models = []
+        batches = []
+        merges = []
+        for prepared in prepared_statements:
+            if prepared.statement.statement_metadata.record_id in stored:
+                continue
+            self.audit(prepared)
+            models.extend(self.create_statement_models(prepared.statement))
+            batches.append(self.create_transaction_batch(prepared.transactions))
+            merges.extend(self.pending_merges)
+        self.pending_merges = merges
+        self.save_models(models, batches)
+    
+    def stored_statements(self, record_ids: Iterable[str]) -> Set[str]:
+        """
+        Return which of the given statements are already in the database.
+        Only a resumed run can hold them, so the database is not queried otherwise.
+        
+        Args:
+            record_ids: Record IDs of the statements
+            
         Returns:
-            List of SQLAlchemy model instances
+            Record IDs of the stored statements
         """
-        # Validate data with Pydantic
-        unrefined_statement = CreditStatement.model_validate(data)
+        if not self.resume:
+            return set()
+        session = self.Session()
+        try:
+            query = session.query(StatementRecord.record_id).filter(StatementRecord.record_id.in_(list(record_ids)))
+            return {row[0] for row in query}
+        finally:
+            session.close()
+    
+    def audit(self, prepared: PreparedStatement, transaction_offset: int = 0) -> PreparedStatement:
+        """
+        Record the PII detections of a parsed statement in the run's audit log.
         
+        Args:
+            prepared: Parsed statement
+            transaction_offset: Transactions before this offset were audited by an earlier attempt
+            
+        Returns:
+            The same parsed statement
+        """
+        if prepared.pii_detections:
+            self._record_pii(
+                prepared.statement.statement_metadata.record_id, prepared.transactions['transaction_id'],
+                prepared.pii_detections, transaction_offset
+            )
+        return prepared
+    
+    def _record_pii(
+        self,
+        record_id: str,
+        transaction_ids: Sequence[str],
+        pii_detections: List[Tuple[int, List[str]]],
+        transaction_offset: int = 0
+    ) -> None:
+        """Record PII detections, given by row index into transaction_ids, from an offset on."""
+        for index, pii_types in pii_detections:
+            if index >= transaction_offset:
+                # Count PII detection for the security audit
+                self.pii_audit.record(record_id, pii_types, transaction_ids[index])
+    
+    def create_statement_models(self, unrefined_statement: CreditStatement) -> List[Base]:
+        """
+        Create the statement-level records of a validated statement.
+        
+        Args:
+            unrefined_statement: Validated credit statement
+            
+        Returns:
+            List of SQLAlchemy model instances
+        """
         models = []
         
         # Create main statement record
@@ -50,10 +253,6 @@ class CreditStatementTransformer(DataTransformer):
         financial_summary = self._create_financial_summary(unrefined_statement)
         models.append(financial_summary)
         
-        # Create transaction records (required)
-        transaction_records = self._create_transaction_records(unrefined_statement)
-        models.extend(transaction_records)
-        
         # Create spending patterns if present
         if unrefined_statement.spending_patterns:
             spending_pattern = self._create_spending_pattern(unrefined_statement)
@@ -69,23 +268,66 @@ class CreditStatementTransformer(DataTransformer):
             engineered_feature = self._create_engineered_feature(unrefined_statement)
             models.append(engineered_feature)
         
+        # Flatten the JSON columns into indexed child tables
+        if self.normalize_json_columns:
+            models.extend(self._create_normalized_records(unrefined_statement))
+        
         return models
     
+    def apply_privacy(self) -> None:
+        """
+        Add differential privacy noise to the statement records, once all statements are written.
+        Noise is drawn per column across the whole run; calling this again does not add more.
+        """
+        if self.privacy_accountant.apply_to_database(self.engine, self.get_tables()) and self.columnar_exporter:
+            # The exported copies of the noised rows hold the exact values
+            self.columnar_exporter.stale = True
+    
+    def create_transaction_batch(self, batch: ColumnBatch) -> ColumnBatch:
+        """
+        Deduplicate sanitized transaction rows and put them in insert order.
+        Rows that update already written rows are left in pending_merges.
+        
+        Args:
+            batch: Transaction rows created by the statement parser
+            
+        Returns:
+            Column batch of transaction rows
+        """
+        if self.deduplicator:
+            fresh, merges, folds = self.deduplicator.partition_keys(batch['transaction_id'])
+            if folds:
+                # Copy the columns first, unchanged ones are shared with the caller's batch
+                batch = batch.slice(0, len(batch))
+            for target, source in folds:
+                batch.merge_row(target, source)
+            # Merges into written rows are rare, so they keep going through the ORM
+            self.pending_merges = batch.to_models(TransactionRecord, merges)
+            batch = batch.take(fresh)
+        if settings.CLUSTERED_TRANSACTIONS:
+            # Insert in clustered key order so pages fill sequentially
+            keys = list(zip(batch['record_id'], batch['transaction_date'], batch['transaction_id']))
+            batch = batch.take(sorted(range(len(batch)), key=keys.__getitem__))
+        return batch
+    
     def _create_statement_record(self, statement: CreditStatement) -> StatementRecord:
         """Create the main statement record with card identifier validation."""
         # Validate card identifier format for security
         card_identifier = statement.statement_metadata.card_identifier
         if not validate_card_identifier_format(card_identifier):
-            print(f"Warning: Card identifier {card_identifier} may not be properly masked")
+            self.pii_audit.record(statement.statement_metadata.record_id, ['unmasked_card_identifier'])
+        
+        if 'card_identifier' in self.pseudonymize_fields:
+            card_identifier = self.pseudonymizer.pseudonymize(card_identifier)
         
         return StatementRecord(
             record_id=statement.statement_metadata.record_id,
-            statement_date=self._parse_date(statement.statement_metadata.statement_date),
-            statement_period_start=self._parse_date(statement.statement_metadata.statement_period.start_date) if statement.statement_metadata.statement_period else None,
-            statement_period_end=self._parse_date(statement.statement_metadata.statement_period.end_date) if statement.statement_metadata.statement_period else None,
+            statement_date=parse_date(statement.statement_metadata.statement_date),
+            statement_period_start=parse_date(statement.statement_metadata.statement_period.start_date) if statement.statement_metadata.statement_period else None,
+            statement_period_end=parse_date(statement.statement_metadata.statement_period.end_date) if statement.statement_metadata.statement_period else None,
             days_in_period=statement.statement_metadata.days_in_period,
             card_identifier=card_identifier,
-            payment_due_date=self._parse_date(statement.statement_metadata.payment_due_date) if statement.statement_metadata.payment_due_date else None,
+            payment_due_date=parse_date(statement.statement_metadata.payment_due_date) if statement.statement_metadata.payment_due_date else None,
             currency=statement.statement_metadata.currency,
             statement_locale=statement.statement_metadata.statement_locale,
             country_code=statement.statement_metadata.country_code,
@@ -121,52 +363,6 @@ class CreditStatementTransformer(DataTransformer):
             over_limit_amount=statement.financial_summary.over_limit_amount
         )
     
-    def _create_transaction_records(self, statement: CreditStatement) -> List[TransactionRecord]:
-        """Create transaction records with PII protection."""
-        transactions = []
-        
-        for txn in statement.transactions:
-            # Sanitize transaction description for PII
-            sanitized_description = sanitize_transaction_description(txn.description)
-            
-            # Mask merchant location while preserving geographic data
-            masked_location = mask_merchant_location(txn.location) if txn.location else None
-            
-            # Detect any remaining PII issues
-            pii_detected = detect_sensitive_transaction_data(sanitized_description)
-            if pii_detected:
-                # Log PII detection for security audit
-                print(f"PII detected in transaction {txn.transaction_id}: {pii_detected}")
-            
-            transaction = TransactionRecord(
-                transaction_id=txn.transaction_id,
-                record_id=statement.statement_metadata.record_id,
-                transaction_date=self._parse_date(txn.transaction_date),  # Updated field name
-                posting_date=self._parse_date(txn.posting_date) if txn.posting_date else None,  # Added
-                description=sanitized_description,
-                amount=txn.amount,
-                transaction_type=txn.transaction_type,  # Added
-                day_of_week=txn.day_of_week,  # Added
-                day_of_month=txn.day_of_month,  # Added
-                is_weekend=txn.is_weekend,  # Added
-                merchant_name=txn.merchant_name,
-                merchant_id=txn.merchant_id,  # Added
-                category_primary=txn.category_primary,  # Updated field name
-                category_detailed=txn.category_detailed,  # Added
-                channel=txn.channel,  # Added
-                currency=txn.currency,  # Added
-                transaction_country=txn.transaction_country,  # Added
-                transaction_locale=txn.transaction_locale,  # Added
-                is_international=txn.is_international,  # Added
-                is_recurring=txn.is_recurring,
-                location=masked_location,
-                is_disputed=txn.is_disputed,
-                payment_method=txn.payment_method
-            )
-            transactions.append(transaction)
-        
-        return transactions
-    
     def _create_spending_pattern(self, statement: CreditStatement) -> SpendingPattern:
         """Create spending pattern record."""
         return SpendingPattern(
@@ -202,18 +398,50 @@ class CreditStatementTransformer(DataTransformer):
             geographic_spending_patterns=statement.engineered_features.geographic_spending_patterns
         )
     
-    def _parse_date(self, date_str: str):
-        """Parse date string to date object."""
-        if not date_str:
-            return None
+    def _create_normalized_records(self, statement: CreditStatement) -> List[Base]:
+        """Create child table records flattened from the JSON columns."""
+        record_id = statement.statement_metadata.record_id
+        records = []
         
-        try:
-            # Try parsing as ISO date first
-            return datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
-        except ValueError:
-            try:
-                # Try parsing as date only
-                return datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
-                # Return None if unable to parse
-                return None
\ No newline at end of file
+        spending_patterns = statement.spending_patterns
+        if spending_patterns:
+            for category, (metric, value, text_value) in keyed_leaves(spending_patterns.category_distribution):
+                records.append(SpendingCategory(
+                    record_id=record_id, category=category, metric=metric, value=value, text_value=text_value
+                ))
+            for merchant, count in (spending_patterns.merchant_frequency or {}).items():
+                records.append(MerchantFrequency(record_id=record_id, merchant=merchant, count=count))
+            for period, (metric, value, text_value) in keyed_leaves(spending_patterns.seasonal_patterns):
+                records.append(SeasonalPattern(
+                    record_id=record_id, period=period, metric=metric, value=value, text_value=text_value
+                ))
+            for position, recurring in enumerate(spending_patterns.recurring_transactions or []):
+                for metric, value, text_value in flatten_json(recurring):
+                    records.append(RecurringTransaction(
+                        record_id=record_id, position=position, metric=metric, value=value, text_value=text_value
+                    ))
+        
+        if statement.risk_metrics:
+            for indicator in dict.fromkeys(statement.risk_metrics.fraud_indicators or []):
+                records.append(FraudIndicator(record_id=record_id, indicator=indicator))
+        
+        engineered_features = statement.engineered_features
+        if engineered_features:
+            for bucket, (metric, value, text_value) in keyed_leaves(engineered_features.transaction_timing_patterns):
+                records.append(TimingPattern(
+                    record_id=record_id, bucket=bucket, metric=metric, value=value, text_value=text_value
+                ))
+            for region, (metric, value, text_value) in keyed_leaves(engineered_features.geographic_spending_patterns):
+                records.append(GeographicPattern(
+                    record_id=record_id, region=region, metric=metric, value=value, text_value=text_value
+                ))
+        
+        return records
+    
+    def get_tables(self) -> List[Table]:
+        """Return the tables to create, leaving out the normalized child tables unless enabled."""
+        tables = super().get_tables()
+        if self.normalize_json_columns:
+            return tables
+        normalized_tables = {model.__table__ for model in NORMALIZED_MODELS}
+        return [table for table in tables if table not in normalized_tables]
\ No newline at end of file
@@ -0,0 +1,108 @@
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import count, islice
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from refiner.config import settings
+from refiner.transformer.statement_parser import PreparedStatement, StatementParser
+from refiner.utils.memory import MemoryGovernor
+from refiner.utils.merchants import load_merchant_index
+from refiner.utils.pseudonymize import Pseudonymizer
+from refiner.utils.quality import QualityGate
+
+# Parser held by each parse worker process
+_parser = None
+
+
+def _init_parser() -> None:
+    """Create the statement parser of a parse worker process."""
+    global _parser
+    logging.getLogger().setLevel(logging.WARNING)
+    quality_gate = QualityGate() if settings.ENABLE_QUALITY_GATE else None
+    pseudonymizer = Pseudonymizer() if settings.PSEUDONYMIZATION_SECRET else None
+    merchant_index = load_merchant_index() if settings.ENABLE_MERCHANT_ENRICHMENT else None
+    _parser = StatementParser(quality_gate, pseudonymizer, merchant_index)
+
+
+def _parse_file(input_file: str, check_quality: bool, streaming: bool) -> PreparedStatement:
+    """Read and parse one input file in a parse worker process."""
+    return _parser.parse_file(input_file, check_quality, streaming)
+
+
+def _file_size(input_file: str) -> int:
+    """Return the size of an input file, 0 if it cannot be read (parsing then reports the error)."""
+    try:
+        return os.path.getsize(input_file)
+    except OSError:
+        return 0
+
+
+def parse_statement_files(
+    files: Iterable[Tuple[str, bool, bool]],
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    memory_governor: Optional[MemoryGovernor] = None
+) -> Iterator[Callable[[], PreparedStatement]]:
+    """
+    Parse statement files in worker processes, for a single writer to insert in input order.
+
+    SQLite allows one writer at a time, so only the CPU-bound work runs in parallel: JSON
+    parsing, Pydantic validation, the quality gate, PII scrubbing, pseudonymization and
+    date parsing. Workers return ready-to-insert column batches, and at most queue_size
+    files are parsed ahead of the writer, which bounds the memory held in flight. While
+    the memory governor reports no headroom, no further file is submitted until the
+    writer has taken the files already parsed or being parsed.
+
+    Among the next queue_size files, the largest are submitted first, so the slowest
+    parses start early instead of holding up the end of the run. The writer's next file
+    is always submitted, whatever its size, and results are reassembled into input order,
+    so the database does not depend on which worker finishes first. Streamed files are
+    only validated and quality-checked by a worker; the writer reads their rows itself.
+
+    Results are yielded as callables that return the parsed statement, or raise the
+    error parsing failed with (such as DataQualityError), so the writer handles each
+    file's errors where it processes that file.
+
+    Args:
+        files: Input file paths, each with whether the quality gate applies to it and whether it is streamed
+        workers: Number of parse worker processes (defaults to PARSE_WORKERS)
+        queue_size: Files parsed ahead of the writer (defaults to PARSE_QUEUE_SIZE, or twice the workers)
+        memory_governor: Optional governor asked for headroom before each file is submitted
+
+    Yields:
+        Callables returning the parsed statements, in the order of files
+    """
+    workers = workers or settings.PARSE_WORKERS
+    queue_size = queue_size or settings.PARSE_QUEUE_SIZE or workers * 2
+
+    files = iter(files)
+    # Files taken from the input but not submitted yet, in input order: (position, size, file)
+    upcoming: List[Tuple[int, int, Tuple[str, bool, bool]]] = []
+    # Files submitted but not handed to the writer yet, by input position
+    submitted: Dict[int, Future] = {}
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_parser)
+
+    def submit(entry: Tuple[int, int, Tuple[str, bool, bool]]) -> None:
+        upcoming.remove(entry)
+        position, _, file = entry
+        submitted[position] = executor.submit(_parse_file, *file)
+
+    try:
+        taken = 0
+        for position in count():
+            # Look ahead so the largest of the next files can be started first
+            for file in islice(files, queue_size - len(upcoming)):
+                upcoming.append((taken, _file_size(file[0]), file))
+                taken += 1
+            if position not in submitted:
+                if not upcoming:
+                    return
+                submit(upcoming[0])
+            while upcoming and len(submitted) < queue_size and (memory_governor is None or memory_governor.throttle()):
+                submit(max(upcoming, key=itemgetter(1)))
+            yield submitted.pop(position).result
+    finally:
+        # Files not yet handed to the writer are not parsed if the writer stops early
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,332 @@
+import json
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from refiner.models.refined import TransactionRecord
+from refiner.models.unrefined import CreditStatement, Transaction
+from refiner.transformer.column_batch import ColumnBatch
+from refiner.utils.date import parse_date
+from refiner.utils.json_stream import JSONArrayStream
+from refiner.utils.merchants import MerchantIndex
+from refiner.utils.pii import (
+    sanitize_transaction_description,
+    mask_merchant_location,
+    detect_sensitive_transaction_data
+)
+from refiner.utils.pseudonymize import Pseudonymizer
+from refiner.utils.quality import QUALITY_FIELDS, QualityGate, QualityTally
+from refiner.config import settings
+
+# Fields of an unrefined transaction, each held as one column of a ColumnBatch
+TRANSACTION_FIELDS = tuple(Transaction.model_fields)
+
+
+class StreamedTransactions:
+    """
+    Transactions of a streamed statement file, which are read from the file again, batch
+    by batch, when they are written.
+    """
+
+    __slots__ = ('input_file', 'count')
+
+    def __init__(self, input_file: str, count: int):
+        """
+        Initialize the placeholder.
+
+        Args:
+            input_file: Path to the JSON input file
+            count: Number of transactions in the file
+        """
+        self.input_file = input_file
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class PreparedStatement:
+    """A validated statement with its transactions as ready-to-insert rows."""
+
+    __slots__ = ('statement', 'transactions', 'quality_report', 'pii_detections')
+
+    def __init__(
+        self,
+        statement: CreditStatement,
+        transactions: Union[ColumnBatch, StreamedTransactions],
+        quality_report: Optional[Dict[str, Any]] = None,
+        pii_detections: Optional[List[Tuple[int, List[str]]]] = None
+    ):
+        """
+        Initialize the prepared statement.
+
+        Args:
+            statement: Validated statement, its own transactions list is empty
+            transactions: Sanitized transaction rows of the statement, or the file to read them
+                from with read_transactions if it was streamed
+            quality_report: Quality report if the quality gate was applied
+            pii_detections: Row index and detected PII types of every transaction still holding PII
+        """
+        self.statement = statement
+        self.transactions = transactions
+        self.quality_report = quality_report
+        self.pii_detections = pii_detections or []
+
+
+class StatementParser:
+    """
+    Turns raw credit statement data into a validated statement and sanitized transaction rows.
+
+    Parsing holds no database state, so it can run in parse worker processes while a
+    single writer inserts the rows. PII detections are returned with the statement
+    instead of being recorded, the writer adds them to the run's audit log.
+    """
+
+    def __init__(
+        self,
+        quality_gate: Optional[QualityGate] = None,
+        pseudonymizer: Optional[Pseudonymizer] = None,
+        merchant_index: Optional[MerchantIndex] = None
+    ):
+        """
+        Initialize the parser.
+
+        Args:
+            quality_gate: Optional gate that rejects statements below the quality threshold
+            pseudonymizer: Optional keyed pseudonymizer applied to PSEUDONYMIZE_FIELDS
+            merchant_index: Optional merchant index that canonicalizes names and fills missing categories
+        """
+        self.quality_gate = quality_gate
+        self.pseudonymizer = pseudonymizer
+        self.merchant_index = merchant_index
+        self.pseudonymize_fields = frozenset(settings.PSEUDONYMIZE_FIELDS) if pseudonymizer else frozenset()
+
+    def parse(self, data: Dict[str, Any], check_quality: bool = True) -> PreparedStatement:
+        """
+        Validate a statement and sanitize its transactions.
+
+        Args:
+            data: Dictionary containing credit statement data
+            check_quality: Whether to apply the quality gate
+
+        Returns:
+            The prepared statement
+
+        Raises:
+            DataQualityError: If the statement is below the quality threshold
+        """
+        return self._prepare(*self.validate(data, check_quality))
+
+    def parse_file(self, input_file: str, check_quality: bool = True, streaming: bool = False) -> PreparedStatement:
+        """
+        Read an input file and parse its statement.
+
+        A streamed file is read without holding its text or its transactions: every
+        transaction is validated and quality-checked as it is read, and only the count
+        is kept. The rows are built later by read_transactions, which reads the file
+        again one batch at a time while they are written.
+
+        Args:
+            input_file: Path to the JSON input file
+            check_quality: Whether to apply the quality gate
+            streaming: Validate transactions as they are read, and leave them in the file
+
+        Returns:
+            The prepared statement, holding StreamedTransactions if the file was streamed
+
+        Raises:
+            DataQualityError: If the statement is below the quality threshold
+        """
+        with open(input_file, 'r') as f:
+            if not streaming:
+                return self.parse(json.load(f), check_quality)
+            stream = JSONArrayStream(f)
+            tally = self.quality_gate.tally() if self.quality_gate and check_quality else None
+            try:
+                count = self._scan_transactions(stream, tally)
+            except ValidationError:
+                # Read the whole file so the error locates the failing transaction within the statement
+                f.seek(0)
+                self.parse(json.load(f), check_quality)
+                raise
+        if not stream.found_array:
+            return self.parse(stream.header, check_quality)
+        statement = CreditStatement.model_validate({**stream.header, 'transactions': []})
+        quality_report = self.quality_gate.accept(tally.report(statement)) if tally else None
+        return PreparedStatement(statement, StreamedTransactions(input_file, count), quality_report)
+
+    def read_transactions(
+        self,
+        prepared: PreparedStatement,
+        offset: int,
+        batch_size: Callable[[], int]
+    ) -> Iterator[Tuple[ColumnBatch, List[Tuple[int, List[str]]]]]:
+        """
+        Read the transactions of a streamed statement file, one batch of rows at a time.
+
+        Args:
+            prepared: Statement parsed from the file with streaming
+            offset: Number of leading transactions to skip, written by an earlier attempt
+            batch_size: Called before each batch for the number of transactions to read
+
+        Yields:
+            Sanitized transaction rows of each batch, with the row index (within the batch)
+            and detected PII types of every transaction still holding PII
+        """
+        with open(prepared.transactions.input_file, 'r') as f:
+            raw_transactions = iter(JSONArrayStream(f))
+            deque(islice(raw_transactions, offset), maxlen=0)
+            while True:
+                transactions = self._validate_transactions(islice(raw_transactions, batch_size()))
+                if not len(transactions):
+                    return
+                pii_detections = []
+                rows = self.create_transaction_columns(prepared.statement, transactions, pii_detections)
+                yield rows, pii_detections
+
+    def _scan_transactions(self, raw_transactions: Iterable[Any], tally: Optional[QualityTally]) -> int:
+        """Validate transactions one by one, feeding the quality tally batch by batch, and count them."""
+        batch_size = settings.BATCH_SIZE
+        columns = {name: [] for name in QUALITY_FIELDS}
+        count = 0
+        for raw_transaction in raw_transactions:
+            values = Transaction.model_validate(raw_transaction).__dict__
+            count += 1
+            if tally is None:
+                continue
+            for name in QUALITY_FIELDS:
+                columns[name].append(values[name])
+            if len(columns['amount']) >= batch_size:
+                tally.add(columns)
+                columns = {name: [] for name in QUALITY_FIELDS}
+        if tally is not None and columns['amount']:
+            tally.add(columns)
+        return count
+
+    def _prepare(
+        self,
+        statement: CreditStatement,
+        transactions: ColumnBatch,
+        quality_report: Optional[Dict[str, Any]]
+    ) -> PreparedStatement:
+        """Sanitize the transactions of a validated statement."""
+        pii_detections = []
+        rows = self.create_transaction_columns(statement, transactions, pii_detections)
+        return PreparedStatement(statement, rows, quality_report, pii_detections)
+
+    def validate(
+        self,
+        data: Dict[str, Any],
+        check_quality: bool = True
+    ) -> Tuple[CreditStatement, ColumnBatch, Optional[Dict[str, Any]]]:
+        """
+        Validate raw credit statement data and apply the quality gate.
+
+        Transactions are validated one at a time straight into a column batch, so no
+        list of per-transaction models is kept; the statement's own transactions list
+        is left empty.
+
+        Args:
+            data: Dictionary containing credit statement data
+            check_quality: Whether to apply the quality gate
+
+        Returns:
+            Tuple of (validated credit statement, its transactions as a column batch, quality report or None)
+
+        Raises:
+            DataQualityError: If the statement is below the quality threshold
+        """
+        # Validate data with Pydantic
+        raw_transactions = data.get('transactions')
+        if not isinstance(raw_transactions, list):
+            statement = CreditStatement.model_validate(data)
+            raw_transactions, statement.transactions = statement.transactions, []
+        else:
+            statement = CreditStatement.model_validate({**data, 'transactions': []})
+        try:
+            transactions = self._validate_transactions(raw_transactions)
+        except ValidationError:
+            # Validate the whole statement so the error locates the failing transaction within it
+            CreditStatement.model_validate(data)
+            raise
+
+        return statement, transactions, self._check_quality(statement, transactions, check_quality)
+
+    def _check_quality(
+        self,
+        statement: CreditStatement,
+        transactions: ColumnBatch,
+        check_quality: bool
+    ) -> Optional[Dict[str, Any]]:
+        """Reject low-quality statements before any records are built for them."""
+        if self.quality_gate and check_quality:
+            return self.quality_gate.validate(statement, transactions.columns)
+        return None
+
+    def _validate_transactions(self, raw_transactions: Iterable[Any]) -> ColumnBatch:
+        """Validate transactions one by one, appending their fields to a column batch."""
+        columns = {name: [] for name in TRANSACTION_FIELDS}
+        appends = [(name, columns[name].append) for name in TRANSACTION_FIELDS]
+        for raw_transaction in raw_transactions:
+            values = Transaction.model_validate(raw_transaction).__dict__
+            for name, append in appends:
+                append(values[name])
+        return ColumnBatch(columns)
+
+    def create_transaction_columns(
+        self,
+        statement: CreditStatement,
+        transactions: ColumnBatch,
+        pii_detections: List[Tuple[int, List[str]]]
+    ) -> ColumnBatch:
+        """
+        Create transaction rows with PII protection, column by column.
+
+        Args:
+            statement: Validated credit statement
+            transactions: Validated transactions of the statement
+            pii_detections: Receives the row index and PII types of every description still holding PII
+
+        Returns:
+            Column batch of transaction rows
+        """
+        record_id = statement.statement_metadata.record_id
+        columns = dict(transactions.columns)
+        columns['record_id'] = [record_id] * len(transactions)
+
+        # Sanitize each distinct description once, then detect any remaining PII issues
+        descriptions = transactions['description']
+        sanitized = {description: sanitize_transaction_description(description) for description in dict.fromkeys(descriptions)}
+        pii_detected = {description: detect_sensitive_transaction_data(text) for description, text in sanitized.items()}
+        for index, description in enumerate(descriptions):
+            if pii_detected[description]:
+                # Keep the detection for the security audit
+                pii_detections.append((index, pii_detected[description]))
+        columns['description'] = [sanitized[description] for description in descriptions]
+
+        # Canonicalize merchant names and fill missing categories, matching the sanitized descriptions
+        if self.merchant_index:
+            columns['merchant_name'], columns['category_primary'] = self.merchant_index.enrich(
+                transactions['merchant_name'], columns['description'], transactions['category_primary']
+            )
+
+        # Mask merchant locations while preserving geographic data
+        location_pseudonymizer = self.pseudonymizer if 'location' in self.pseudonymize_fields else None
+        masked_locations = {
+            location: mask_merchant_location(location, location_pseudonymizer) if location else None
+            for location in dict.fromkeys(transactions['location'])
+        }
+        columns['location'] = [masked_locations[location] for location in transactions['location']]
+
+        # Pseudonymize identifier columns in one pass, hashing each distinct value once
+        if 'merchant_id' in self.pseudonymize_fields:
+            columns['merchant_id'] = self.pseudonymizer.pseudonymize_column(transactions['merchant_id'])
+
+        # Parse each distinct date once
+        for name in ('transaction_date', 'posting_date'):
+            parsed_dates = {value: parse_date(value) for value in dict.fromkeys(transactions[name])}
+            columns[name] = [parsed_dates[value] for value in transactions[name]]
+
+        return ColumnBatch(columns, TransactionRecord.__table__)
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from refiner.config import settings
+from refiner.utils.pseudonymize import Pseudonymizer
+
+
+class PIIAuditLog:
+    """
+    Collects PII detections of a refinement run in memory.
+
+    Detections are counted per PII type and per statement, and a bounded reservoir
+    sample of examples is kept. Examples reference transactions by a digest, never by
+    their raw identifier or description. Progress is logged at most once per
+    PII_AUDIT_LOG_INTERVAL seconds, and report() returns one summary for the run.
+    """
+
+    def __init__(
+        self,
+        max_examples: Optional[int] = None,
+        log_interval: Optional[float] = None,
+        pseudonymizer: Optional[Pseudonymizer] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize the audit log.
+
+        Args:
+            max_examples: Number of example detections to keep (defaults to PII_AUDIT_MAX_EXAMPLES)
+            log_interval: Minimum seconds between progress log lines (defaults to PII_AUDIT_LOG_INTERVAL)
+            pseudonymizer: Optional keyed pseudonymizer for example references, unkeyed BLAKE2b otherwise
+            seed: Optional seed of the example sampler
+        """
+        self.max_examples = max_examples if max_examples is not None else settings.PII_AUDIT_MAX_EXAMPLES
+        self.log_interval = log_interval if log_interval is not None else settings.PII_AUDIT_LOG_INTERVAL
+        self.pseudonymizer = pseudonymizer
+        self._random = random.Random(seed)
+
+        self.by_type: Counter = Counter()
+        self.by_statement: Dict[str, Counter] = {}
+        self.flagged = 0
+        self.examples: List[Dict[str, Any]] = []
+        self._last_logged = 0.0
+        self._unlogged = 0
+
+    def _reference(self, identifier: str) -> str:
+        """Return a reference to an identifier that is safe to log."""
+        if self.pseudonymizer:
+            return self.pseudonymizer.pseudonymize(identifier)
+        return hashlib.blake2b(identifier.encode(), digest_size=8).hexdigest()
+
+    def record(self, record_id: str, pii_types: List[str], subject_id: Optional[str] = None) -> None:
+        """
+        Record the PII detected in one field.
+
+        Args:
+            record_id: Statement the field belongs to
+            pii_types: Detected PII types
+            subject_id: Optional identifier of the transaction or record the field belongs to
+        """
+        self.flagged += 1
+        self.by_type.update(pii_types)
+        self.by_statement.setdefault(record_id, Counter()).update(pii_types)
+
+        # Reservoir sampling keeps a uniform sample of all detections in bounded memory
+        if len(self.examples) < self.max_examples:
+            slot = len(self.examples)
+            self.examples.append(None)
+        else:
+            slot = self._random.randrange(self.flagged)
+        if slot < self.max_examples:
+            self.examples[slot] = {
+                'reference': self._reference(subject_id) if subject_id else None,
+                'pii_types': list(pii_types),
+            }
+
+        self._unlogged += 1
+        now = time.monotonic()
+        if now - self._last_logged >= self.log_interval:
+            logging.warning(
+                f"PII detected in {self._unlogged} more fields ({self.flagged} so far): {dict(self.by_type)}"
+            )
+            self._last_logged = now
+            self._unlogged = 0
+
+    def report(self) -> Dict[str, Any]:
+        """Return the audit summary for the run."""
+        return {
+            'flagged_fields': self.flagged,
+            'by_type': dict(self.by_type),
+            'by_statement': {record_id: dict(counts) for record_id, counts in self.by_statement.items()},
+            'examples': self.examples,
+        }
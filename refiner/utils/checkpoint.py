@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+# Stages of a refinement run after the database is built, in order
+STAGE_DB_BUILT = 'db_built'
+STAGE_SCHEMA_UPLOADED = 'schema_uploaded'
+STAGE_ENCRYPTED = 'encrypted'
+STAGE_DB_UPLOADED = 'db_uploaded'
+STAGE_COLUMNAR_UPLOADED = 'columnar_uploaded'
+
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    Return a SHA-256 fingerprint of a file's contents, read in chunks.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Durable progress journal of a refinement run.
+
+    Records, per input file, how many transactions have been committed to the database,
+    and which stages of the run (database built, schema uploaded, encrypted, database
+    uploaded, columnar export uploaded) have completed together with their results.
+    Every update is written atomically, so a run killed at any point can continue from
+    the last durable state.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Open the journal.
+
+        Args:
+            path: Path of the journal file
+            resume: Whether to continue from an existing journal instead of starting a new one
+        """
+        self.path = path
+        self.state: Dict[str, Any] = {'files': {}, 'stages': {}}
+        if resume and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+            logging.info(f"Resuming from checkpoint {path}")
+        else:
+            self.save()
+
+    @property
+    def has_progress(self) -> bool:
+        """Whether an earlier attempt already committed anything to the database."""
+        return bool(self.state['files'] or self.state['stages'])
+
+    def save(self) -> None:
+        """Atomically write the journal to disk."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def file_entry(self, filename: str, fingerprint: str) -> Dict[str, Any]:
+        """
+        Return the progress entry of an input file, creating it if needed.
+
+        Args:
+            filename: Name of the input file
+            fingerprint: Fingerprint of the file's current contents
+
+        Returns:
+            The file's entry with its committed transaction offset
+
+        Raises:
+            ValueError: If the file changed since it was partially or fully refined
+        """
+        entry = self.state['files'].get(filename)
+        if entry is None:
+            entry = {'fingerprint': fingerprint, 'statement_saved': False, 'offset': 0, 'done': False}
+            self.state['files'][filename] = entry
+        elif entry['fingerprint'] != fingerprint:
+            raise ValueError(f"Input file {filename} changed since the checkpoint was written, run without resume")
+        return entry
+
+    def record_progress(self, filename: str, offset: int, **details: Any) -> None:
+        """
+        Record that a file's statement records and its first transactions are committed.
+
+        Args:
+            filename: Name of the input file
+            offset: Number of the file's transactions committed so far
+            details: Additional values to store in the file's entry
+        """
+        entry = self.state['files'][filename]
+        entry.update(details, statement_saved=True, offset=offset)
+        self.save()
+
+    def complete_file(self, filename: str, **details: Any) -> None:
+        """
+        Record that a file is fully refined (or deliberately skipped).
+
+        Args:
+            filename: Name of the input file
+            details: Additional values to store in the file's entry
+        """
+        self.state['files'][filename].update(details, done=True)
+        self.save()
+
+    def complete_files(self, details_by_file: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Record that several files committed together are fully refined, in one journal write.
+
+        Args:
+            details_by_file: Additional values to store in each file's entry, by file name
+        """
+        for filename, details in details_by_file.items():
+            self.state['files'][filename].update(details, done=True)
+        self.save()
+
+    def stage(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the recorded result of a completed stage.
+
+        Args:
+            name: Stage name
+
+        Returns:
+            The stage's result, or None if it has not completed
+        """
+        return self.state['stages'].get(name)
+
+    def complete_stage(self, name: str, **result: Any) -> None:
+        """
+        Record that a stage completed.
+
+        Args:
+            name: Stage name
+            result: Values produced by the stage, e.g. an IPFS hash
+        """
+        self.state['stages'][name] = result
+        self.save()
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Table, inspect, select
+from sqlalchemy.engine import Engine
+
+from refiner.config import settings
+from refiner.models.refined import Base
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+
+def arrow_type(column) -> Any:
+    """
+    Map a SQLAlchemy column to the Arrow type it is exported as.
+    JSON columns are exported as their serialized text.
+
+    Args:
+        column: SQLAlchemy column
+
+    Returns:
+        Arrow data type
+    """
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+class ColumnarExporter:
+    """
+    Writes the refined tables to Parquet files alongside the libSQL database.
+
+    Rows are captured column by column as the transformer writes them, so no second
+    pass over the database is needed. Each table is written with dictionary encoding
+    in row groups of BATCH_SIZE rows, so at most one row group per table is buffered.
+    """
+
+    def __init__(self, output_dir: str, row_group_size: Optional[int] = None, compression: Optional[str] = None):
+        """
+        Initialize the exporter.
+
+        Args:
+            output_dir: Directory the Parquet files are written to
+            row_group_size: Rows per row group (defaults to BATCH_SIZE)
+            compression: Parquet compression codec (defaults to COLUMNAR_EXPORT_COMPRESSION)
+        """
+        if pa is None:
+            raise ImportError("Columnar export requires pyarrow, install it with `pip install pyarrow`")
+
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size or settings.BATCH_SIZE
+        self.compression = compression or settings.COLUMNAR_EXPORT_COMPRESSION
+        # Set when rows were changed in place, so the captured rows no longer match the database
+        self.stale = False
+
+        self.tables: Dict[str, Table] = dict(Base.metadata.tables)
+        self.schemas = {
+            name: pa.schema([pa.field(column.name, arrow_type(column)) for column in table.columns])
+            for name, table in self.tables.items()
+        }
+        self._buffers: Dict[str, Dict[str, List[Any]]] = {}
+        self._writers: Dict[str, Any] = {}
+        self.row_counts: Dict[str, int] = {}
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def path(self, table_name: str) -> str:
+        """Return the Parquet file path of a table."""
+        return os.path.join(self.output_dir, f"{table_name}.parquet")
+
+    def add(self, models: Iterable[Base]) -> None:
+        """
+        Capture written model instances.
+
+        Args:
+            models: Model instances as they are written to the database
+        """
+        for model in models:
+            table = model.__table__
+            self._append(table.name, {column.name: getattr(model, column.key) for column in table.columns})
+
+    def add_columns(self, table_name: str, columns: Dict[str, List[Any]]) -> None:
+        """
+        Capture written rows given as columns.
+
+        Args:
+            table_name: Table the rows were written to
+            columns: Values per column name
+        """
+        buffer = self._buffer(table_name)
+        for name, values in buffer.items():
+            values.extend(json.dumps(value) if isinstance(value, (dict, list)) else value for value in columns[name])
+        if len(next(iter(buffer.values()))) >= self.row_group_size:
+            self._write_row_group(table_name)
+
+    def _buffer(self, table_name: str) -> Dict[str, List[Any]]:
+        """Return a table's column buffers, creating them on first use."""
+        buffer = self._buffers.get(table_name)
+        if buffer is None:
+            buffer = {name: [] for name in self.schemas[table_name].names}
+            self._buffers[table_name] = buffer
+        return buffer
+
+    def _append(self, table_name: str, row: Dict[str, Any]) -> None:
+        """Append one row to a table's column buffers, writing a row group when full."""
+        buffer = self._buffer(table_name)
+        for name, values in buffer.items():
+            value = row[name]
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            values.append(value)
+        if len(next(iter(buffer.values()))) >= self.row_group_size:
+            self._write_row_group(table_name)
+
+    def _write_row_group(self, table_name: str) -> None:
+        """Write a table's buffered rows as one row group."""
+        buffer = self._buffers.get(table_name)
+        if not buffer or not next(iter(buffer.values())):
+            return
+
+        schema = self.schemas[table_name]
+        batch = pa.Table.from_pydict(buffer, schema=schema)
+        writer = self._writers.get(table_name)
+        if writer is None:
+            writer = pq.ParquetWriter(
+                self.path(table_name), schema, compression=self.compression, use_dictionary=True
+            )
+            self._writers[table_name] = writer
+        writer.write_table(batch, row_group_size=self.row_group_size)
+        self.row_counts[table_name] = self.row_counts.get(table_name, 0) + batch.num_rows
+        for values in buffer.values():
+            values.clear()
+
+    def rebuild_from_database(self, engine: Engine) -> None:
+        """
+        Discard the captured rows and export the tables from the database instead.
+        Used when the captured rows are incomplete (a resumed run) or stale (merged duplicates).
+
+        Args:
+            engine: Engine bound to the refined database
+        """
+        self._discard()
+        existing_tables = set(inspect(engine).get_table_names())
+        with engine.connect() as connection:
+            for name, table in self.tables.items():
+                if name not in existing_tables:
+                    continue
+                result = connection.execution_options(yield_per=self.row_group_size).execute(select(table))
+                for row in result.mappings():
+                    self._append(name, row)
+        self.stale = False
+
+    def _discard(self) -> None:
+        """Close and remove everything written so far."""
+        for name, writer in self._writers.items():
+            writer.close()
+            os.remove(self.path(name))
+        self._writers = {}
+        self._buffers = {}
+        self.row_counts = {}
+
+    def close(self) -> Dict[str, str]:
+        """
+        Write the remaining rows and close all files.
+
+        Returns:
+            Parquet file path per exported table
+        """
+        for name in list(self._buffers):
+            self._write_row_group(name)
+        paths = {}
+        for name, writer in self._writers.items():
+            writer.close()
+            paths[name] = self.path(name)
+            logging.info(f"Exported {self.row_counts[name]} rows of {name} to {paths[name]}")
+        self._writers = {}
+        return paths
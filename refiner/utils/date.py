@@ -1,8 +1,26 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
 
 def parse_timestamp(timestamp):
     """Parse a timestamp to a datetime object."""
     if isinstance(timestamp, int):
         return datetime.fromtimestamp(timestamp / 1000.0)
-    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
\ No newline at end of file
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+def parse_date(date_str: Optional[str]) -> Optional[date]:
+    """Parse an ISO date or timestamp string to a date object, None if it cannot be parsed."""
+    if not date_str:
+        return None
+    
+    try:
+        # Try parsing as ISO date first
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+    except ValueError:
+        try:
+            # Try parsing as date only
+            return datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            # Return None if unable to parse
+            return None
\ No newline at end of file
@@ -0,0 +1,252 @@
+import base64
+import hashlib
+import logging
+import math
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from refiner.config import settings
+
+BLOOM_FILTER_MAGIC = b'RBF1'
+BLOOM_FILTER_HEADER = struct.Struct('<4sQQQ')
+
+# Number of recent IDs kept in a hash set before they are compacted into the sorted array
+RECENT_IDS_COMPACTION_THRESHOLD = 65536
+
+
+def id_digest(value: str) -> int:
+    """Return a 64-bit digest of an identifier."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of identifiers.
+    Membership tests can return false positives at the configured error rate but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Initialize an empty filter sized for the expected number of identifiers.
+
+        Args:
+            capacity: Expected number of identifiers
+            error_rate: Target false positive rate
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        """Yield the bit positions for a value using double hashing."""
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> None:
+        """Add a value to the filter."""
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable form of the filter, readable with from_dict()."""
+        return {
+            'size': self.size,
+            'hash_count': self.hash_count,
+            'count': self.count,
+            'bits': base64.b64encode(bytes(self.bits)).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BloomFilter':
+        """
+        Rebuild a filter from to_dict() output.
+
+        Args:
+            data: Serialized filter
+
+        Returns:
+            The filter
+        """
+        bloom = cls.__new__(cls)
+        bloom.size = data['size']
+        bloom.hash_count = data['hash_count']
+        bloom.count = data['count']
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        return bloom
+
+    def save(self, path: str) -> None:
+        """
+        Atomically write the filter to disk.
+
+        Args:
+            path: Path of the filter file
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(BLOOM_FILTER_HEADER.pack(BLOOM_FILTER_MAGIC, self.size, self.hash_count, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BloomFilter':
+        """
+        Read a filter previously written with save().
+
+        Args:
+            path: Path of the filter file
+
+        Returns:
+            The loaded filter
+        """
+        with open(path, 'rb') as f:
+            magic, size, hash_count, count = BLOOM_FILTER_HEADER.unpack(f.read(BLOOM_FILTER_HEADER.size))
+            if magic != BLOOM_FILTER_MAGIC:
+                raise ValueError(f"Not a bloom filter file: {path}")
+            bloom = cls.__new__(cls)
+            bloom.size = size
+            bloom.hash_count = hash_count
+            bloom.count = count
+            bloom.bits = bytearray(f.read())
+        return bloom
+
+
+class TransactionDeduplicator:
+    """
+    Detects duplicate transactions within a refinement run and, optionally, across runs.
+
+    In-run duplicates are found by comparing 64-bit digests of the transaction IDs,
+    held in a small hash set that is periodically compacted into a sorted NumPy array
+    (8 bytes per ID). The IDs themselves are not kept, so two distinct IDs with the same
+    digest are taken for duplicates; with 100 million IDs in a run, the chance of any
+    such collision is about 3 in 10,000. Cross-run duplicates are found with a persisted
+    bloom filter, saved only once the refinement is published.
+    """
+
+    POLICIES = ('drop', 'merge')
+
+    def __init__(self, policy: Optional[str] = None, filter_path: Optional[str] = None):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            policy: 'drop' keeps the first occurrence, 'merge' lets later non-null values override earlier ones
+            filter_path: Optional path of the persisted bloom filter used for cross-run dedup
+        """
+        self.policy = (policy or settings.DUPLICATE_POLICY).lower()
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unsupported duplicate policy: {self.policy}")
+
+        self.filter_path = filter_path if filter_path is not None else settings.DEDUP_FILTER_PATH
+        self.bloom = None
+        if self.filter_path:
+            if os.path.exists(self.filter_path):
+                self.bloom = BloomFilter.load(self.filter_path)
+            else:
+                self.bloom = BloomFilter(settings.DEDUP_FILTER_CAPACITY, settings.DEDUP_FILTER_ERROR_RATE)
+
+        self._seen_sorted = np.empty(0, dtype=np.uint64)
+        self._seen_recent = set()
+        self.in_run_duplicates = 0
+        self.cross_run_duplicates = 0
+
+    def _seen(self, digest: int) -> bool:
+        """Check whether a digest was already seen in this run."""
+        if digest in self._seen_recent:
+            return True
+        if self._seen_sorted.size:
+            index = np.searchsorted(self._seen_sorted, np.uint64(digest))
+            return index < self._seen_sorted.size and int(self._seen_sorted[index]) == digest
+        return False
+
+    def _remember(self, digest: int) -> None:
+        """Add a digest to the in-run set, compacting it when it grows large."""
+        self._seen_recent.add(digest)
+        if len(self._seen_recent) >= RECENT_IDS_COMPACTION_THRESHOLD:
+            recent = np.fromiter(self._seen_recent, dtype=np.uint64, count=len(self._seen_recent))
+            self._seen_sorted = np.union1d(self._seen_sorted, recent)
+            self._seen_recent = set()
+
+    def seed(self, identifiers: Iterable[str]) -> None:
+        """
+        Mark identifiers already written by an interrupted attempt of this run as seen.
+        They are also added to the bloom filter, which is only saved once the refinement is uploaded.
+
+        Args:
+            identifiers: Identifiers of the rows already in the database
+        """
+        for identifier in identifiers:
+            self._remember(id_digest(identifier))
+            if self.bloom is not None and identifier not in self.bloom:
+                self.bloom.add(identifier)
+
+    def partition_keys(self, keys: Sequence[str]) -> Tuple[List[int], List[int], List[Tuple[int, int]]]:
+        """
+        Split a column of identifiers into rows to insert and rows to merge into already written rows.
+
+        Args:
+            keys: Identifiers of the rows, in input order
+
+        Returns:
+            Tuple of (indices to insert, indices to merge into existing rows, and (target, source)
+            index pairs of in-run duplicates whose non-null values must be copied onto the kept row,
+            in the order they must be applied; empty unless the policy is 'merge')
+        """
+        fresh = {}
+        merges = {}
+        folds = []
+        for index, record_key in enumerate(keys):
+            if record_key in fresh or record_key in merges:
+                self.in_run_duplicates += 1
+                if self.policy == 'merge':
+                    folds.append((fresh[record_key] if record_key in fresh else merges[record_key], index))
+                continue
+
+            digest = id_digest(record_key)
+            if self._seen(digest):
+                self.in_run_duplicates += 1
+                if self.policy == 'merge':
+                    merges[record_key] = index
+                continue
+
+            in_filter = self.bloom is not None and record_key in self.bloom
+            if in_filter:
+                self.cross_run_duplicates += 1
+                if self.policy == 'drop':
+                    continue
+
+            self._remember(digest)
+            if self.bloom is not None and not in_filter:
+                self.bloom.add(record_key)
+            fresh[record_key] = index
+
+        return list(fresh.values()), list(merges.values()), folds
+
+    def save(self) -> None:
+        """
+        Persist the bloom filter with this run's identifiers.
+        Call this only once the refinement holding them is uploaded, otherwise a retry of
+        a failed run would take all of its transactions for cross-run duplicates.
+        """
+        if self.bloom is None:
+            return
+        self.bloom.save(self.filter_path)
+        logging.info(f"Saved duplicate filter with {self.bloom.count} identifiers to {self.filter_path}")
+
+    def report(self) -> Dict[str, Any]:
+        """Return duplicate counts for the run."""
+        return {
+            'policy': self.policy,
+            'in_run_duplicates': self.in_run_duplicates,
+            'cross_run_duplicates': self.cross_run_duplicates,
+        }
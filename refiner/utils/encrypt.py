@@ -1,12 +1,100 @@
 import pgpy
-from pgpy.constants import CompressionAlgorithm, HashAlgorithm
+from pgpy.constants import CompressionAlgorithm, HashAlgorithm, SymmetricKeyAlgorithm
+from pgpy.packet.packets import IntegrityProtectedSKEDataV1, SKESessionKeyV4
+import copy
+import hashlib
 import os
+from typing import Dict, Optional, Tuple
 from refiner.config import settings
+from refiner.utils.openpgp import OpenPGPError, iter_decrypted
+
+
+class EncryptionContext:
+    """Encrypts any number of files with one passphrase, deriving its key only once.
+
+    The iterated and salted S2K derivation, which hashes tens of megabytes, runs once
+    per context with a fresh salt. Every file then gets a version 4 SKESK packet without
+    an encrypted session key, so the derived key is the message key (the layout that
+    `gpg --symmetric` writes), followed by an integrity protected data packet. Each
+    message starts with its own random prefix, so no two files share a keystream.
+
+    The derived key is only held in memory, for the lifetime of the context.
+    Use one context per run and encryption key.
+    """
+
+    def __init__(self, encryption_key: str):
+        """Derive the key for a passphrase.
+
+        Args:
+            encryption_key: The passphrase to encrypt with
+        """
+        self.encryption_key = encryption_key
+        self.cipher = SymmetricKeyAlgorithm.AES256
+
+        skesk = SKESessionKeyV4()
+        skesk.s2k.usage = 255
+        skesk.s2k.specifier = 3
+        skesk.s2k.halg = HashAlgorithm.SHA512
+        skesk.s2k.encalg = self.cipher
+        skesk.s2k.count = skesk.s2k.halg.tuned_count
+        skesk.s2k.salt = bytearray(os.urandom(8))
+        skesk.update_hlen()
+        self._skesk = skesk
+        self._key = skesk.s2k.derive_key(encryption_key)
+
+        # Session keys that verification derived from the passphrase, by SKESK packet body.
+        # It never holds the key derived above, so every verification proves that the
+        # passphrase alone decrypts the file; only the first one pays for the S2K.
+        self.verified_session_keys: Dict[bytes, Tuple[int, bytes]] = {}
+
+    def encrypt_file(self, file_path: str, output_path: Optional[str] = None) -> str:
+        """Symmetrically encrypts a file with the context's key.
+
+        Args:
+            file_path: Path to the file to encrypt
+            output_path: Optional path to save encrypted file (defaults to file_path + .pgp)
+
+        Returns:
+            Path to encrypted file
+        """
+        if output_path is None:
+            output_path = f"{file_path}.pgp"
+
+        with open(file_path, 'rb') as f:
+            buffer = f.read()
+
+        message = pgpy.PGPMessage.new(buffer, compression=CompressionAlgorithm.ZLIB)
+        encrypted_data = IntegrityProtectedSKEDataV1()
+        encrypted_data.encrypt(self._key, self.cipher, message.__bytes__())
+        encrypted_message = pgpy.PGPMessage() | copy.copy(self._skesk)
+        encrypted_message |= encrypted_data
+
+        with open(output_path, 'wb') as f:
+            f.write(str(encrypted_message).encode())
+
+        return output_path
+
+    def verify_file(self, file_path: str, expected_sha256: str) -> None:
+        """Checks that a file encrypted with this context decrypts back to the expected content.
+
+        The file is decrypted from the passphrase, not with the context's derived key, so
+        this also checks that the key a reader derives from the passphrase opens it.
+
+        Args:
+            file_path: Path to the encrypted file
+            expected_sha256: Hex SHA-256 digest of the original file
+
+        Raises:
+            OpenPGPError: If the file cannot be decrypted or does not match the expected hash
+        """
+        verify_encrypted_file(self.encryption_key, file_path, expected_sha256, self.verified_session_keys)
 
 
 def encrypt_file(encryption_key: str, file_path: str, output_path: str = None) -> str:
     """Symmetrically encrypts a file with an encryption key.
 
+    To encrypt several files with the same key, use one EncryptionContext instead.
+
     Args:
         encryption_key: The passphrase to encrypt with
         file_path: Path to the file to encrypt
@@ -15,21 +103,7 @@ def encrypt_file(encryption_key: str, file_path: str, output_path: str = None) -
     Returns:
         Path to encrypted file
     """
-    if output_path is None:
-        output_path = f"{file_path}.pgp"
-    
-    with open(file_path, 'rb') as f:
-        buffer = f.read()
-    
-    message = pgpy.PGPMessage.new(buffer, compression=CompressionAlgorithm.ZLIB)
-    encrypted_message = message.encrypt(
-        passphrase=encryption_key, hash=HashAlgorithm.SHA512
-    )
-    
-    with open(output_path, 'wb') as f:
-        f.write(str(encrypted_message).encode())
-    
-    return output_path
+    return EncryptionContext(encryption_key).encrypt_file(file_path, output_path)
 
 
 def decrypt_file(encryption_key: str, file_path: str, output_path: str = None) -> str:
@@ -60,6 +134,32 @@ def decrypt_file(encryption_key: str, file_path: str, output_path: str = None) -
     
     return output_path
 
+def verify_encrypted_file(
+    encryption_key: str,
+    file_path: str,
+    expected_sha256: str,
+    session_keys: Optional[Dict[bytes, Tuple[int, bytes]]] = None
+) -> None:
+    """Checks that an encrypted file decrypts back to content with the expected hash.
+
+    Decryption is streamed through a running SHA-256, so memory use is constant
+    and nothing is written to disk.
+
+    Args:
+        encryption_key: The passphrase the file was encrypted with
+        file_path: Path to the encrypted file
+        expected_sha256: Hex SHA-256 digest of the original file
+        session_keys: Optional cache of session keys, filled by deriving them from encryption_key
+
+    Raises:
+        OpenPGPError: If the file cannot be decrypted or does not match the expected hash
+    """
+    digest = hashlib.sha256()
+    for chunk in iter_decrypted(encryption_key, file_path, session_keys):
+        digest.update(chunk)
+    if digest.hexdigest() != expected_sha256:
+        raise OpenPGPError(f"Encrypted file {file_path} does not decrypt to the original content")
+
 # Test with: python -m refiner.utils.encrypt
 if __name__ == "__main__":
     plaintext_db = os.path.join(settings.OUTPUT_DIR, "db.libsql")
@@ -69,4 +169,9 @@ if __name__ == "__main__":
     print(f"File encrypted to: {encrypted_path}")
     
     decrypted_path = decrypt_file(settings.REFINEMENT_ENCRYPTION_KEY, encrypted_path)
-    print(f"File decrypted to: {decrypted_path}")
\ No newline at end of file
+    print(f"File decrypted to: {decrypted_path}")
+    
+    # Verify without decrypting to disk
+    with open(plaintext_db, 'rb') as f:
+        verify_encrypted_file(settings.REFINEMENT_ENCRYPTION_KEY, encrypted_path, hashlib.sha256(f.read()).hexdigest())
+    print("Encrypted file verified")
\ No newline at end of file
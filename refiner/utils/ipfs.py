@@ -4,8 +4,11 @@ import os
 import requests
 from refiner.config import settings
 
-PINATA_FILE_API_ENDPOINT = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-PINATA_JSON_API_ENDPOINT = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+PINATA_FILE_API_PATH = "/pinning/pinFileToIPFS"
+PINATA_JSON_API_PATH = "/pinning/pinJSONToIPFS"
+
+# Shared HTTP session so repeated uploads reuse pooled keep-alive connections
+session = requests.Session()
 
 def upload_json_to_ipfs(data):
     """
@@ -23,8 +26,8 @@ def upload_json_to_ipfs(data):
     }
 
     try:
-        response = requests.post(
-            PINATA_JSON_API_ENDPOINT,
+        response = session.post(
+            f"{settings.PINATA_API_URL.rstrip('/')}{PINATA_JSON_API_PATH}",
             data=json.dumps(data),
             headers=headers
         )
@@ -64,8 +67,8 @@ def upload_file_to_ipfs(file_path=None):
             files = {
                 'file': file
             }
-            response = requests.post(
-                PINATA_FILE_API_ENDPOINT,
+            response = session.post(
+                f"{settings.PINATA_API_URL.rstrip('/')}{PINATA_FILE_API_PATH}",
                 files=files,
                 headers=headers
             )
@@ -0,0 +1,115 @@
+import json
+import re
+from typing import Any, Dict, Iterator, TextIO
+
+# Characters read from the file at a time
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayStream:
+    """
+    Incremental reader of a JSON object holding one large array.
+
+    The elements of the array are yielded one at a time while every other top-level
+    value is collected into header, so a statement file is never held in memory as
+    text or as a list of raw transactions. Only the current chunk and the value being
+    decoded are buffered.
+    """
+
+    def __init__(self, file: TextIO, array_key: str = 'transactions', chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Initialize the stream.
+
+        Args:
+            file: Text file positioned at the start of the JSON object
+            array_key: Top-level key of the array to stream
+            chunk_size: Characters read from the file at a time
+        """
+        self.file = file
+        self.array_key = array_key
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.found_array = False
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the unread part of the buffer, False at the end of the file."""
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it, '' at the end of the file."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def _expect(self, characters: str) -> str:
+        """Consume the next non-whitespace character, which must be one of characters."""
+        character = self._peek()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} in JSON stream, found {character or 'end of file'!r}")
+        self._pos += 1
+        return character
+
+    def _value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # The value continues in the next chunk
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Yield the elements of the array.
+
+        The rest of the object is read once the array is exhausted, so header is
+        complete when iteration ends.
+
+        Raises:
+            ValueError: If the file is not a JSON object
+            json.JSONDecodeError: If a value is malformed
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key in JSON stream, found {key!r}")
+            self._expect(':')
+            if key == self.array_key and self._peek() == '[':
+                self.found_array = True
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.header[key] = self._value()
+            if self._expect(',}') == '}':
+                return
@@ -0,0 +1,171 @@
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+from typing import Any, Dict, Optional
+
+from refiner.config import settings
+
+BYTES_PER_MB = 1024 * 1024
+
+# Fractions of the memory budget at which batches shrink, grow and reading ahead of the writer stops
+SHRINK_THRESHOLD = 0.85
+GROW_THRESHOLD = 0.5
+BACKPRESSURE_THRESHOLD = 0.95
+
+
+def current_rss_mb() -> float:
+    """
+    Return the resident set size of the current process in MB.
+    Reads /proc/self/statm where available and falls back to the peak RSS reported by getrusage.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / BYTES_PER_MB
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return max_rss / BYTES_PER_MB if sys.platform == 'darwin' else max_rss / 1024
+
+
+def children_rss_mb() -> float:
+    """
+    Return the combined resident set size of the live child processes, such as parse workers, in MB.
+    Reads the children of every thread from /proc; where that is unavailable, children are not counted.
+    """
+    try:
+        threads = os.listdir('/proc/self/task')
+    except OSError:
+        return 0.0
+    resident_pages = 0
+    for thread in threads:
+        try:
+            with open(f'/proc/self/task/{thread}/children', 'r') as f:
+                children = f.read().split()
+        except OSError:
+            continue
+        for child in children:
+            try:
+                with open(f'/proc/{child}/statm', 'r') as f:
+                    resident_pages += int(f.read().split()[1])
+            except (OSError, ValueError, IndexError):
+                # The child exited since it was listed
+                continue
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / BYTES_PER_MB
+
+
+class MemoryGovernor:
+    """
+    Keeps a refinement run under MAX_MEMORY_USAGE_MB.
+
+    The governor samples the RSS of this process and of its parse worker processes (and
+    optionally tracemalloc) whenever a stage asks for its next batch size, shrinking
+    batches when usage approaches the budget and growing them again when there is
+    headroom. Input readers call throttle() before pulling more data. It never blocks:
+    only the writer frees the rows in flight, so waiting could not bring usage down.
+    Instead readers running ahead of the writer stop reading ahead while it reports no
+    headroom, and the batch size is halved.
+    """
+
+    def __init__(
+        self,
+        budget_mb: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        use_tracemalloc: Optional[bool] = None
+    ):
+        """
+        Initialize the governor.
+
+        Args:
+            budget_mb: Memory budget in MB (defaults to MAX_MEMORY_USAGE_MB)
+            batch_size: Initial batch size (defaults to BATCH_SIZE)
+            use_tracemalloc: Whether to also track Python heap allocations (defaults to MEMORY_TRACEMALLOC)
+        """
+        self.budget_mb = budget_mb or settings.MAX_MEMORY_USAGE_MB
+        initial_batch_size = batch_size or settings.BATCH_SIZE
+        self.min_batch_size = max(1, initial_batch_size // 10)
+        self.max_batch_size = initial_batch_size * 10
+        self._batch_size = initial_batch_size
+
+        self.use_tracemalloc = settings.MEMORY_TRACEMALLOC if use_tracemalloc is None else use_tracemalloc
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.high_water_rss_mb = 0.0
+        self.high_water_heap_mb = 0.0
+        self.batch_resizes = 0
+        self.throttle_events = 0
+
+    @property
+    def batch_size(self) -> int:
+        """Current effective batch size."""
+        return self._batch_size
+
+    def sample(self) -> float:
+        """
+        Sample memory usage and update the high-water marks.
+
+        Returns:
+            Current RSS of this process and its child processes in MB
+        """
+        rss_mb = current_rss_mb() + children_rss_mb()
+        self.high_water_rss_mb = max(self.high_water_rss_mb, rss_mb)
+        if self.use_tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            self.high_water_heap_mb = max(self.high_water_heap_mb, peak / BYTES_PER_MB)
+        return rss_mb
+
+    def next_batch_size(self) -> int:
+        """
+        Sample memory usage and adapt the batch size to it.
+
+        Returns:
+            Batch size to use for the next batch
+        """
+        usage = self.sample() / self.budget_mb
+        if usage > SHRINK_THRESHOLD:
+            self._resize(max(self.min_batch_size, self._batch_size // 2))
+        elif usage < GROW_THRESHOLD:
+            self._resize(min(self.max_batch_size, int(self._batch_size * 1.5)))
+        return self._batch_size
+
+    def _resize(self, batch_size: int) -> None:
+        """Set the batch size, counting the change."""
+        if batch_size != self._batch_size:
+            self.batch_resizes += 1
+            self._batch_size = batch_size
+
+    def throttle(self) -> bool:
+        """
+        Apply backpressure before more input is read.
+        Above the budget, garbage is collected and, if that does not bring usage back under
+        it, the batch size is halved.
+
+        Returns:
+            True if there is headroom for more input, False if readers running ahead of the
+            writer should hand it what they already read before reading more
+        """
+        if self.sample() < self.budget_mb * BACKPRESSURE_THRESHOLD:
+            return True
+        gc.collect()
+        if self.sample() < self.budget_mb * BACKPRESSURE_THRESHOLD:
+            return True
+        self.throttle_events += 1
+        self._resize(max(self.min_batch_size, self._batch_size // 2))
+        return False
+
+    def report(self) -> Dict[str, Any]:
+        """Return the memory high-water marks and governor activity for the run."""
+        self.sample()
+        report = {
+            'budget_mb': self.budget_mb,
+            'high_water_rss_mb': round(self.high_water_rss_mb, 2),
+            'final_batch_size': self._batch_size,
+            'batch_resizes': self.batch_resizes,
+            'throttle_events': self.throttle_events,
+        }
+        if self.use_tracemalloc:
+            report['high_water_heap_mb'] = round(self.high_water_heap_mb, 2)
+        return report
@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from refiner.config import settings
+
+# Merchant dictionary bundled with the refiner
+DEFAULT_DICTIONARY_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'data', 'merchants.json'))
+
+INDEX_MAGIC = b'RFMI'
+INDEX_VERSION = 1
+# Magic, version, dictionary SHA-256, state count, edge count, entries size
+INDEX_HEADER = struct.Struct('<4sI32sIII')
+NO_ENTRY = 0xFFFFFFFF
+
+_NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]+')
+_SINGLE_BYTES = [bytes([byte]) for byte in range(256)]
+
+# Indexes loaded by this process, by (dictionary path, index path)
+_indexes: Dict[Tuple[str, str], 'MerchantIndex'] = {}
+
+
+def normalize_merchant_text(text: str) -> bytes:
+    """
+    Normalize a merchant name, description or dictionary pattern for matching.
+
+    Text is uppercased and every run of other characters than A-Z and 0-9 becomes a single
+    space, with a space on either side, so "SQ *Blue Bottle #1234" becomes
+    b" SQ BLUE BOTTLE 1234 ". Patterns are normalized the same way, so they only match
+    whole words.
+    """
+    return f" {_NON_ALPHANUMERIC.sub(' ', text.upper()).strip()} ".encode('ascii')
+
+
+def _aligned(data: bytes) -> bytes:
+    """Pad a section so the next one starts at a multiple of four bytes."""
+    return data + b'\0' * (-len(data) % 4)
+
+
+def compile_merchant_index(entries: List[Dict[str, Any]], digest: bytes = b'\0' * 32) -> bytes:
+    """
+    Compile merchant dictionary entries into an Aho-Corasick automaton.
+
+    The automaton is laid out as flat arrays: a dense transition table for the root,
+    the other transitions in CSR form (per-state offsets into sorted labels and targets),
+    failure links, and per state the entry and length of the longest pattern ending there.
+    The result can be memory-mapped and matched against without deserializing it.
+
+    Args:
+        entries: Dictionary entries with name, category and patterns
+        digest: SHA-256 of the dictionary, stored to detect a stale index
+
+    Returns:
+        The serialized index
+    """
+    transitions: List[Dict[int, int]] = [{}]
+    depth = [0]
+    terminal = [NO_ENTRY]
+    for entry_id, entry in enumerate(entries):
+        for pattern in entry['patterns']:
+            key = normalize_merchant_text(pattern)
+            if key == b'  ':
+                continue
+            state = 0
+            for byte in key:
+                next_state = transitions[state].get(byte)
+                if next_state is None:
+                    next_state = len(transitions)
+                    transitions[state][byte] = next_state
+                    transitions.append({})
+                    depth.append(depth[state] + 1)
+                    terminal.append(NO_ENTRY)
+                state = next_state
+            # The first entry listing a pattern owns it
+            if terminal[state] == NO_ENTRY:
+                terminal[state] = entry_id
+
+    # Breadth-first failure links, each output is the longest pattern ending at the state
+    state_count = len(transitions)
+    fail = [0] * state_count
+    output_entry = [NO_ENTRY] * state_count
+    output_length = [0] * state_count
+    queue = deque(transitions[0].values())
+    while queue:
+        state = queue.popleft()
+        if terminal[state] != NO_ENTRY:
+            output_entry[state], output_length[state] = terminal[state], depth[state]
+        else:
+            output_entry[state], output_length[state] = output_entry[fail[state]], output_length[fail[state]]
+        for byte, next_state in transitions[state].items():
+            link = fail[state]
+            while link and byte not in transitions[link]:
+                link = fail[link]
+            fail[next_state] = transitions[link].get(byte, 0)
+            queue.append(next_state)
+
+    root_next = array('I', (transitions[0].get(byte, 0) for byte in range(256)))
+    row_start = array('I', [0])
+    labels = bytearray()
+    targets = array('I')
+    for edges in transitions:
+        for byte in sorted(edges):
+            labels.append(byte)
+            targets.append(edges[byte])
+        row_start.append(len(targets))
+
+    entries_data = json.dumps([[entry['name'], entry.get('category')] for entry in entries]).encode()
+    header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, digest, state_count, len(targets), len(entries_data))
+    sections = [
+        root_next, row_start, targets, array('I', fail), array('I', output_entry), array('I', output_length)
+    ]
+    return b''.join(
+        [_aligned(header)] + [section.tobytes() for section in sections] + [_aligned(bytes(labels)), entries_data]
+    )
+
+
+class MerchantIndex:
+    """
+    Precompiled multi-pattern index over the merchant dictionary.
+
+    Finds the longest dictionary pattern in a merchant name or description in a single
+    pass over its bytes, to canonicalize the merchant name and fill a missing primary
+    category. The index is read straight from its serialized form, which is usually a
+    memory-mapped file shared by all processes of the host.
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        """
+        Initialize the index.
+
+        Args:
+            buffer: Serialized index from compile_merchant_index, or a memory map of it
+
+        Raises:
+            ValueError: If the buffer is not an index of this version
+        """
+        magic, version, self.digest, state_count, edge_count, entries_size = INDEX_HEADER.unpack_from(buffer)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("Not a merchant index of this version")
+        self._buffer = buffer
+        view = memoryview(buffer)
+        offset = len(_aligned(b'\0' * INDEX_HEADER.size))
+
+        def section(count: int) -> memoryview:
+            nonlocal offset
+            values = view[offset:offset + count * 4].cast('I')
+            offset += count * 4
+            return values
+
+        self._root_next = section(256)
+        self._row_start = section(state_count + 1)
+        self._targets = section(edge_count)
+        self._fail = section(state_count)
+        self._output_entry = section(state_count)
+        self._output_length = section(state_count)
+        self._labels_offset = offset
+        offset += len(_aligned(b'\0' * edge_count))
+        self.entries = [tuple(entry) for entry in json.loads(bytes(view[offset:offset + entries_size]))]
+
+    @classmethod
+    def open(cls, index_path: str) -> 'MerchantIndex':
+        """Memory-map an index file."""
+        with open(index_path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def match(self, text: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Find the merchant whose longest pattern occurs in a text.
+
+        Args:
+            text: Merchant name or transaction description
+
+        Returns:
+            Canonical name and category of the merchant, or None if no pattern occurs
+        """
+        buffer = self._buffer
+        root_next = self._root_next
+        row_start = self._row_start
+        targets = self._targets
+        fail = self._fail
+        output_entry = self._output_entry
+        output_length = self._output_length
+        labels_offset = self._labels_offset
+
+        state = 0
+        best_entry = NO_ENTRY
+        best_length = 0
+        for byte in normalize_merchant_text(text):
+            while state:
+                position = buffer.find(
+                    _SINGLE_BYTES[byte], labels_offset + row_start[state], labels_offset + row_start[state + 1]
+                )
+                if position >= 0:
+                    state = targets[position - labels_offset]
+                    break
+                state = fail[state]
+            else:
+                state = root_next[byte]
+            if output_length[state] > best_length:
+                best_entry, best_length = output_entry[state], output_length[state]
+        return self.entries[best_entry] if best_entry != NO_ENTRY else None
+
+    def enrich(
+        self,
+        merchant_names: Sequence[str],
+        descriptions: Sequence[Optional[str]],
+        categories: Sequence[Optional[str]]
+    ) -> Tuple[List[str], List[Optional[str]]]:
+        """
+        Canonicalize merchant names and fill missing primary categories, column by column.
+
+        The merchant name is matched first and the description only if the name matches
+        no merchant. Each distinct text is matched once.
+
+        Args:
+            merchant_names: Merchant name column
+            descriptions: Description column
+            categories: Primary category column
+
+        Returns:
+            Tuple of (merchant names, primary categories)
+        """
+        matches: Dict[str, Optional[Tuple[str, Optional[str]]]] = {}
+
+        def lookup(text: Optional[str]) -> Optional[Tuple[str, Optional[str]]]:
+            if not text:
+                return None
+            if text not in matches:
+                matches[text] = self.match(text)
+            return matches[text]
+
+        names = []
+        filled_categories = []
+        for merchant_name, description, category in zip(merchant_names, descriptions, categories):
+            merchant = lookup(merchant_name) or lookup(description)
+            if merchant is None:
+                names.append(merchant_name)
+                filled_categories.append(category)
+            else:
+                names.append(merchant[0])
+                filled_categories.append(category if category is not None else merchant[1])
+        return names, filled_categories
+
+
+def _dictionary_digest(dictionary_path: str) -> bytes:
+    """Return the SHA-256 of a merchant dictionary."""
+    with open(dictionary_path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _default_index_path(dictionary_path: str) -> str:
+    """Return the path of the index compiled from a dictionary."""
+    return os.path.splitext(dictionary_path)[0] + '.idx'
+
+
+def build_merchant_index(dictionary_path: Optional[str] = None, index_path: Optional[str] = None) -> str:
+    """
+    Compile a merchant dictionary and write its index file atomically.
+
+    Args:
+        dictionary_path: JSON merchant dictionary (defaults to MERCHANT_DICTIONARY_PATH, or the bundled one)
+        index_path: Index file to write (defaults to MERCHANT_INDEX_PATH, or the dictionary path with .idx)
+
+    Returns:
+        Path of the index file
+    """
+    dictionary_path = dictionary_path or settings.MERCHANT_DICTIONARY_PATH or DEFAULT_DICTIONARY_PATH
+    index_path = index_path or settings.MERCHANT_INDEX_PATH or _default_index_path(dictionary_path)
+    with open(dictionary_path, 'r') as f:
+        entries = json.load(f)
+    data = compile_merchant_index(entries, _dictionary_digest(dictionary_path))
+
+    # Processes building at the same time each write their own file, the last rename wins
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, index_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    logging.info(f"Compiled {len(entries)} merchants from {dictionary_path} into {index_path}")
+    return index_path
+
+
+def load_merchant_index(dictionary_path: Optional[str] = None, index_path: Optional[str] = None) -> MerchantIndex:
+    """
+    Return the merchant index of this process, memory-mapping it on first use.
+
+    A missing index, or one compiled from a different dictionary, is rebuilt first. If the
+    index cannot be written (e.g. a read-only image), it is compiled in memory instead.
+
+    Args:
+        dictionary_path: JSON merchant dictionary (defaults to MERCHANT_DICTIONARY_PATH, or the bundled one)
+        index_path: Index file (defaults to MERCHANT_INDEX_PATH, or the dictionary path with .idx)
+
+    Returns:
+        The merchant index
+    """
+    dictionary_path = dictionary_path or settings.MERCHANT_DICTIONARY_PATH or DEFAULT_DICTIONARY_PATH
+    index_path = index_path or settings.MERCHANT_INDEX_PATH or _default_index_path(dictionary_path)
+    key = (dictionary_path, index_path)
+    if key in _indexes:
+        return _indexes[key]
+
+    digest = _dictionary_digest(dictionary_path)
+    index = None
+    if os.path.exists(index_path):
+        try:
+            index = MerchantIndex.open(index_path)
+        except ValueError:
+            index = None
+        if index is not None and index.digest != digest:
+            index = None
+    if index is None:
+        try:
+            index = MerchantIndex.open(build_merchant_index(dictionary_path, index_path))
+        except OSError as e:
+            logging.warning(f"Could not write merchant index {index_path}, compiling it in memory: {e}")
+            with open(dictionary_path, 'r') as f:
+                index = MerchantIndex(compile_merchant_index(json.load(f), digest))
+    _indexes[key] = index
+    return index
+
+
+# Run with: python -m refiner.utils.merchants --dictionary refiner/data/merchants.json
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Compile the merchant dictionary into its memory-mapped index")
+    parser.add_argument('--dictionary', default=None, help="JSON merchant dictionary (defaults to the bundled one)")
+    parser.add_argument('--output', default=None, help="Index file (defaults to the dictionary path with .idx)")
+    args = parser.parse_args()
+    build_merchant_index(args.dictionary, args.output)
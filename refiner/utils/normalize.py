@@ -0,0 +1,46 @@
+from typing import Any, Iterator, Optional, Tuple
+
+# A flattened JSON leaf: (metric path, numeric value, text value)
+Leaf = Tuple[str, Optional[float], Optional[str]]
+
+
+def flatten_json(value: Any, path: str = '') -> Iterator[Leaf]:
+    """
+    Flatten a JSON value into its leaves.
+    Object keys are joined with '.', list positions are appended as '[i]',
+    and a scalar at the top level is reported under the metric 'value'.
+
+    Args:
+        value: Parsed JSON value
+        path: Path of the value within the enclosing document
+
+    Yields:
+        (metric, value, text_value) per non-null leaf; numbers and booleans set value, strings set text_value
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten_json(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            yield from flatten_json(item, f"{path}[{position}]")
+    elif isinstance(value, (bool, int, float)):
+        yield path or 'value', float(value), None
+    elif value is not None:
+        yield path or 'value', None, str(value)
+
+
+def keyed_leaves(value: Any) -> Iterator[Tuple[str, Leaf]]:
+    """
+    Flatten a JSON object keyed by category, period, region or similar.
+    A list is keyed by the position of its items.
+
+    Args:
+        value: Parsed JSON object or list
+
+    Yields:
+        (key, leaf) per leaf of each entry
+    """
+    items = value.items() if isinstance(value, dict) else enumerate(value or [])
+    for key, item in items:
+        for leaf in flatten_json(item):
+            yield str(key), leaf
@@ -0,0 +1,394 @@
+import binascii
+import bz2
+import hashlib
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# Bytes read from the encrypted file, and produced by decompression, per step
+CHUNK_SIZE = 1024 * 1024
+
+# OpenPGP packet tags (RFC 4880 section 4.3)
+TAG_SKESK = 3
+TAG_COMPRESSED = 8
+TAG_LITERAL = 11
+TAG_SEIPD = 18
+TAG_MDC = 19
+
+# Symmetric algorithm ids and key lengths in bytes; only AES is produced by encrypt_file
+SYMMETRIC_KEY_SIZES = {7: 16, 8: 24, 9: 32}
+AES_BLOCK_SIZE = 16
+
+HASH_ALGORITHMS = {1: 'md5', 2: 'sha1', 3: 'ripemd160', 8: 'sha256', 9: 'sha384', 10: 'sha512', 11: 'sha224'}
+
+MDC_PACKET_LENGTH = 22
+
+
+class OpenPGPError(ValueError):
+    """Raised when an encrypted message is malformed, fails its integrity check or uses an unsupported feature."""
+
+
+class _ChunkReader:
+    """
+    Reads exact byte counts, or whatever is available, from an iterator of chunks.
+
+    Chunks are appended to a bytearray and consumed through a read offset, and the
+    consumed prefix is dropped only when more input is appended, so reading costs time
+    linear in the stream however small its chunks are.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def read(self, size: int) -> bytes:
+        """Read exactly size bytes, or fewer at the end of the stream."""
+        while len(self._buffer) - self._offset < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            if self._offset:
+                del self._buffer[:self._offset]
+                self._offset = 0
+            self._buffer += chunk
+        end = min(self._offset + size, len(self._buffer))
+        data = bytes(self._buffer[self._offset:end])
+        self._offset = end
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        """Read exactly size bytes, failing on a truncated stream."""
+        data = self.read(size)
+        if len(data) != size:
+            raise OpenPGPError("Unexpected end of OpenPGP data")
+        return data
+
+    def chunks(self) -> Iterator[bytes]:
+        """Yield everything left in the stream."""
+        if self._offset < len(self._buffer):
+            buffer = bytes(self._buffer[self._offset:])
+            self._buffer = bytearray()
+            self._offset = 0
+            yield buffer
+        yield from self._chunks
+
+
+def _dearmor(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the binary content of an ASCII-armored message in chunks of about CHUNK_SIZE."""
+    for line in f:
+        if line.startswith(b'-----BEGIN PGP MESSAGE-----'):
+            break
+    else:
+        raise OpenPGPError("No PGP message found")
+
+    # Skip armor headers up to the blank line
+    for line in f:
+        if not line.strip():
+            break
+
+    # Decode many lines at once, carrying over base64 characters that do not fill a quantum
+    lines = []
+    buffered = 0
+    for line in f:
+        line = line.strip()
+        if line.startswith(b'-----END') or line.startswith(b'='):
+            break
+        lines.append(line)
+        buffered += len(line)
+        if buffered >= CHUNK_SIZE:
+            pending = b''.join(lines)
+            usable = len(pending) - len(pending) % 4
+            yield binascii.a2b_base64(pending[:usable])
+            lines = [pending[usable:]]
+            buffered = len(lines[0])
+    if buffered:
+        yield binascii.a2b_base64(b''.join(lines))
+
+
+def _read_file(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the content of a binary message in chunks."""
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        yield chunk
+
+
+def _read_packet_header(reader: _ChunkReader) -> Optional[Tuple[int, Callable[[], Iterator[bytes]]]]:
+    """
+    Read the next packet header.
+
+    Returns:
+        The packet tag and a function yielding its body chunks, or None at the end of the stream
+    """
+    first = reader.read(1)
+    if not first:
+        return None
+    header = first[0]
+    if not header & 0x80:
+        raise OpenPGPError("Invalid OpenPGP packet header")
+
+    if header & 0x40:
+        # New format: lengths may be split into partial body chunks
+        tag = header & 0x3f
+
+        def body() -> Iterator[bytes]:
+            while True:
+                octet = reader.read_exact(1)[0]
+                if octet < 192:
+                    length, partial = octet, False
+                elif octet < 224:
+                    length, partial = ((octet - 192) << 8) + reader.read_exact(1)[0] + 192, False
+                elif octet == 255:
+                    length, partial = int.from_bytes(reader.read_exact(4), 'big'), False
+                else:
+                    length, partial = 1 << (octet & 0x1f), True
+                yield from _read_span(reader, length)
+                if not partial:
+                    return
+    else:
+        # Old format: 1, 2 or 4 length bytes, or indeterminate up to the end of the stream
+        tag = (header >> 2) & 0x0f
+        length_type = header & 0x03
+
+        def body() -> Iterator[bytes]:
+            if length_type == 3:
+                yield from reader.chunks()
+                return
+            length = int.from_bytes(reader.read_exact(1 << length_type), 'big')
+            yield from _read_span(reader, length)
+
+    return tag, body
+
+
+def _read_span(reader: _ChunkReader, length: int) -> Iterator[bytes]:
+    """Yield length bytes of a packet body in bounded chunks."""
+    while length:
+        chunk = reader.read_exact(min(length, CHUNK_SIZE))
+        length -= len(chunk)
+        yield chunk
+
+
+def _s2k_key(passphrase: bytes, specifier: bytes, key_size: int) -> Tuple[bytes, int]:
+    """
+    Derive a key from a passphrase with a string-to-key specifier.
+
+    Returns:
+        The key and the number of specifier bytes consumed
+    """
+    s2k_type = specifier[0]
+    hash_name = HASH_ALGORITHMS.get(specifier[1])
+    if hash_name is None:
+        raise OpenPGPError(f"Unsupported S2K hash algorithm {specifier[1]}")
+
+    if s2k_type == 0:
+        salt, count, consumed = b'', 0, 2
+    elif s2k_type == 1:
+        salt, count, consumed = specifier[2:10], 0, 10
+    elif s2k_type == 3:
+        salt, coded_count, consumed = specifier[2:10], specifier[10], 11
+        count = (16 + (coded_count & 15)) << ((coded_count >> 4) + 6)
+    else:
+        raise OpenPGPError(f"Unsupported S2K type {s2k_type}")
+
+    data = salt + passphrase
+    count = max(count, len(data))
+    key = b''
+    preload = 0
+    while len(key) < key_size:
+        hasher = hashlib.new(hash_name)
+        hasher.update(b'\x00' * preload)
+        # Hash the salted passphrase repeatedly up to count bytes, a block of repetitions at a time
+        block = data * max(1, 65536 // len(data))
+        remaining = count
+        while remaining >= len(block):
+            hasher.update(block)
+            remaining -= len(block)
+        hasher.update((data * (remaining // len(data) + 1))[:remaining])
+        key += hasher.digest()
+        preload += 1
+    return key[:key_size], consumed
+
+
+def session_key_from_skesk(passphrase: bytes, packet: bytes) -> Tuple[int, bytes]:
+    """
+    Recover the session key from a version 4 symmetric-key encrypted session key packet.
+
+    Args:
+        passphrase: Passphrase the message was encrypted with
+        packet: Body of the SKESK packet
+
+    Returns:
+        Tuple of (symmetric algorithm id, session key)
+    """
+    if packet[0] != 4:
+        raise OpenPGPError(f"Unsupported SKESK version {packet[0]}")
+    algorithm = packet[1]
+    key_size = SYMMETRIC_KEY_SIZES.get(algorithm)
+    if key_size is None:
+        raise OpenPGPError(f"Unsupported symmetric algorithm {algorithm}")
+
+    key, consumed = _s2k_key(passphrase, packet[2:], key_size)
+    encrypted_session_key = packet[2 + consumed:]
+    if not encrypted_session_key:
+        # Without an encrypted session key, the S2K output is the session key
+        return algorithm, key
+
+    decryptor = Cipher(algorithms.AES(key), modes.CFB(b'\x00' * AES_BLOCK_SIZE)).decryptor()
+    session_key = decryptor.update(encrypted_session_key) + decryptor.finalize()
+    session_algorithm = session_key[0]
+    if SYMMETRIC_KEY_SIZES.get(session_algorithm) != len(session_key) - 1:
+        raise OpenPGPError("Wrong passphrase or corrupted session key")
+    return session_algorithm, session_key[1:]
+
+
+def _decrypt_seipd(body: Iterator[bytes], session_key: bytes) -> Iterator[bytes]:
+    """
+    Decrypt a version 1 symmetrically encrypted integrity protected data packet body.
+    The random prefix is checked and stripped, and the modification detection code
+    is verified once the whole body has been decrypted.
+    """
+    reader = _ChunkReader(body)
+    if reader.read_exact(1)[0] != 1:
+        raise OpenPGPError("Unsupported SEIPD version")
+
+    decryptor = Cipher(algorithms.AES(session_key), modes.CFB(b'\x00' * AES_BLOCK_SIZE)).decryptor()
+    mdc = hashlib.sha1()
+
+    prefix = decryptor.update(reader.read_exact(AES_BLOCK_SIZE + 2))
+    if prefix[-4:-2] != prefix[-2:]:
+        raise OpenPGPError("Wrong passphrase or corrupted message")
+    mdc.update(prefix)
+
+    # Hold back the trailing MDC packet until the end of the body is known
+    tail = b''
+    for chunk in reader.chunks():
+        data = tail + decryptor.update(chunk)
+        tail = data[-MDC_PACKET_LENGTH:]
+        data = data[:-MDC_PACKET_LENGTH]
+        if data:
+            mdc.update(data)
+            yield data
+    tail += decryptor.finalize()
+
+    if len(tail) != MDC_PACKET_LENGTH or tail[:2] != b'\xd3\x14':
+        raise OpenPGPError("Missing modification detection code")
+    mdc.update(tail[:2])
+    if mdc.digest() != tail[2:]:
+        raise OpenPGPError("Modification detection code mismatch")
+
+
+def _decompress(body: Iterator[bytes]) -> Iterator[bytes]:
+    """Decompress a compressed data packet body in bounded chunks."""
+    try:
+        yield from _decompress_chunks(_ChunkReader(body))
+    except (zlib.error, OSError) as e:
+        raise OpenPGPError(f"Corrupted compressed data: {e}") from e
+
+
+def _decompress_chunks(reader: _ChunkReader) -> Iterator[bytes]:
+    """Yield the decompressed content of a compressed data packet."""
+    algorithm = reader.read_exact(1)[0]
+    if algorithm == 0:
+        yield from reader.chunks()
+        return
+    if algorithm == 3:
+        decompressor = bz2.BZ2Decompressor()
+        for chunk in reader.chunks():
+            yield decompressor.decompress(chunk)
+        return
+    if algorithm not in (1, 2):
+        raise OpenPGPError(f"Unsupported compression algorithm {algorithm}")
+
+    # ZIP is raw deflate, ZLIB carries a zlib header
+    decompressor = zlib.decompressobj(-15 if algorithm == 1 else 15)
+    for chunk in reader.chunks():
+        while chunk:
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            if data:
+                yield data
+            chunk = decompressor.unconsumed_tail
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def _literal_data(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Yield the content of the literal data packet in a (decompressed) packet stream."""
+    reader = _ChunkReader(chunks)
+    while True:
+        packet = _read_packet_header(reader)
+        if packet is None:
+            raise OpenPGPError("No literal data packet found")
+        tag, body = packet
+        if tag == TAG_COMPRESSED:
+            yield from _literal_data(_decompress(body()))
+            return
+        if tag == TAG_LITERAL:
+            literal = _ChunkReader(body())
+            literal.read_exact(1)
+            literal.read_exact(literal.read_exact(1)[0] + 4)
+            yield from literal.chunks()
+            return
+        # Skip any other packet, e.g. a one-pass signature
+        for _ in body():
+            pass
+
+
+def iter_decrypted(
+    passphrase: str,
+    file_path: str,
+    session_keys: Optional[Dict[bytes, Tuple[int, bytes]]] = None
+) -> Iterator[bytes]:
+    """
+    Stream the plaintext of a passphrase-encrypted OpenPGP message without holding it in memory.
+
+    Supports what encrypt_file produces: an ASCII-armored or binary message with a version 4
+    SKESK packet, an AES-encrypted SEIPD packet and optionally compressed literal data.
+    The modification detection code is verified after the last chunk has been yielded.
+
+    Args:
+        passphrase: Passphrase the message was encrypted with
+        file_path: Path to the encrypted file
+        session_keys: Optional cache of session keys by SKESK packet body, so messages
+            sharing an S2K specifier derive the key only once
+
+    Yields:
+        Chunks of the decrypted content
+
+    Raises:
+        OpenPGPError: If the message is malformed, the passphrase is wrong or the integrity check fails
+    """
+    with open(file_path, 'rb') as f:
+        first = f.read(1)
+        f.seek(0)
+        # Binary packets always start with the high bit set, armor starts with text
+        chunks = _read_file(f) if first and first[0] & 0x80 else _dearmor(f)
+        reader = _ChunkReader(chunks)
+
+        session_key = None
+        while True:
+            packet = _read_packet_header(reader)
+            if packet is None:
+                raise OpenPGPError("No encrypted data packet found")
+            tag, body = packet
+            if tag == TAG_SKESK:
+                packet_body = b''.join(body())
+                if session_key is None and session_keys is not None and packet_body in session_keys:
+                    _, session_key = session_keys[packet_body]
+                elif session_key is None:
+                    recovered = session_key_from_skesk(passphrase.encode(), packet_body)
+                    if session_keys is not None:
+                        session_keys[packet_body] = recovered
+                    _, session_key = recovered
+            elif tag == TAG_SEIPD:
+                if session_key is None:
+                    raise OpenPGPError("No symmetric-key encrypted session key found")
+                decrypted = _decrypt_seipd(body(), session_key)
+                yield from _literal_data(decrypted)
+                # Drain the packet so its modification detection code is checked
+                for _ in decrypted:
+                    pass
+                return
+            else:
+                for _ in body():
+                    pass
@@ -1,13 +1,26 @@
 import hashlib
 import re
-from typing import List
+from typing import List, Optional
 
-def mask_email(email: str) -> str:
+from refiner.utils.pseudonymize import Pseudonymizer
+
+# Patterns are compiled once at import so the per-transaction scans don't hit the regex cache
+NON_DIGIT_PATTERN = re.compile(r'[^0-9]')
+CITY_STATE_PATTERN = re.compile(r'([A-Za-z\s]+),\s*([A-Z]{2})$')
+SSN_PATTERN = re.compile(r'\b\d{3}-\d{2}-\d{4}\b')
+FULL_CARD_PATTERN = re.compile(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b')
+PHONE_PATTERN = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+ACCOUNT_PATTERN = re.compile(r'\b(?:account|acct)[\s#]*\d{6,}\b', re.IGNORECASE)
+MASKED_CARD_PATTERN = re.compile(r'^\*{4}\d{4}$')
+
+def mask_email(email: str, pseudonymizer: Optional[Pseudonymizer] = None) -> str:
     """
     Mask email addresses by hashing the local part (before @).
     
     Args:
         email: The email address to mask
+        pseudonymizer: Optional keyed pseudonymizer used instead of the unkeyed MD5 hash
         
     Returns:
         Masked email address with hashed local part
@@ -16,7 +29,10 @@ def mask_email(email: str) -> str:
         return email
         
     local_part, domain = email.split('@', 1)
-    hashed_local = hashlib.md5(local_part.encode()).hexdigest()
+    if pseudonymizer:
+        hashed_local = pseudonymizer.pseudonymize(local_part)
+    else:
+        hashed_local = hashlib.md5(local_part.encode()).hexdigest()
     
     return f"{hashed_local}@{domain}"
 
@@ -34,18 +50,19 @@ def mask_card_number(card_number: str) -> str:
         return card_number
     
     # Remove any spaces, hyphens, or other separators
-    clean_number = re.sub(r'[^0-9]', '', card_number)
+    clean_number = NON_DIGIT_PATTERN.sub('', card_number)
     
     if len(clean_number) >= 4:
         return "****" + clean_number[-4:]
     return "****"
 
-def mask_merchant_location(location: str) -> str:
+def mask_merchant_location(location: str, pseudonymizer: Optional[Pseudonymizer] = None) -> str:
     """
     Mask specific address but keep city/state for geographic analysis.
     
     Args:
         location: The location string to mask
+        pseudonymizer: Optional keyed pseudonymizer used instead of the unkeyed MD5 hash
         
     Returns:
         Masked location with city/state preserved
@@ -54,15 +71,17 @@ def mask_merchant_location(location: str) -> str:
         return location
     
     # Try to extract city, state pattern
-    city_state_pattern = r'([A-Za-z\s]+),\s*([A-Z]{2})$'
-    match = re.search(city_state_pattern, location)
+    match = CITY_STATE_PATTERN.search(location)
     
     if match:
         city, state = match.groups()
         return f"{city}, {state}"
     
     # If no clear city/state pattern, hash the location
-    hashed_location = hashlib.md5(location.encode()).hexdigest()[:8]
+    if pseudonymizer:
+        hashed_location = pseudonymizer.pseudonymize(location)
+    else:
+        hashed_location = hashlib.md5(location.encode()).hexdigest()[:8]
     return f"Location_{hashed_location}"
 
 def detect_sensitive_transaction_data(description: str) -> List[str]:
@@ -81,28 +100,23 @@ def detect_sensitive_transaction_data(description: str) -> List[str]:
     detected_pii = []
     
     # Social Security Number pattern
-    ssn_pattern = r'\b\d{3}-\d{2}-\d{4}\b'
-    if re.search(ssn_pattern, description):
+    if SSN_PATTERN.search(description):
         detected_pii.append('ssn')
     
     # Full credit card number pattern (not masked)
-    full_card_pattern = r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b'
-    if re.search(full_card_pattern, description):
+    if FULL_CARD_PATTERN.search(description):
         detected_pii.append('full_card_number')
     
     # Phone number pattern
-    phone_pattern = r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-    if re.search(phone_pattern, description):
+    if PHONE_PATTERN.search(description):
         detected_pii.append('phone_number')
     
     # Email pattern
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    if re.search(email_pattern, description):
+    if EMAIL_PATTERN.search(description):
         detected_pii.append('email')
     
     # Account number pattern (generic)
-    account_pattern = r'\b(?:account|acct)[\s#]*\d{6,}\b'
-    if re.search(account_pattern, description, re.IGNORECASE):
+    if ACCOUNT_PATTERN.search(description):
         detected_pii.append('account_number')
     
     return detected_pii
@@ -123,19 +137,19 @@ def sanitize_transaction_description(description: str) -> str:
     sanitized = description
     
     # Mask Social Security Numbers
-    sanitized = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', '***-**-****', sanitized)
+    sanitized = SSN_PATTERN.sub('***-**-****', sanitized)
     
     # Mask full credit card numbers
-    sanitized = re.sub(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', '****-****-****-****', sanitized)
+    sanitized = FULL_CARD_PATTERN.sub('****-****-****-****', sanitized)
     
     # Mask phone numbers
-    sanitized = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '***-***-****', sanitized)
+    sanitized = PHONE_PATTERN.sub('***-***-****', sanitized)
     
     # Mask email addresses
-    sanitized = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '***@***.***', sanitized)
+    sanitized = EMAIL_PATTERN.sub('***@***.***', sanitized)
     
     # Mask account numbers
-    sanitized = re.sub(r'\b(?:account|acct)[\s#]*\d{6,}\b', 'ACCOUNT ***', sanitized, flags=re.IGNORECASE)
+    sanitized = ACCOUNT_PATTERN.sub('ACCOUNT ***', sanitized)
     
     return sanitized
 
@@ -153,16 +167,16 @@ def validate_card_identifier_format(card_identifier: str) -> bool:
         return False
     
     # Should be in format ****1234 or similar
-    masked_pattern = r'^\*{4}\d{4}$'
-    return bool(re.match(masked_pattern, card_identifier))
+    return bool(MASKED_CARD_PATTERN.match(card_identifier))
 
-def hash_sensitive_field(value: str, salt: str = "credit_refiner") -> str:
+def hash_sensitive_field(value: str, salt: str = "credit_refiner", pseudonymizer: Optional[Pseudonymizer] = None) -> str:
     """
     Hash sensitive field values for privacy protection.
     
     Args:
         value: The sensitive value to hash
         salt: Salt to use for hashing
+        pseudonymizer: Optional keyed pseudonymizer used instead of the salted SHA-256 hash
         
     Returns:
         Hashed value
@@ -170,5 +184,8 @@ def hash_sensitive_field(value: str, salt: str = "credit_refiner") -> str:
     if not value:
         return value
     
+    if pseudonymizer:
+        return pseudonymizer.pseudonymize(value)
+    
     salted_value = f"{salt}_{value}"
     return hashlib.sha256(salted_value.encode()).hexdigest()
\ No newline at end of file
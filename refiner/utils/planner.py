@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import zipfile
+from collections import Counter
+from typing import Any, Collection, Dict, List, Optional
+
+from refiner.config import settings
+
+BYTES_PER_MB = 1024 * 1024
+
+# Strategies of a plan unit: small files sharing one commit, a file committed batch by
+# batch, or a large file whose transactions are validated as they are read
+STRATEGY_GROUPED = 'grouped'
+STRATEGY_BATCHED = 'batched'
+STRATEGY_STREAMING = 'streaming'
+
+# Bytes read from the start of a file to estimate its transaction count
+SAMPLE_BYTES = 64 * 1024
+TRANSACTION_MARKER = b'"transaction_id"'
+
+
+def estimate_transactions(file_path: str, size: int) -> int:
+    """
+    Estimate the number of transactions in a statement file from a sample of its start.
+
+    Args:
+        file_path: Path to the JSON input file
+        size: Size of the file in bytes
+
+    Returns:
+        Exact count for files smaller than the sample, an extrapolation otherwise
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(SAMPLE_BYTES)
+    count = sample.count(TRANSACTION_MARKER)
+    if size <= len(sample):
+        return count
+    return round(count * size / len(sample))
+
+
+def scan_input(input_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Describe every file of an input directory without parsing it.
+
+    Args:
+        input_dir: Directory containing input files
+
+    Returns:
+        Format, size and estimated transaction count of JSON files, and the members of zip
+        archives (which are extracted into the input directory before refinement), per file name
+    """
+    files = {}
+    for input_filename in sorted(os.listdir(input_dir)):
+        input_file = os.path.join(input_dir, input_filename)
+        if not os.path.isfile(input_file):
+            continue
+        size = os.path.getsize(input_file)
+        extension = os.path.splitext(input_filename)[1].lower().lstrip('.')
+        description = {'format': extension or 'none', 'size': size}
+        if extension == 'json':
+            description['transactions'] = estimate_transactions(input_file, size)
+        elif zipfile.is_zipfile(input_file):
+            description['format'] = 'zip'
+            with zipfile.ZipFile(input_file, 'r') as zip_ref:
+                description['members'] = len(zip_ref.namelist())
+        files[input_filename] = description
+    return files
+
+
+def plan_input(
+    files: Dict[str, Dict[str, Any]],
+    pending: List[str],
+    in_progress: Collection[str] = (),
+    small_file_transactions: Optional[int] = None,
+    group_transactions: Optional[int] = None,
+    streaming_mb: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Choose a strategy for every input file left to refine and order the work.
+
+    Consecutive files estimated to hold at most small_file_transactions are grouped into
+    units committed together, up to group_transactions per unit. Files larger than
+    streaming_mb are streamed when ENABLE_STREAMING is set, all others are committed batch
+    by batch. Files partly written by an interrupted run always resume batch by batch.
+
+    Args:
+        files: Input file descriptions from scan_input
+        pending: Names of the JSON files left to refine, in input order
+        in_progress: Names of files an interrupted run partly wrote
+        small_file_transactions: Largest file grouped with others (defaults to PLAN_SMALL_FILE_TRANSACTIONS)
+        group_transactions: Estimated transactions per group (defaults to PLAN_GROUP_TRANSACTIONS)
+        streaming_mb: Smallest streamed file in MB (defaults to STREAMING_THRESHOLD_MB)
+
+    Returns:
+        The plan, with its units in input order. Units are written in that order whatever
+        the number of parse workers, so duplicate transactions across files always resolve
+        the same way; parse workers start with the largest files and their results are
+        reassembled into this order
+    """
+    small_file_transactions = (
+        small_file_transactions if small_file_transactions is not None else settings.PLAN_SMALL_FILE_TRANSACTIONS
+    )
+    group_transactions = group_transactions or settings.PLAN_GROUP_TRANSACTIONS
+    streaming_bytes = (streaming_mb or settings.STREAMING_THRESHOLD_MB) * BYTES_PER_MB
+
+    units: List[Dict[str, Any]] = []
+    group: Optional[Dict[str, Any]] = None
+    for input_filename in pending:
+        description = files[input_filename]
+        transactions = description['transactions']
+        if input_filename not in in_progress and transactions <= small_file_transactions:
+            if group is None or group['transactions'] + transactions > group_transactions:
+                group = {'strategy': STRATEGY_GROUPED, 'files': [], 'transactions': 0, 'size': 0}
+                units.append(group)
+            group['files'].append(input_filename)
+            group['transactions'] += transactions
+            group['size'] += description['size']
+            continue
+        group = None
+        streaming = settings.ENABLE_STREAMING and description['size'] > streaming_bytes
+        units.append({
+            'strategy': STRATEGY_STREAMING if streaming else STRATEGY_BATCHED,
+            'files': [input_filename],
+            'transactions': transactions,
+            'size': description['size'],
+        })
+
+    return {
+        'units': units,
+        'formats': dict(Counter(description['format'] for description in files.values())),
+        'archives': {name: description['members'] for name, description in files.items() if 'members' in description},
+        'estimated_transactions': sum(unit['transactions'] for unit in units),
+    }
+
+
+def log_plan(plan: Dict[str, Any]) -> None:
+    """Log the chosen plan, one summary line and one line per unit."""
+    strategies = Counter()
+    for unit in plan['units']:
+        strategies[unit['strategy']] += len(unit['files'])
+    summary = {key: plan[key] for key in ('formats', 'archives', 'estimated_transactions')}
+    logging.info(f"Execution plan: {len(plan['units'])} units, files per strategy {dict(strategies)}, {json.dumps(summary)}")
+    for position, unit in enumerate(plan['units'], start=1):
+        files = ', '.join(unit['files'])
+        logging.info(
+            f"  {position}. {unit['strategy']}: {files} "
+            f"(~{unit['transactions']} transactions, {unit['size'] / BYTES_PER_MB:.1f} MB)"
+        )
@@ -0,0 +1,401 @@
+import math
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Table, bindparam, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from refiner.config import settings
+from refiner.models.refined import (
+    EngineeredFeature, FinancialSummary, RiskMetric, SpendingPattern,
+    SpendingCategory, MerchantFrequency, SeasonalPattern, RecurringTransaction, TimingPattern, GeographicPattern
+)
+from refiner.utils.normalize import keyed_leaves
+
+# Multiplier applied to DIFFERENTIAL_PRIVACY_EPSILON for each privacy level
+PRIVACY_LEVEL_EPSILON_FACTORS = {
+    'low': 2.0,
+    'medium': 1.0,
+    'high': 0.5,
+    'maximum': 0.25,
+}
+
+# Columns that receive noise, keyed by model class, with the kind of value they hold.
+# 'amount' columns use DP_AMOUNT_SENSITIVITY, 'ratio' columns are bounded to [0, 1],
+# 'score' columns are unbounded with a sensitivity of 1 and 'count' columns are
+# non-negative integers with a sensitivity of 1.
+NOISY_COLUMNS = {
+    FinancialSummary: {
+        'previous_balance': 'amount',
+        'payments_credits': 'amount',
+        'purchases': 'amount',
+        'closing_balance': 'amount',
+        'minimum_payment_due': 'amount',
+        'fees_charged': 'amount',
+        'interest_charged': 'amount',
+        'available_credit': 'amount',
+        'cash_advances': 'amount',
+        'balance_transfers': 'amount',
+        'total_debits': 'amount',
+        'total_credits': 'amount',
+        'over_limit_amount': 'amount',
+    },
+    RiskMetric: {
+        'credit_utilization_ratio': 'ratio',
+        'payment_history_score': 'ratio',
+        'risk_score': 'score',
+        'spending_velocity': 'score',
+        'unusual_activity_score': 'ratio',
+    },
+    EngineeredFeature: {
+        'monthly_spending_avg': 'amount',
+        'category_diversity_score': 'ratio',
+        'merchant_loyalty_score': 'ratio',
+    },
+    SpendingPattern: {
+        'total_transactions': 'count',
+    },
+}
+
+# JSON rollup columns whose numeric leaves receive noise, keyed by model class, with the
+# child table flattened from each column and the child table's key column. The child
+# tables are rewritten from the noisy JSON, so each value is released only once.
+ROLLUP_COLUMNS = {
+    SpendingPattern: {
+        'category_breakdown': (SpendingCategory, 'category'),
+        'merchant_frequency': (MerchantFrequency, 'merchant'),
+        'seasonal_patterns': (SeasonalPattern, 'period'),
+        'recurring_transactions': (RecurringTransaction, 'position'),
+    },
+    EngineeredFeature: {
+        'transaction_timing_patterns': (TimingPattern, 'bucket'),
+        'geographic_spending_patterns': (GeographicPattern, 'region'),
+    },
+}
+
+# Number of columns released with noise, which share the epsilon budget
+RELEASED_COLUMNS = sum(len(columns) for columns in NOISY_COLUMNS.values()) + sum(
+    len(columns) for columns in ROLLUP_COLUMNS.values()
+)
+
+# SQLite user_version set in the transaction that adds the noise, so a resumed run never adds it twice
+NOISE_APPLIED_VERSION = 1
+
+
+def rollup_leaf_kind(column: str, metric: str) -> str:
+    """
+    Return the kind of a numeric leaf of a JSON rollup column, from its metric path.
+
+    Args:
+        column: Name of the JSON rollup column
+        metric: Path of the leaf within its entry, as produced by flatten_json
+
+    Returns:
+        'count' for counts, 'ratio' for ratios and percentages (which this data holds as
+        fractions), 'amount' for everything else
+    """
+    if column == 'merchant_frequency':
+        return 'count'
+    name = metric.rsplit('.', 1)[-1].lower()
+    if 'count' in name:
+        return 'count'
+    if 'ratio' in name or 'percentage' in name:
+        return 'ratio'
+    return 'amount'
+
+
+def numeric_leaves(value: Any, path: str = '') -> Iterator[Tuple[str, float]]:
+    """
+    Yield the numeric leaves of a JSON value in document order, booleans excluded.
+
+    Args:
+        value: Parsed JSON value
+        path: Path of the value within the enclosing entry
+
+    Yields:
+        (metric, number) per numeric leaf, with metric paths as produced by flatten_json
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from numeric_leaves(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            yield from numeric_leaves(item, f"{path}[{position}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path or 'value', value
+
+
+def replace_numeric_leaves(value: Any, numbers: Iterator[float]) -> Any:
+    """
+    Return a copy of a JSON value whose numeric leaves are taken from numbers, in document order.
+
+    Args:
+        value: Parsed JSON value
+        numbers: Replacement values, in the order numeric_leaves yields the leaves
+
+    Returns:
+        The copy
+    """
+    if isinstance(value, dict):
+        return {key: replace_numeric_leaves(item, numbers) for key, item in value.items()}
+    if isinstance(value, list):
+        return [replace_numeric_leaves(item, numbers) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return next(numbers)
+    return value
+
+
+def laplace_noise(rng: np.random.Generator, size: int, sensitivity: float, epsilon: float) -> np.ndarray:
+    """
+    Draw a vector of Laplace noise calibrated for (epsilon, 0)-differential privacy.
+
+    Args:
+        rng: NumPy random generator to draw from
+        size: Number of values to draw
+        sensitivity: L1 sensitivity of the column
+        epsilon: Privacy budget spent on the column
+
+    Returns:
+        Array of noise values
+    """
+    return rng.laplace(0.0, sensitivity / epsilon, size)
+
+
+def gaussian_noise(rng: np.random.Generator, size: int, sensitivity: float, epsilon: float, delta: float) -> np.ndarray:
+    """
+    Draw a vector of Gaussian noise calibrated for (epsilon, delta)-differential privacy.
+
+    Args:
+        rng: NumPy random generator to draw from
+        size: Number of values to draw
+        sensitivity: L2 sensitivity of the column
+        epsilon: Privacy budget spent on the column
+        delta: Probability of the privacy guarantee failing
+
+    Returns:
+        Array of noise values
+    """
+    sigma = sensitivity * math.sqrt(2 * math.log(1.25 / delta)) / epsilon
+    return rng.normal(0.0, sigma, size)
+
+
+class PrivacyAccountant:
+    """
+    Applies differential-privacy noise to refined records and keeps track
+    of the privacy budget spent during a refinement run.
+
+    Noise is added once per run, after every statement is written: each column is read
+    from the database as one NumPy array, noised and written back in a single transaction.
+    Only the statement-level aggregates are noised. Transaction rows stay exact, so totals
+    such as financial_summaries.purchases can be recomputed from them; the guarantee
+    covers the released aggregate columns, not the refinement as a whole.
+    """
+
+    def __init__(
+        self,
+        epsilon: Optional[float] = None,
+        mechanism: Optional[str] = None,
+        delta: Optional[float] = None,
+        privacy_level: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self.privacy_level = (privacy_level or settings.PRIVACY_LEVEL).lower()
+        if self.privacy_level not in PRIVACY_LEVEL_EPSILON_FACTORS:
+            raise ValueError(f"Unsupported privacy level: {self.privacy_level}")
+
+        self.mechanism = (mechanism or settings.DP_NOISE_MECHANISM).lower()
+        if self.mechanism not in ('laplace', 'gaussian'):
+            raise ValueError(f"Unsupported noise mechanism: {self.mechanism}")
+
+        base_epsilon = epsilon if epsilon is not None else settings.DIFFERENTIAL_PRIVACY_EPSILON
+        if base_epsilon <= 0:
+            raise ValueError("Differential privacy epsilon must be positive")
+
+        self.epsilon = base_epsilon * PRIVACY_LEVEL_EPSILON_FACTORS[self.privacy_level]
+        self.delta = delta if delta is not None else settings.DP_DELTA
+        self.seed = seed if seed is not None else settings.DP_NOISE_SEED
+        self.rng = np.random.default_rng(self.seed)
+        self.column_epsilon = self.epsilon / RELEASED_COLUMNS
+        self.spent: Dict[str, Dict[str, Any]] = {}
+
+    def apply_to_database(self, engine: Engine, tables: Collection[Table]) -> bool:
+        """
+        Add calibrated noise to every noisy column of the written statement records.
+
+        Noise for a column is drawn as one batch across all records of the run. The
+        database records that it was noised in the same transaction, so calling this
+        again, e.g. from a resumed run, only accounts for the spend without changing
+        the database.
+
+        Args:
+            engine: Engine of the refinement database
+            tables: Tables present in the database; child tables left out are not rewritten
+
+        Returns:
+            Whether noise was added, False if the database was already noised
+        """
+        with engine.connect() as connection:
+            applied = connection.exec_driver_sql('PRAGMA user_version').scalar() == NOISE_APPLIED_VERSION
+            if not applied:
+                # Zero the space freed by rewritten values, so the exact values do not linger in the file
+                connection.exec_driver_sql('PRAGMA secure_delete = ON')
+            for model_class in NOISY_COLUMNS:
+                self._apply_to_table(connection, model_class, tables, write=not applied)
+            if not applied:
+                connection.exec_driver_sql(f'PRAGMA user_version = {NOISE_APPLIED_VERSION}')
+                connection.commit()
+        return not applied
+
+    def _apply_to_table(self, connection: Connection, model_class: type, tables: Collection[Table], write: bool) -> None:
+        """Noise the numeric and rollup columns of one table, and the child tables of its rollups."""
+        table = model_class.__table__
+        scalar_columns = NOISY_COLUMNS[model_class]
+        rollup_columns = ROLLUP_COLUMNS.get(model_class, {})
+        columns = list(scalar_columns) + list(rollup_columns)
+        rows = connection.execute(select(table.c.record_id, *(table.c[column] for column in columns))).all()
+        if not rows:
+            return
+        values = {column: [row[position] for row in rows] for position, column in enumerate(columns, start=1)}
+
+        for column, kind in scalar_columns.items():
+            present = [index for index, value in enumerate(values[column]) if value is not None]
+            if not present:
+                continue
+            column_values = values[column]
+            noisy = self._privatize(np.fromiter((column_values[i] for i in present), dtype=np.float64, count=len(present)), kind)
+            for index, value in zip(present, noisy.tolist()):
+                column_values[index] = value
+            self._record_spend(table.name, column, self._sensitivity(kind), len(present))
+
+        for column in rollup_columns:
+            rows_noised, sensitivity = self._privatize_rollups(column, values[column])
+            if rows_noised:
+                self._record_spend(table.name, column, sensitivity, rows_noised)
+
+        if not write:
+            return
+        record_ids = [row[0] for row in rows]
+        statement = update(table).where(table.c.record_id == bindparam('b_record_id')).values(
+            {column: bindparam(f'b_{column}', type_=table.c[column].type) for column in columns}
+        )
+        connection.execute(statement, [
+            {'b_record_id': record_id, **{f'b_{column}': values[column][index] for column in columns}}
+            for index, record_id in enumerate(record_ids)
+        ])
+        for column, (child_model, key_column) in rollup_columns.items():
+            if child_model.__table__ in tables:
+                self._rewrite_child_table(connection, child_model, key_column, record_ids, values[column])
+
+    def _privatize_rollups(self, column: str, documents: List[Any]) -> Tuple[int, float]:
+        """
+        Noise the numeric leaves of a JSON rollup column in place, one batch per kind of leaf.
+
+        Returns:
+            Number of documents holding numeric leaves, and the largest sensitivity used
+        """
+        leaves = [list(numeric_leaves(document)) if document is not None else [] for document in documents]
+        by_kind: Dict[str, List[Tuple[int, int]]] = {}
+        for row, row_leaves in enumerate(leaves):
+            for position, (metric, _) in enumerate(row_leaves):
+                by_kind.setdefault(rollup_leaf_kind(column, metric), []).append((row, position))
+        if not by_kind:
+            return 0, 0.0
+
+        noisy = [[number for _, number in row_leaves] for row_leaves in leaves]
+        for kind, positions in by_kind.items():
+            numbers = np.fromiter((noisy[row][position] for row, position in positions), dtype=np.float64, count=len(positions))
+            for (row, position), value in zip(positions, self._privatize(numbers, kind).tolist()):
+                noisy[row][position] = value
+        for row, row_leaves in enumerate(noisy):
+            if row_leaves:
+                documents[row] = replace_numeric_leaves(documents[row], iter(row_leaves))
+        return sum(1 for row_leaves in leaves if row_leaves), max(self._sensitivity(kind) for kind in by_kind)
+
+    @staticmethod
+    def _rewrite_child_table(
+        connection: Connection,
+        child_model: type,
+        key_column: str,
+        record_ids: List[str],
+        documents: List[Any]
+    ) -> None:
+        """Copy the noisy leaves of a JSON rollup column onto the child table flattened from it."""
+        table = child_model.__table__
+        key_type = table.c[key_column].type.python_type
+        if child_model is MerchantFrequency:
+            statement = update(table).where(
+                table.c.record_id == bindparam('b_record_id'), table.c.merchant == bindparam('b_key')
+            ).values(count=bindparam('b_value'))
+            rows = [
+                {'b_record_id': record_id, 'b_key': merchant, 'b_value': count}
+                for record_id, document in zip(record_ids, documents) if isinstance(document, dict)
+                for merchant, count in document.items()
+            ]
+        else:
+            statement = update(table).where(
+                table.c.record_id == bindparam('b_record_id'),
+                table.c[key_column] == bindparam('b_key'),
+                table.c.metric == bindparam('b_metric')
+            ).values(value=bindparam('b_value'))
+            rows = [
+                {'b_record_id': record_id, 'b_key': key_type(key), 'b_metric': metric, 'b_value': value}
+                for record_id, document in zip(record_ids, documents) if document
+                for key, (metric, value, _) in keyed_leaves(document) if value is not None
+            ]
+        if rows:
+            connection.execute(statement, rows)
+
+    def _privatize(self, values: np.ndarray, kind: str) -> np.ndarray:
+        """Add noise to a column of values and post-process it to the column's domain."""
+        sensitivity = self._sensitivity(kind)
+        if self.mechanism == 'gaussian':
+            noise = gaussian_noise(self.rng, values.size, sensitivity, self.column_epsilon, self.delta)
+        else:
+            noise = laplace_noise(self.rng, values.size, sensitivity, self.column_epsilon)
+
+        values = values + noise
+        if kind == 'ratio':
+            values = np.clip(values, 0.0, 1.0)
+        elif kind == 'count':
+            values = np.clip(np.rint(values), 0, None).astype(np.int64)
+        return values
+
+    def _sensitivity(self, kind: str) -> float:
+        """Return the sensitivity used for a kind of column."""
+        if kind == 'amount':
+            return settings.DP_AMOUNT_SENSITIVITY
+        return 1.0
+
+    def _record_spend(self, table: str, column: str, sensitivity: float, rows: int) -> None:
+        """Record that a column was released with the per-column budget."""
+        key = f"{table}.{column}"
+        entry = self.spent.setdefault(key, {
+            'table': table,
+            'column': column,
+            'sensitivity': sensitivity,
+            'epsilon': self.column_epsilon,
+            'delta': self.delta if self.mechanism == 'gaussian' else 0.0,
+            'rows': 0,
+        })
+        entry['rows'] += rows
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the privacy-budget accounting record for the run.
+        Every statement is a disjoint record, so each released column costs its
+        per-column epsilon and delta once regardless of how many statements were
+        processed. The spend of the columns composes: epsilon and delta add up.
+
+        Returns:
+            Dictionary describing the mechanism, budget and spend per column
+        """
+        return {
+            'mechanism': self.mechanism,
+            'privacy_level': self.privacy_level,
+            'epsilon_budget': self.epsilon,
+            'epsilon_spent': sum(entry['epsilon'] for entry in self.spent.values()),
+            'delta': sum(entry['delta'] for entry in self.spent.values()),
+            'delta_per_column': self.delta if self.mechanism == 'gaussian' else 0.0,
+            'seeded': self.seed is not None,
+            'columns': list(self.spent.values()),
+        }
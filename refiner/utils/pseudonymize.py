@@ -0,0 +1,77 @@
+import hashlib
+from typing import Dict, List, Optional, Sequence, Union
+
+from refiner.config import settings
+
+
+class Pseudonymizer:
+    """
+    Replaces identifiers with keyed BLAKE2b digests.
+
+    The same value always maps to the same pseudonym for a given secret, so pseudonymized
+    columns can still be joined across refinements of the same DLP. Digests of repeated
+    values are cached for the lifetime of the instance.
+    """
+
+    def __init__(
+        self,
+        secret: Union[str, bytes, None] = None,
+        digest_size: Optional[int] = None,
+        cache_size: Optional[int] = None
+    ):
+        """
+        Initialize the pseudonymizer.
+
+        Args:
+            secret: Per-DLP secret key (defaults to PSEUDONYMIZATION_SECRET)
+            digest_size: Digest length in bytes, 1-64 (defaults to PSEUDONYMIZATION_DIGEST_SIZE)
+            cache_size: Maximum number of cached pseudonyms (defaults to PSEUDONYMIZATION_CACHE_SIZE)
+        """
+        secret = secret if secret is not None else settings.PSEUDONYMIZATION_SECRET
+        if not secret:
+            raise ValueError("A pseudonymization secret is required")
+        key = secret.encode() if isinstance(secret, str) else secret
+        if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+            key = hashlib.blake2b(key).digest()
+
+        self.digest_size = digest_size or settings.PSEUDONYMIZATION_DIGEST_SIZE
+        self.cache_size = cache_size or settings.PSEUDONYMIZATION_CACHE_SIZE
+        # Keying BLAKE2b costs a compression round, so key once and copy the state per value
+        self._keyed = hashlib.blake2b(key=key, digest_size=self.digest_size)
+        self._cache: Dict[str, str] = {}
+
+    def pseudonymize(self, value: Optional[str]) -> Optional[str]:
+        """
+        Return the pseudonym of a single value.
+
+        Args:
+            value: Value to pseudonymize
+
+        Returns:
+            Hex digest of the value, or the value itself if it is empty
+        """
+        if not value:
+            return value
+
+        pseudonym = self._cache.get(value)
+        if pseudonym is None:
+            hasher = self._keyed.copy()
+            hasher.update(value.encode())
+            pseudonym = hasher.hexdigest()
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[value] = pseudonym
+        return pseudonym
+
+    def pseudonymize_column(self, values: Sequence[Optional[str]]) -> List[Optional[str]]:
+        """
+        Pseudonymize a whole column, hashing each distinct value once.
+
+        Args:
+            values: Column of values to pseudonymize
+
+        Returns:
+            Column of pseudonyms in the same order
+        """
+        pseudonyms = {value: self.pseudonymize(value) for value in set(values)}
+        return [pseudonyms[value] for value in values]
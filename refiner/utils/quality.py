@@ -0,0 +1,311 @@
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from refiner.config import settings
+from refiner.models.unrefined import CreditStatement
+from refiner.utils.memory import MemoryGovernor
+
+# Transaction fields the quality checks read
+QUALITY_FIELDS = ('amount', 'currency', 'transaction_country', 'transaction_date')
+
+
+class DataQualityError(ValueError):
+    """Raised when a statement scores below the configured quality threshold."""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+    def __reduce__(self):
+        # Keep the report when the error is raised in a parse worker process
+        return type(self), (str(self), self.report)
+
+
+def parse_date_column(dates: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Parse a column of ISO date strings into a datetime64[D] array.
+    Values that are missing or cannot be parsed become NaT.
+
+    Args:
+        dates: Sequence of date strings (a time component is ignored)
+
+    Returns:
+        Array of dates with dtype datetime64[D]
+    """
+    truncated = [date[:10] if date else 'NaT' for date in dates]
+    try:
+        return np.array(truncated, dtype='datetime64[D]')
+    except ValueError:
+        # Fall back to element-wise parsing so one bad value doesn't fail the column
+        parsed = np.empty(len(truncated), dtype='datetime64[D]')
+        for i, date in enumerate(truncated):
+            try:
+                parsed[i] = np.datetime64(date, 'D')
+            except ValueError:
+                parsed[i] = np.datetime64('NaT')
+        return parsed
+
+
+class QualityGate:
+    """
+    Validates credit statements against the configured data quality limits.
+    Transactions are checked column by column in batches, and each statement
+    receives a quality score between 0 and 100.
+    """
+
+    def __init__(
+        self,
+        min_quality_score: Optional[float] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        memory_governor: Optional[MemoryGovernor] = None
+    ):
+        self.min_quality_score = min_quality_score if min_quality_score is not None else settings.MIN_QUALITY_SCORE
+        self.min_amount = min_amount if min_amount is not None else settings.MIN_TRANSACTION_AMOUNT
+        self.max_amount = max_amount if max_amount is not None else settings.MAX_TRANSACTION_AMOUNT
+        self.batch_size = batch_size or settings.BATCH_SIZE
+        self.memory_governor = memory_governor
+        self.supported_currencies = frozenset(settings.SUPPORTED_CURRENCIES)
+        self.supported_countries = frozenset(settings.SUPPORTED_COUNTRIES)
+
+    def check_transaction_columns(
+        self,
+        amounts: Sequence[float],
+        currencies: Sequence[Optional[str]],
+        countries: Sequence[Optional[str]],
+        transaction_dates: Sequence[Optional[str]],
+        period_start: Optional[str] = None,
+        period_end: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Check a batch of transactions given as columns.
+
+        Args:
+            amounts: Transaction amounts (payments and refunds may be negative)
+            currencies: ISO 4217 currency codes
+            countries: ISO 3166-1 alpha-2 country codes
+            transaction_dates: ISO transaction dates
+            period_start: Optional start of the statement period
+            period_end: Optional end of the statement period
+
+        Returns:
+            Number of failed rows per check
+        """
+        failures = self._check_values(amounts, currencies, countries)
+        failures['date_outside_period'] = self._count_dates_outside(transaction_dates, period_start, period_end)
+        return failures
+
+    def _check_values(
+        self,
+        amounts: Sequence[float],
+        currencies: Sequence[Optional[str]],
+        countries: Sequence[Optional[str]]
+    ) -> Dict[str, int]:
+        """Count the rows failing the amount, currency and country checks."""
+        magnitudes = np.abs(np.asarray(amounts, dtype=np.float64))
+        amount_ok = (magnitudes >= self.min_amount) & (magnitudes <= self.max_amount)
+
+        currency_ok = np.fromiter(
+            (currency in self.supported_currencies for currency in currencies), dtype=bool, count=len(currencies)
+        )
+        country_ok = np.fromiter(
+            (country in self.supported_countries for country in countries), dtype=bool, count=len(countries)
+        )
+
+        return {
+            'amount_out_of_range': int(np.count_nonzero(~amount_ok)),
+            'unsupported_currency': int(np.count_nonzero(~currency_ok)),
+            'unsupported_country': int(np.count_nonzero(~country_ok)),
+        }
+
+    @staticmethod
+    def _count_dates_outside(
+        transaction_dates: Sequence[Optional[str]],
+        period_start: Optional[str],
+        period_end: Optional[str],
+        weights: Optional[Sequence[int]] = None
+    ) -> int:
+        """Count the dates that are invalid or outside the period, each counted weights[i] times if given."""
+        dates = parse_date_column(transaction_dates)
+        date_ok = ~np.isnat(dates)
+        if period_start and period_end:
+            start, end = parse_date_column([period_start, period_end])
+            if not np.isnat(start) and not np.isnat(end):
+                date_ok &= (dates >= start) & (dates <= end)
+        if weights is None:
+            return int(np.count_nonzero(~date_ok))
+        return int(np.asarray(weights, dtype=np.int64)[~date_ok].sum())
+
+    def evaluate(
+        self,
+        statement: CreditStatement,
+        transaction_columns: Optional[Mapping[str, Sequence[Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Score a validated credit statement.
+
+        The score is the percentage of passed checks: four per transaction plus
+        the statement's own currency and country when present.
+
+        Args:
+            statement: Validated credit statement
+            transaction_columns: Optional transaction values per field name, used instead of statement.transactions
+
+        Returns:
+            Quality report with the score, failures per check and acceptance flag
+        """
+        if transaction_columns is None:
+            transaction_columns = {
+                name: [getattr(txn, name) for txn in statement.transactions]
+                for name in QUALITY_FIELDS
+            }
+        tally = self.tally()
+        transaction_count = len(transaction_columns['amount'])
+        offset = 0
+        while offset < transaction_count:
+            batch_size = self.memory_governor.next_batch_size() if self.memory_governor else self.batch_size
+            stop = min(offset + batch_size, transaction_count)
+            tally.add({name: transaction_columns[name][offset:stop] for name in QUALITY_FIELDS})
+            offset = stop
+        return tally.report(statement)
+
+    def tally(self) -> 'QualityTally':
+        """Return an empty tally, to score a statement whose transactions arrive batch by batch."""
+        return QualityTally(self)
+
+    def validate(
+        self,
+        statement: CreditStatement,
+        transaction_columns: Optional[Mapping[str, Sequence[Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Score a statement and reject it if it falls below the quality threshold.
+
+        Args:
+            statement: Validated credit statement
+            transaction_columns: Optional transaction values per field name, used instead of statement.transactions
+
+        Returns:
+            Quality report for the accepted statement
+
+        Raises:
+            DataQualityError: If the statement's score is below MIN_QUALITY_SCORE
+        """
+        return self.accept(self.evaluate(statement, transaction_columns))
+
+    def accept(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Reject a scored statement if it falls below the quality threshold.
+
+        Args:
+            report: Quality report from evaluate or a tally
+
+        Returns:
+            The report of the accepted statement
+
+        Raises:
+            DataQualityError: If the statement's score is below MIN_QUALITY_SCORE
+        """
+        if not report['accepted']:
+            raise DataQualityError(
+                f"Statement {report['record_id']} rejected with quality score {report['score']} "
+                f"(minimum {self.min_quality_score})",
+                report
+            )
+        return report
+
+
+class QualityTally:
+    """
+    Quality checks of a statement's transactions, added up batch by batch.
+
+    Transaction dates are only counted per distinct value while batches are added and
+    checked against the statement period when the report is made, so a streamed
+    statement whose metadata follows its transactions is scored without keeping them.
+    """
+
+    def __init__(self, gate: QualityGate):
+        """
+        Initialize an empty tally.
+
+        Args:
+            gate: Gate whose limits the transactions are checked against
+        """
+        self.gate = gate
+        self.transactions = 0
+        self.failures = {'amount_out_of_range': 0, 'unsupported_currency': 0, 'unsupported_country': 0}
+        self.dates: Counter = Counter()
+
+    def add(self, transaction_columns: Mapping[str, Sequence[Any]]) -> None:
+        """
+        Check a batch of transactions.
+
+        Args:
+            transaction_columns: Values of QUALITY_FIELDS per field name
+        """
+        failures = self.gate._check_values(
+            transaction_columns['amount'], transaction_columns['currency'], transaction_columns['transaction_country']
+        )
+        for check, count in failures.items():
+            self.failures[check] += count
+        self.dates.update(transaction_columns['transaction_date'])
+        self.transactions += len(transaction_columns['amount'])
+
+    def report(self, statement: CreditStatement) -> Dict[str, Any]:
+        """
+        Score the statement from the checked transactions and its own metadata.
+
+        Args:
+            statement: Validated credit statement
+
+        Returns:
+            Quality report with the score, failures per check and acceptance flag
+        """
+        metadata = statement.statement_metadata
+        period = metadata.statement_period
+        failures = dict(self.failures)
+        failures['date_outside_period'] = self.gate._count_dates_outside(
+            list(self.dates), period.start_date if period else None, period.end_date if period else None,
+            list(self.dates.values())
+        )
+        total_checks = self.transactions * len(failures)
+
+        if metadata.currency:
+            total_checks += 1
+            if metadata.currency not in self.gate.supported_currencies:
+                failures['unsupported_currency'] += 1
+        if metadata.country_code:
+            total_checks += 1
+            if metadata.country_code not in self.gate.supported_countries:
+                failures['unsupported_country'] += 1
+
+        failed_checks = sum(failures.values())
+        score = 100.0 * (total_checks - failed_checks) / total_checks if total_checks else 100.0
+
+        return {
+            'record_id': metadata.record_id,
+            'score': round(score, 2),
+            'transactions': self.transactions,
+            'failures': failures,
+            'accepted': score >= self.gate.min_quality_score,
+        }
+
+
+def summarize_quality_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize the quality reports of a refinement run.
+
+    Args:
+        reports: Quality reports of all evaluated statements
+
+    Returns:
+        Counts of accepted and rejected statements with the individual reports
+    """
+    return {
+        'accepted': sum(1 for report in reports if report['accepted']),
+        'rejected': sum(1 for report in reports if not report['accepted']),
+        'statements': reports,
+    }
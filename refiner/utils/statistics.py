@@ -0,0 +1,168 @@
+import calendar
+import math
+from datetime import date
+from typing import Any, Collection, Dict, List, Optional
+
+from sqlalchemy import Table, func, select
+from sqlalchemy.engine import Engine
+
+from refiner.config import settings
+from refiner.models.refined import TransactionRecord
+from refiner.utils.dedup import BloomFilter
+
+STATISTICS_GRANULARITIES = ('none', 'coarse', 'exact')
+
+# Transaction columns published as a value set, so queries on them can skip refinements without a match
+STATISTICS_SET_COLUMNS = ('category_primary', 'merchant_id', 'currency')
+
+# Smallest capacity a value set filter is sized for, tiny filters have a much higher false positive rate in practice
+MIN_BLOOM_CAPACITY = 16
+
+
+def _month_range(first: date, last: date) -> Dict[str, str]:
+    """Widen a date range to whole months."""
+    last_day = calendar.monthrange(last.year, last.month)[1]
+    return {
+        'min': first.replace(day=1).isoformat(),
+        'max': last.replace(day=last_day).isoformat(),
+    }
+
+
+def _bucket_range(low: float, high: float, bucket: float) -> Dict[str, float]:
+    """Widen a numeric range outward to multiples of a bucket width."""
+    return {
+        'min': math.floor(low / bucket) * bucket,
+        'max': math.ceil(high / bucket) * bucket,
+    }
+
+
+def _round_count(count: int) -> int:
+    """Round a row count up to the next power of two."""
+    return 0 if count == 0 else 1 << (count - 1).bit_length()
+
+
+def _value_set(values: List[str], granularity: str, distinct_limit: int, error_rate: float) -> Dict[str, Any]:
+    """
+    Describe the distinct values of a column.
+
+    Small sets are listed at exact granularity, anything else is published as a Bloom
+    filter that answers membership queries without enumerating the values. The filter
+    is unsalted, so it only hides values that cannot be guessed and tested against it.
+    """
+    if granularity == 'exact' and len(values) <= distinct_limit:
+        return {'values': sorted(values)}
+    bloom = BloomFilter(max(len(values), MIN_BLOOM_CAPACITY), error_rate)
+    for value in values:
+        bloom.add(value)
+    return {'bloom': bloom.to_dict()}
+
+
+def build_statistics_manifest(
+    engine: Engine,
+    tables: List[Table],
+    granularity: Optional[str] = None,
+    distinct_limit: Optional[int] = None,
+    bloom_error_rate: Optional[float] = None,
+    amount_bucket: Optional[float] = None,
+    pseudonymized_columns: Optional[Collection[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Compute the statistics manifest (zone map) of a finished refinement.
+
+    The manifest holds the row count of every table, the transaction date and amount
+    ranges and the value sets of category_primary, merchant_id and currency. Downstream
+    systems compare a query against it to skip refinements that cannot match, without
+    downloading or decrypting them.
+
+    At coarse granularity, dates are widened to whole months, amounts to multiples of
+    STATISTICS_AMOUNT_BUCKET and row counts are rounded up to a power of two. Value sets
+    are only published as Bloom filters, and only for columns holding keyed pseudonyms:
+    currencies, categories and raw merchant IDs come from small public vocabularies, so
+    anyone could recover them by testing every candidate against the filter. The ranges
+    always contain the exact ones, so pruning stays correct, and a missing value set
+    simply never prunes.
+
+    Args:
+        engine: Engine of the refined database
+        tables: Tables of the refinement
+        granularity: none, coarse or exact (defaults to STATISTICS_GRANULARITY)
+        distinct_limit: Largest value set listed explicitly at exact granularity (defaults to STATISTICS_DISTINCT_LIMIT)
+        bloom_error_rate: False positive rate of the value set filters (defaults to STATISTICS_BLOOM_ERROR_RATE)
+        amount_bucket: Bucket width of coarse amount ranges (defaults to STATISTICS_AMOUNT_BUCKET)
+        pseudonymized_columns: Columns stored as keyed pseudonyms (defaults to PSEUDONYMIZE_FIELDS
+            when PSEUDONYMIZATION_SECRET is set)
+
+    Returns:
+        The manifest, or None if statistics are disabled
+    """
+    granularity = granularity or settings.STATISTICS_GRANULARITY
+    if granularity not in STATISTICS_GRANULARITIES:
+        raise ValueError(f"Unsupported statistics granularity: {granularity}")
+    if granularity == 'none':
+        return None
+    distinct_limit = distinct_limit if distinct_limit is not None else settings.STATISTICS_DISTINCT_LIMIT
+    bloom_error_rate = bloom_error_rate or settings.STATISTICS_BLOOM_ERROR_RATE
+    amount_bucket = amount_bucket or settings.STATISTICS_AMOUNT_BUCKET
+    if pseudonymized_columns is None:
+        pseudonymized_columns = settings.PSEUDONYMIZE_FIELDS if settings.PSEUDONYMIZATION_SECRET else ()
+    if granularity == 'exact':
+        set_columns = STATISTICS_SET_COLUMNS
+    else:
+        set_columns = tuple(column for column in STATISTICS_SET_COLUMNS if column in pseudonymized_columns)
+
+    transactions = TransactionRecord.__table__
+    with engine.connect() as connection:
+        row_counts = {
+            table.name: connection.execute(select(func.count()).select_from(table)).scalar()
+            for table in tables
+        }
+        first_date, last_date, low_amount, high_amount = connection.execute(select(
+            func.min(transactions.c.transaction_date), func.max(transactions.c.transaction_date),
+            func.min(transactions.c.amount), func.max(transactions.c.amount)
+        )).one()
+        value_sets = {
+            column: connection.execute(
+                select(transactions.c[column]).where(transactions.c[column].isnot(None)).distinct()
+            ).scalars().all()
+            for column in set_columns
+        }
+
+    manifest: Dict[str, Any] = {'granularity': granularity}
+    if granularity == 'exact':
+        manifest['row_counts'] = row_counts
+    else:
+        manifest['row_counts'] = {name: _round_count(count) for name, count in row_counts.items()}
+
+    # An empty transactions table has no ranges, which tells readers no transaction query can match
+    if first_date is not None:
+        if granularity == 'exact':
+            manifest['transaction_date'] = {'min': first_date.isoformat(), 'max': last_date.isoformat()}
+            manifest['amount'] = {'min': low_amount, 'max': high_amount}
+        else:
+            manifest['transaction_date'] = _month_range(first_date, last_date)
+            manifest['amount'] = _bucket_range(low_amount, high_amount, amount_bucket)
+
+    for column, values in value_sets.items():
+        manifest[column] = _value_set(values, granularity, distinct_limit, bloom_error_rate)
+    return manifest
+
+
+def may_contain(manifest: Dict[str, Any], column: str, value: str) -> bool:
+    """
+    Check whether a refinement can hold a value of a set column.
+
+    Args:
+        manifest: Statistics manifest of the refinement
+        column: One of category_primary, merchant_id or currency
+        value: Value the query filters on
+
+    Returns:
+        False if the refinement certainly holds no row with the value
+    """
+    value_set = manifest.get(column)
+    if value_set is None:
+        return True
+    if 'values' in value_set:
+        return value in value_set['values']
+    return value in BloomFilter.from_dict(value_set['bloom'])
+
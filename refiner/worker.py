@@ -0,0 +1,270 @@
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Optional
+
+from pydantic import ValidationError
+from sqlalchemy.orm import configure_mappers
+
+from refiner.__main__ import run
+from refiner.config import settings
+from refiner.models.job import RefinementJob
+from refiner.models.output import Output
+from refiner.transformer.base_transformer import ReusableEngine
+
+SPOOL_INCOMING = 'incoming'
+SPOOL_PROCESSING = 'processing'
+SPOOL_DONE = 'done'
+SPOOL_FAILED = 'failed'
+
+
+class RefinementWorker:
+    """
+    Long-running worker that processes refinement jobs in a warm interpreter.
+
+    Imports, SQLAlchemy mapper configuration, Pydantic validators, compiled PII patterns,
+    the SQLAlchemy engine and the IPFS HTTP session are set up once and reused by every job.
+    Jobs run one at a time and produce exactly the same output as `python -m refiner`,
+    except that duplicates are not detected across jobs: each job belongs to a different
+    user, so they must not share the cross-run duplicate filter.
+    """
+
+    def __init__(self):
+        if settings.DEDUP_FILTER_PATH:
+            logging.warning("DEDUP_FILTER_PATH is ignored by workers, jobs belong to different users")
+            settings.DEDUP_FILTER_PATH = None
+        configure_mappers()
+        self.engine = ReusableEngine()
+        self.jobs_processed = 0
+
+    def run_job(self, job: RefinementJob) -> Output:
+        """
+        Run a single refinement job.
+
+        Args:
+            job: Job describing the input directory, output directory and encryption key
+
+        Returns:
+            The refinement output, also written to output.json in the job's output directory
+        """
+        os.makedirs(job.output_dir, exist_ok=True)
+        started = time.monotonic()
+        output = run(job.input_dir, job.output_dir, job.encryption_key, self.engine, job.resume)
+        self.jobs_processed += 1
+        logging.info(f"Job {job.job_id or job.input_dir} completed in {time.monotonic() - started:.3f}s")
+        return output
+
+    def serve_spool(self, spool_dir: str, poll_interval: Optional[float] = None) -> None:
+        """
+        Process job files dropped into <spool_dir>/incoming until interrupted.
+
+        Each job file is a JSON RefinementJob. It is claimed by moving it to processing/,
+        and a result file without the encryption key is written to done/ or failed/.
+        Jobs left in processing/ by a worker that stopped mid-job are moved to failed/
+        on startup.
+
+        Args:
+            spool_dir: Spool directory
+            poll_interval: Seconds to wait when no job is pending (defaults to WORKER_POLL_INTERVAL)
+        """
+        poll_interval = poll_interval if poll_interval is not None else settings.WORKER_POLL_INTERVAL
+        for subdir in (SPOOL_INCOMING, SPOOL_PROCESSING, SPOOL_DONE, SPOOL_FAILED):
+            os.makedirs(os.path.join(spool_dir, subdir), exist_ok=True)
+        self.recover_spool(spool_dir)
+
+        logging.info(f"Worker watching spool directory {spool_dir}")
+        while True:
+            if not self.process_spool_once(spool_dir):
+                time.sleep(poll_interval)
+
+    def process_spool_once(self, spool_dir: str) -> bool:
+        """
+        Claim and run the oldest pending job in the spool directory.
+
+        The job file stays locked while the job runs, which tells other workers it is not
+        abandoned. The lock is taken before the file is moved to processing/, so a job
+        file there is never unlocked while its worker is alive.
+
+        Args:
+            spool_dir: Spool directory
+
+        Returns:
+            True if a job was processed, False if none was pending
+        """
+        incoming_dir = os.path.join(spool_dir, SPOOL_INCOMING)
+        pending = sorted(
+            (entry for entry in os.scandir(incoming_dir) if entry.is_file() and entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+
+        for entry in pending:
+            processing_path = os.path.join(spool_dir, SPOOL_PROCESSING, entry.name)
+            try:
+                job_file = open(entry.path, 'r')
+            except FileNotFoundError:
+                continue
+            with job_file:
+                try:
+                    fcntl.flock(job_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # Renaming is atomic, so only one worker can claim a job file
+                    os.rename(entry.path, processing_path)
+                except (BlockingIOError, FileNotFoundError):
+                    continue
+
+                job_id = os.path.splitext(entry.name)[0]
+                result = {'job_id': job_id}
+                try:
+                    job = RefinementJob.model_validate({'job_id': job_id, **json.load(job_file)})
+                    result['job'] = job.model_dump(exclude={'encryption_key'})
+                    result['output'] = self.run_job(job).model_dump()
+                    result_dir = SPOOL_DONE
+                except Exception as e:
+                    logging.error(f"Job {job_id} failed: {e}")
+                    traceback.print_exc()
+                    result['error'] = str(e)
+                    result_dir = SPOOL_FAILED
+
+                self._write_result(spool_dir, result_dir, entry.name, result)
+                os.remove(processing_path)
+            return True
+
+        return False
+
+    def recover_spool(self, spool_dir: str) -> int:
+        """
+        Move jobs abandoned in processing/ by a worker that stopped mid-job to failed/.
+
+        Jobs still locked by a running worker are left alone. An abandoned job is not
+        retried automatically, since it may be what stopped its worker; resubmitting it
+        with "resume": true continues from its checkpoint.
+
+        Args:
+            spool_dir: Spool directory
+
+        Returns:
+            Number of abandoned jobs moved to failed/
+        """
+        processing_dir = os.path.join(spool_dir, SPOOL_PROCESSING)
+        recovered = 0
+        for entry in os.scandir(processing_dir):
+            if not (entry.is_file() and entry.name.endswith('.json')):
+                continue
+            try:
+                job_file = open(entry.path, 'r')
+            except FileNotFoundError:
+                continue
+            with job_file:
+                try:
+                    fcntl.flock(job_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                # The job finished and was removed while this worker waited for its lock
+                if os.fstat(job_file.fileno()).st_nlink == 0:
+                    continue
+
+                job_id = os.path.splitext(entry.name)[0]
+                result = {'job_id': job_id, 'error': "Worker stopped before the job finished"}
+                try:
+                    job = RefinementJob.model_validate({'job_id': job_id, **json.load(job_file)})
+                    result['job'] = job.model_dump(exclude={'encryption_key'})
+                except (TypeError, ValueError):
+                    pass
+                logging.warning(f"Job {job_id} was abandoned by a stopped worker, moving it to {SPOOL_FAILED}")
+                self._write_result(spool_dir, SPOOL_FAILED, entry.name, result)
+                os.remove(entry.path)
+                recovered += 1
+        return recovered
+
+    @staticmethod
+    def _write_result(spool_dir: str, result_dir: str, filename: str, result: dict) -> None:
+        """Write the result file of a job to done/ or failed/."""
+        with open(os.path.join(spool_dir, result_dir, filename), 'w') as f:
+            json.dump(result, f, indent=2)
+
+    def serve_http(self, host: Optional[str] = None, port: Optional[int] = None) -> None:
+        """
+        Accept jobs over a local HTTP endpoint until interrupted.
+
+        POST /jobs with a JSON RefinementJob body runs the job and responds with its output.
+        GET /health reports liveness. Requests are handled one at a time.
+
+        Args:
+            host: Interface to bind (defaults to WORKER_HTTP_HOST)
+            port: Port to listen on (defaults to WORKER_HTTP_PORT)
+        """
+        host = host or settings.WORKER_HTTP_HOST
+        port = port or settings.WORKER_HTTP_PORT
+        worker = self
+
+        class JobRequestHandler(BaseHTTPRequestHandler):
+            def _respond(self, status: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == '/health':
+                    self._respond(200, {'status': 'ok', 'jobs_processed': worker.jobs_processed})
+                else:
+                    self._respond(404, {'error': 'Not found'})
+
+            def do_POST(self):
+                if self.path != '/jobs':
+                    self._respond(404, {'error': 'Not found'})
+                    return
+                try:
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    job = RefinementJob.model_validate_json(body)
+                except ValidationError as e:
+                    self._respond(400, {'error': str(e)})
+                    return
+                try:
+                    self._respond(200, worker.run_job(job).model_dump())
+                except Exception as e:
+                    logging.error(f"Job {job.job_id or job.input_dir} failed: {e}")
+                    traceback.print_exc()
+                    self._respond(500, {'error': str(e)})
+
+            def log_message(self, format, *args):
+                logging.info(f"{self.address_string()} {format % args}")
+
+        server = HTTPServer((host, port), JobRequestHandler)
+        logging.info(f"Worker listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+# Run with: python -m refiner.worker --spool-dir /spool  (or --http-port 8080)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run refinement jobs in a long-running worker")
+    parser.add_argument('--spool-dir', default=settings.WORKER_SPOOL_DIR, help="Spool directory to take job files from")
+    parser.add_argument('--http-port', type=int, default=settings.WORKER_HTTP_PORT, help="Port of the local HTTP job endpoint")
+    parser.add_argument('--http-host', default=settings.WORKER_HTTP_HOST, help="Interface of the local HTTP job endpoint")
+    args = parser.parse_args()
+
+    if not args.spool_dir and not args.http_port:
+        parser.error("Either --spool-dir or --http-port is required")
+
+    try:
+        worker = RefinementWorker()
+        if args.http_port:
+            worker.serve_http(args.http_host, args.http_port)
+        else:
+            worker.serve_spool(args.spool_dir)
+    except KeyboardInterrupt:
+        logging.info("Worker stopped")
+    except Exception as e:
+        logging.error(f"Worker failed: {e}")
+        traceback.print_exc()
+        sys.exit(1)
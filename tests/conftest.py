@@ -0,0 +1,20 @@
+import hashlib
+import json
+
+import pytest
+
+import refiner.refine
+
+
+@pytest.fixture
+def offline_ipfs(monkeypatch):
+    """Replace IPFS uploads with content hashes, so refinements run without a pinning service."""
+    def upload_file(file_path: str) -> str:
+        with open(file_path, 'rb') as f:
+            return f"Qm{hashlib.sha256(f.read()).hexdigest()[:44]}"
+
+    def upload_json(data) -> str:
+        return f"Qm{hashlib.sha256(json.dumps(data).encode()).hexdigest()[:44]}"
+
+    monkeypatch.setattr(refiner.refine, 'upload_file_to_ipfs', upload_file)
+    monkeypatch.setattr(refiner.refine, 'upload_json_to_ipfs', upload_json)
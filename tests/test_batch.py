@@ -0,0 +1,43 @@
+import io
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from refiner.batch import run_batch
+from refiner.models.output import Output
+from refiner.worker import RefinementWorker
+
+
+def fake_run_job(self, job):
+    """Stand-in for a refinement whose pool process is killed for the job named 'oom'."""
+    if job.job_id == 'oom':
+        os._exit(137)
+    return Output(refinement_url=f"ipfs://{job.job_id}")
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="pool processes must inherit the stand-in")
+def test_dead_worker_fails_only_its_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(RefinementWorker, 'run_job', fake_run_job)
+    job_ids = ['a', 'b', 'oom', 'c', 'd', 'e']
+    manifest = tmp_path / 'manifest.jsonl'
+    with open(manifest, 'w') as f:
+        for job_id in job_ids:
+            f.write(json.dumps({
+                'job_id': job_id,
+                'input_dir': str(tmp_path),
+                'output_dir': str(tmp_path / job_id),
+                'encryption_key': 'key',
+            }) + '\n')
+
+    results = io.StringIO()
+    summary = run_batch(str(manifest), results, max_workers=2)
+
+    recorded = {result['job_id']: result for result in map(json.loads, results.getvalue().splitlines())}
+    assert sorted(recorded) == sorted(job_ids)
+    assert recorded['oom']['status'] == 'failed'
+    assert 'died' in recorded['oom']['error']
+    for job_id in set(job_ids) - {'oom'}:
+        assert recorded[job_id] == {**recorded[job_id], 'status': 'succeeded', 'refinement_url': f"ipfs://{job_id}"}
+    assert summary['succeeded'] == 5 and summary['failed'] == 1
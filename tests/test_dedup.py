@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from refiner.config import settings
+from refiner.transformer.credit_statement_transformer import CreditStatementTransformer
+from refiner.transformer.statement_parser import StatementParser
+from refiner.utils.dedup import BloomFilter, TransactionDeduplicator
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+
+def test_bloom_filter_survives_save_and_load(tmp_path):
+    bloom = BloomFilter(1000, 0.01)
+    identifiers = [f"txn_{i}" for i in range(1000)]
+    for identifier in identifiers:
+        bloom.add(identifier)
+    path = str(tmp_path / 'filter.bin')
+
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+
+    assert (loaded.size, loaded.hash_count, loaded.count, loaded.bits) == (bloom.size, bloom.hash_count, 1000, bloom.bits)
+    assert all(identifier in loaded for identifier in identifiers)
+    assert BloomFilter.from_dict(json.loads(json.dumps(bloom.to_dict()))).bits == bloom.bits
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_bloom_filter_rejects_other_files(tmp_path):
+    path = tmp_path / 'filter.bin'
+    path.write_bytes(b'\x00' * 64)
+
+    with pytest.raises(ValueError):
+        BloomFilter.load(str(path))
+
+
+def test_cross_run_false_positives_stay_near_the_error_rate(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DEDUP_FILTER_CAPACITY', 20000)
+    path = str(tmp_path / 'filter.bin')
+    first_run = TransactionDeduplicator('drop', path)
+    first_run.partition_keys([f"run1_{i}" for i in range(10000)])
+    first_run.save()
+
+    second_run = TransactionDeduplicator('drop', path)
+    fresh, _, _ = second_run.partition_keys([f"run1_{i}" for i in range(100)] + [f"run2_{i}" for i in range(10000)])
+
+    # Identifiers of the first run are always recognized, new ones only at about the error rate
+    # while the filter holds no more identifiers than its capacity
+    assert fresh[0] >= 100
+    false_positives = second_run.cross_run_duplicates - 100
+    assert false_positives / 10000 < 2 * settings.DEDUP_FILTER_ERROR_RATE
+
+
+@pytest.mark.parametrize('policy, fresh, folds', [
+    ('drop', [0, 1, 3], []),
+    ('merge', [0, 1, 3], [(0, 2), (1, 4), (0, 5)]),
+])
+def test_in_run_duplicates_follow_the_policy(policy, fresh, folds):
+    deduplicator = TransactionDeduplicator(policy, filter_path='')
+
+    assert deduplicator.partition_keys(['a', 'b', 'a', 'c', 'b', 'a']) == (fresh, [], folds)
+    # Keys already written by an earlier batch are merged into the stored row or dropped
+    assert deduplicator.partition_keys(['c', 'd']) == ([1], [0] if policy == 'merge' else [], [])
+    assert deduplicator.in_run_duplicates == 4
+
+
+@pytest.mark.parametrize('batch_size', [100, 2])
+@pytest.mark.parametrize('policy, amount', [('drop', 5.75), ('merge', 6.25)])
+def test_written_duplicates_follow_the_policy(tmp_path, monkeypatch, batch_size, policy, amount):
+    monkeypatch.setattr(settings, 'BATCH_SIZE', batch_size)
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        statement = json.load(f)
+    # A later copy of the first transaction with a corrected amount and no channel
+    statement['transactions'].append({**statement['transactions'][0], 'amount': 6.25, 'channel': None})
+    path = tmp_path / 'statement.json'
+    path.write_text(json.dumps(statement))
+    db_path = str(tmp_path / 'db.libsql')
+
+    transformer = CreditStatementTransformer(db_path, deduplicator=TransactionDeduplicator(policy, filter_path=''))
+    transformer.process_prepared(StatementParser().parse_file(str(path)))
+
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute('SELECT transaction_id, amount, channel FROM transactions ORDER BY transaction_id').fetchall()
+    finally:
+        connection.close()
+    assert len(rows) == 5
+    # Merging only copies non-null values, so the channel of the first copy is kept
+    assert rows[0] == ('txn_001', amount, 'POS')
@@ -0,0 +1,41 @@
+import hashlib
+
+import pytest
+
+import refiner.utils.openpgp
+from refiner.utils.encrypt import EncryptionContext
+from refiner.utils.openpgp import OpenPGPError
+
+
+@pytest.fixture
+def plaintext(tmp_path):
+    path = tmp_path / 'db.libsql'
+    path.write_bytes(b'refined rows ' * 1000)
+    return path
+
+
+def test_verification_derives_the_key_from_the_passphrase(plaintext, monkeypatch):
+    derivations = []
+    session_key_from_skesk = refiner.utils.openpgp.session_key_from_skesk
+
+    def counting_session_key_from_skesk(passphrase, packet):
+        derivations.append(passphrase)
+        return session_key_from_skesk(passphrase, packet)
+
+    monkeypatch.setattr(refiner.utils.openpgp, 'session_key_from_skesk', counting_session_key_from_skesk)
+    context = EncryptionContext('passphrase')
+    expected = hashlib.sha256(plaintext.read_bytes()).hexdigest()
+
+    context.verify_file(context.encrypt_file(str(plaintext)), expected)
+    context.verify_file(context.encrypt_file(str(plaintext), str(plaintext) + '.copy.pgp'), expected)
+
+    assert derivations == [b'passphrase']
+
+
+def test_verification_fails_if_the_passphrase_does_not_open_the_file(plaintext):
+    context = EncryptionContext('passphrase')
+    encrypted_path = context.encrypt_file(str(plaintext))
+
+    context.encryption_key = 'another passphrase'
+    with pytest.raises(OpenPGPError):
+        context.verify_file(encrypted_path, hashlib.sha256(plaintext.read_bytes()).hexdigest())
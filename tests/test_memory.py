@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from refiner.utils.memory import MemoryGovernor, children_rss_mb
+
+
+def test_throttle_shrinks_batches_without_blocking():
+    governor = MemoryGovernor(budget_mb=1, batch_size=1000)
+
+    started = time.monotonic()
+    assert not governor.throttle()
+    assert not governor.throttle()
+
+    assert time.monotonic() - started < 5
+    assert governor.batch_size == 250
+    assert governor.report()['throttle_events'] == 2
+
+
+def test_throttle_reports_headroom_under_budget():
+    governor = MemoryGovernor(budget_mb=1024 * 1024, batch_size=1000)
+
+    assert governor.throttle()
+    assert governor.batch_size == 1000
+    assert governor.report()['throttle_events'] == 0
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/task'), reason="child processes are sampled from /proc")
+def test_sample_counts_child_processes():
+    baseline = children_rss_mb()
+    child = subprocess.Popen(
+        [sys.executable, '-c', "import sys, time; data = b'x' * (64 * 1024 * 1024); sys.stdout.write('ready\\n'); sys.stdout.flush(); time.sleep(30)"],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert child.stdout.readline() == 'ready\n'
+        governor = MemoryGovernor(budget_mb=1024)
+        assert children_rss_mb() - baseline >= 60
+        assert governor.sample() >= children_rss_mb()
+    finally:
+        child.kill()
+        child.wait()
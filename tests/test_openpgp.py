@@ -0,0 +1,161 @@
+import os
+import shutil
+import subprocess
+
+import pgpy
+import pytest
+from pgpy.constants import CompressionAlgorithm, SymmetricKeyAlgorithm
+
+from refiner.utils.encrypt import EncryptionContext
+from refiner.utils.openpgp import CHUNK_SIZE, TAG_SEIPD, OpenPGPError, _ChunkReader, _read_packet_header, iter_decrypted
+
+PASSPHRASE = 'passphrase'
+
+
+@pytest.fixture
+def plaintext():
+    # Incompressible content spanning more than one read chunk
+    return os.urandom(CHUNK_SIZE + 17)
+
+
+def _decrypt(path) -> bytes:
+    return b''.join(iter_decrypted(PASSPHRASE, str(path)))
+
+
+def _packets(message: bytes):
+    """Split a binary message into (tag, body) pairs."""
+    reader = _ChunkReader(iter([message]))
+    packets = []
+    while True:
+        packet = _read_packet_header(reader)
+        if packet is None:
+            return packets
+        tag, body = packet
+        packets.append((tag, b''.join(body())))
+
+
+def _packet(tag: int, body: bytes) -> bytes:
+    """Encode a new format packet with a five-octet length."""
+    return bytes([0xc0 | tag, 0xff]) + len(body).to_bytes(4, 'big') + body
+
+
+def _partial_packet(tag: int, body: bytes, power: int = 9) -> bytes:
+    """Encode a new format packet whose body is split into 2**power byte partial lengths."""
+    encoded = bytearray([0xc0 | tag])
+    size = 1 << power
+    while len(body) > size:
+        encoded += bytes([224 + power]) + body[:size]
+        body = body[size:]
+    # The last chunk of a partial body must carry a definite length
+    encoded += bytes([0xff]) + len(body).to_bytes(4, 'big') + body
+    return bytes(encoded)
+
+
+def _pgpy_message(plaintext: bytes, compression=CompressionAlgorithm.ZLIB) -> bytes:
+    message = pgpy.PGPMessage.new(plaintext, compression=compression)
+    return bytes(message.encrypt(PASSPHRASE, cipher=SymmetricKeyAlgorithm.AES256))
+
+
+def _tamper(message: bytes, index: int) -> bytes:
+    """Flip one bit of the SEIPD body byte at index and re-encode the message."""
+    encoded = b''
+    for tag, body in _packets(message):
+        if tag == TAG_SEIPD:
+            body = bytearray(body)
+            body[index] ^= 0x01
+            body = bytes(body)
+        encoded += _packet(tag, body)
+    return encoded
+
+
+@pytest.mark.parametrize('compression', [
+    CompressionAlgorithm.Uncompressed,
+    CompressionAlgorithm.ZIP,
+    CompressionAlgorithm.ZLIB,
+    CompressionAlgorithm.BZ2,
+])
+def test_pgpy_messages_round_trip(tmp_path, plaintext, compression):
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(_pgpy_message(plaintext, compression))
+
+    assert _decrypt(path) == plaintext
+
+
+def test_encrypted_files_round_trip(tmp_path, plaintext):
+    path = tmp_path / 'db.libsql'
+    path.write_bytes(plaintext)
+
+    assert _decrypt(EncryptionContext(PASSPHRASE).encrypt_file(str(path))) == plaintext
+
+
+@pytest.mark.skipif(shutil.which('gpg') is None, reason="gpg is not installed")
+def test_gpg_messages_round_trip(tmp_path, plaintext):
+    path = tmp_path / 'message.gpg'
+    # Encrypting from a pipe makes gpg write partial body lengths
+    subprocess.run(
+        ['gpg', '--homedir', str(tmp_path), '--batch', '--quiet', '--pinentry-mode', 'loopback',
+         '--passphrase', PASSPHRASE, '--symmetric', '--cipher-algo', 'AES256', '-o', str(path)],
+        input=plaintext, check=True
+    )
+
+    assert _decrypt(path) == plaintext
+
+
+@pytest.mark.skipif(shutil.which('gpg') is None, reason="gpg is not installed")
+def test_gpg_decrypts_encrypted_files(tmp_path, plaintext):
+    path = tmp_path / 'db.libsql'
+    path.write_bytes(plaintext)
+    encrypted_path = EncryptionContext(PASSPHRASE).encrypt_file(str(path))
+
+    decrypted = subprocess.run(
+        ['gpg', '--homedir', str(tmp_path), '--batch', '--quiet', '--pinentry-mode', 'loopback',
+         '--passphrase', PASSPHRASE, '--decrypt', encrypted_path],
+        capture_output=True, check=True
+    ).stdout
+    assert decrypted == plaintext
+
+
+def test_partial_body_lengths(tmp_path, plaintext):
+    message = b''.join(
+        _partial_packet(tag, body) if tag == TAG_SEIPD else _packet(tag, body)
+        for tag, body in _packets(_pgpy_message(plaintext))
+    )
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(message)
+
+    assert _decrypt(path) == plaintext
+
+
+def test_flipped_ciphertext_byte_is_rejected(tmp_path, plaintext):
+    message = _pgpy_message(plaintext, CompressionAlgorithm.Uncompressed)
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(_tamper(message, len(plaintext) // 2))
+
+    with pytest.raises(OpenPGPError, match="Modification detection code mismatch"):
+        _decrypt(path)
+
+
+def test_bad_modification_detection_code_is_rejected(tmp_path, plaintext):
+    message = _pgpy_message(plaintext)
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(_tamper(message, -1))
+
+    with pytest.raises(OpenPGPError, match="Modification detection code mismatch"):
+        _decrypt(path)
+
+
+def test_truncated_message_is_rejected(tmp_path, plaintext):
+    message = _pgpy_message(plaintext)
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(message[:-10])
+
+    with pytest.raises(OpenPGPError):
+        _decrypt(path)
+
+
+def test_wrong_passphrase_is_rejected(tmp_path, plaintext):
+    path = tmp_path / 'message.pgp'
+    path.write_bytes(_pgpy_message(plaintext))
+
+    with pytest.raises(OpenPGPError):
+        b''.join(iter_decrypted('another passphrase', str(path)))
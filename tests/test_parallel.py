@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import refiner.transformer.parallel
+from refiner.transformer.parallel import parse_statement_files
+from refiner.transformer.statement_parser import StatementParser, StreamedTransactions
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+pytestmark = pytest.mark.skipif(
+    multiprocessing.get_start_method() != 'fork', reason="parse workers must see the test's settings"
+)
+
+
+class NoHeadroom:
+    """Memory governor stand-in that never reports headroom."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def throttle(self) -> bool:
+        self.calls += 1
+        return False
+
+
+@pytest.fixture
+def submissions(monkeypatch):
+    """Record the input files in the order they are submitted to the parse workers."""
+    submitted = []
+
+    class RecordingExecutor(ProcessPoolExecutor):
+        def submit(self, fn, input_file, *args):
+            submitted.append(os.path.basename(input_file))
+            return super().submit(fn, input_file, *args)
+
+    monkeypatch.setattr(refiner.transformer.parallel, 'ProcessPoolExecutor', RecordingExecutor)
+    return submitted
+
+
+def statement_files(tmp_path, transaction_counts):
+    """Write one statement file per count, with distinct record IDs and that many transactions."""
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        statement = json.load(f)
+    sample_transactions = statement['transactions']
+    paths = []
+    for index, transaction_count in enumerate(transaction_counts):
+        statement['statement_metadata']['record_id'] = f"stmt_{index}"
+        statement['transactions'] = [
+            {**sample_transactions[i % len(sample_transactions)], 'transaction_id': f"txn_{index}_{i}"}
+            for i in range(transaction_count)
+        ]
+        path = tmp_path / f"statement_{index}.json"
+        path.write_text(json.dumps(statement))
+        paths.append(str(path))
+    return paths
+
+
+def test_starts_the_largest_files_first(tmp_path, submissions):
+    paths = statement_files(tmp_path, [1, 2, 9, 3, 7, 8, 1, 1])
+
+    results = parse_statement_files(((path, True, False) for path in paths), workers=2, queue_size=4)
+    try:
+        first = next(results)()
+        # The writer's next file, then the largest of the next four
+        assert submissions == ['statement_0.json', 'statement_2.json', 'statement_3.json', 'statement_1.json']
+        assert first.statement.statement_metadata.record_id == 'stmt_0'
+        parsed = [first] + [result() for result in results]
+    finally:
+        results.close()
+
+    assert [prepared.statement.statement_metadata.record_id for prepared in parsed] == [f"stmt_{i}" for i in range(8)]
+    assert sorted(submissions) == sorted(os.path.basename(path) for path in paths)
+
+
+def test_stops_parsing_ahead_without_headroom(tmp_path, submissions):
+    paths = statement_files(tmp_path, [2, 5, 5, 5])
+    governor = NoHeadroom()
+
+    results = parse_statement_files(((path, True, False) for path in paths), workers=2, queue_size=4, memory_governor=governor)
+    try:
+        first = next(results)()
+    finally:
+        results.close()
+
+    assert submissions == ['statement_0.json']
+    assert governor.calls == 1
+    assert first.statement.statement_metadata.record_id == 'stmt_0'
+
+
+def test_results_match_parsing_in_process(tmp_path):
+    paths = statement_files(tmp_path, [5, 30, 1, 12, 4])
+    parser = StatementParser()
+
+    results = parse_statement_files(((path, True, False) for path in paths), workers=2, memory_governor=NoHeadroom())
+    parsed = [result() for result in results]
+
+    assert [prepared.statement.statement_metadata.record_id for prepared in parsed] == [f"stmt_{i}" for i in range(5)]
+    for path, prepared in zip(paths, parsed):
+        expected = parser.parse_file(path)
+        assert prepared.transactions.columns == expected.transactions.columns
+
+
+def test_streamed_files_are_only_validated_by_workers(tmp_path):
+    paths = statement_files(tmp_path, [3, 40])
+
+    results = parse_statement_files(((path, True, True) for path in paths), workers=2)
+    parsed = [result() for result in results]
+
+    assert all(isinstance(prepared.transactions, StreamedTransactions) for prepared in parsed)
+    assert [len(prepared.transactions) for prepared in parsed] == [3, 40]
+    assert parsed[1].quality_report['transactions'] == 40
@@ -0,0 +1,61 @@
+import json
+import os
+import sqlite3
+
+from refiner.transformer.credit_statement_transformer import CreditStatementTransformer
+from refiner.utils.privacy import RELEASED_COLUMNS, PrivacyAccountant
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+
+def refine_with_noise(db_path: str, **accountant_options) -> tuple:
+    """Write the sample statement with noise, returning the noised rows and the privacy report."""
+    accountant = PrivacyAccountant(**accountant_options)
+    transformer = CreditStatementTransformer(db_path, accountant)
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        transformer.process(json.load(f))
+    transformer.apply_privacy()
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = [
+            connection.execute(f'SELECT * FROM {table} ORDER BY record_id').fetchall()
+            for table in ('financial_summaries', 'risk_metrics', 'spending_patterns')
+        ]
+    finally:
+        connection.close()
+    return rows, accountant.report()
+
+
+def test_seeded_noise_is_reproducible(tmp_path):
+    first, first_report = refine_with_noise(str(tmp_path / 'first.libsql'), seed=7)
+    second, second_report = refine_with_noise(str(tmp_path / 'second.libsql'), seed=7)
+    other, _ = refine_with_noise(str(tmp_path / 'other.libsql'), seed=8)
+
+    assert first == second
+    assert first_report == second_report
+    assert first_report['seeded']
+    assert first != other
+
+
+def test_noise_is_added_once(tmp_path):
+    db_path = str(tmp_path / 'db.libsql')
+    accountant = PrivacyAccountant(seed=7)
+    transformer = CreditStatementTransformer(db_path, accountant)
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        transformer.process(json.load(f))
+
+    assert accountant.apply_to_database(transformer.engine, transformer.get_tables())
+    with open(db_path, 'rb') as f:
+        noised = f.read()
+    assert not accountant.apply_to_database(transformer.engine, transformer.get_tables())
+    with open(db_path, 'rb') as f:
+        assert f.read() == noised
+
+
+def test_gaussian_delta_composes_across_columns(tmp_path):
+    _, report = refine_with_noise(str(tmp_path / 'db.libsql'), seed=7, mechanism='gaussian', delta=1e-5)
+
+    assert report['delta_per_column'] == 1e-5
+    assert report['delta'] == sum(entry['delta'] for entry in report['columns'])
+    assert report['delta'] == len(report['columns']) * 1e-5
+    assert report['epsilon_spent'] <= report['epsilon_budget'] * len(report['columns']) / RELEASED_COLUMNS + 1e-12
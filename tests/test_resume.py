@@ -0,0 +1,116 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+from functools import partial
+
+import pytest
+
+from refiner.config import settings
+from refiner.refine import Refiner
+from refiner.utils.checkpoint import CheckpointJournal
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+# Transactions per input file: small files are grouped, the largest is streamed
+TRANSACTION_COUNTS = [5, 3, 700, 5, 250, 4, 1500, 2]
+
+
+@pytest.fixture
+def input_dir(tmp_path, monkeypatch):
+    """Write statements whose transaction IDs overlap across files, so deduplication depends on write order."""
+    monkeypatch.setattr(settings, 'BATCH_SIZE', 100)
+    monkeypatch.setattr(settings, 'STREAMING_THRESHOLD_MB', 0.5)
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        statement = json.load(f)
+    sample_transactions = statement.pop('transactions')
+
+    path = tmp_path / 'input'
+    os.makedirs(path)
+    for i, transaction_count in enumerate(TRANSACTION_COUNTS):
+        transactions = [
+            {**sample_transactions[j % len(sample_transactions)], 'transaction_id': f"txn_{(i * 97 + j) % 1800}"}
+            for j in range(transaction_count)
+        ]
+        statement['statement_metadata']['record_id'] = f"record_{i}"
+        (path / f"statement_{i}.json").write_text(json.dumps({**statement, 'transactions': transactions}))
+    return str(path)
+
+
+def refine(input_dir, output_dir, resume=False):
+    os.makedirs(output_dir, exist_ok=True)
+    return Refiner(input_dir, str(output_dir), 'key', resume=resume).transform()
+
+
+def stored_rows(output_dir):
+    """Return the rows of every table, leaving out the time they were written."""
+    connection = sqlite3.connect(os.path.join(output_dir, 'db.libsql'))
+    try:
+        tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        rows = {}
+        for table in tables:
+            columns = [row[1] for row in connection.execute(f"PRAGMA table_info({table})") if row[1] != 'created_at']
+            rows[table] = sorted(connection.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall(), key=repr)
+        return rows
+    finally:
+        connection.close()
+
+
+def interrupt_after_files(monkeypatch, file_count):
+    """Make the run stop once file_count files are journaled as done."""
+    completed = []
+    complete_files = CheckpointJournal.complete_files
+
+    def interrupting_complete_files(self, details_by_file):
+        complete_files(self, details_by_file)
+        completed.extend(details_by_file)
+        if len(completed) >= file_count:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(CheckpointJournal, 'complete_files', interrupting_complete_files)
+    monkeypatch.setattr(
+        CheckpointJournal, 'complete_file',
+        lambda self, filename, **details: interrupting_complete_files(self, {filename: details})
+    )
+
+
+def interrupt_mid_file(monkeypatch, interrupted_filename):
+    """Make the run stop once the first transactions of a file written in several batches are committed."""
+    record_progress = CheckpointJournal.record_progress
+
+    def interrupting_record_progress(self, filename, offset, **details):
+        record_progress(self, filename, offset, **details)
+        if filename == interrupted_filename and offset:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(CheckpointJournal, 'record_progress', interrupting_record_progress)
+
+
+@pytest.mark.parametrize('workers', [
+    0,
+    pytest.param(2, marks=pytest.mark.skipif(
+        multiprocessing.get_start_method() != 'fork', reason="parse workers must see the test's settings"
+    )),
+])
+@pytest.mark.parametrize('interrupt', [
+    partial(interrupt_after_files, file_count=1),
+    partial(interrupt_after_files, file_count=5),
+    partial(interrupt_mid_file, interrupted_filename='statement_2.json'),
+    partial(interrupt_mid_file, interrupted_filename='statement_6.json'),
+], ids=['after 1 file', 'after 5 files', 'in batched file', 'in streamed file'])
+def test_resumed_run_matches_an_uninterrupted_run(tmp_path, monkeypatch, offline_ipfs, input_dir, workers, interrupt):
+    monkeypatch.setattr(settings, 'PARSE_WORKERS', workers)
+    expected = refine(input_dir, tmp_path / 'uninterrupted')
+
+    with monkeypatch.context() as interrupted:
+        interrupt(interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            refine(input_dir, tmp_path / 'resumed')
+    journal = CheckpointJournal(str(tmp_path / 'resumed' / 'checkpoint.json'), resume=True)
+    assert journal.has_progress
+
+    output = refine(input_dir, tmp_path / 'resumed', resume=True)
+
+    assert stored_rows(tmp_path / 'resumed') == stored_rows(tmp_path / 'uninterrupted')
+    assert output.statistics == expected.statistics
+    assert output.quality == expected.quality
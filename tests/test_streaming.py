@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from refiner.transformer.credit_statement_transformer import CreditStatementTransformer
+from refiner.transformer.statement_parser import StatementParser, StreamedTransactions
+from refiner.utils.quality import QualityGate
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+
+def large_statement(tmp_path, transaction_count, transactions_first=False):
+    """Write a statement with many transactions, optionally placing them before its metadata."""
+    with open(SAMPLE_STATEMENT, 'r') as f:
+        statement = json.load(f)
+    sample_transactions = statement.pop('transactions')
+    transactions = [
+        {**sample_transactions[i % len(sample_transactions)], 'transaction_id': f"txn_{i}"}
+        for i in range(transaction_count)
+    ]
+    statement = {'transactions': transactions, **statement} if transactions_first else {**statement, 'transactions': transactions}
+    path = tmp_path / 'statement.json'
+    path.write_text(json.dumps(statement))
+    return str(path)
+
+
+def stored_transactions(db_path):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute('SELECT * FROM transactions ORDER BY transaction_id').fetchall()
+    finally:
+        connection.close()
+
+
+def test_streamed_file_is_read_one_batch_at_a_time(tmp_path):
+    path = large_statement(tmp_path, 2500, transactions_first=True)
+    parser = StatementParser(QualityGate())
+
+    streamed = parser.parse_file(path, streaming=True)
+    loaded = parser.parse_file(path)
+
+    assert isinstance(streamed.transactions, StreamedTransactions)
+    assert len(streamed.transactions) == 2500
+    assert streamed.quality_report == loaded.quality_report
+    batches = [batch for batch, _ in parser.read_transactions(streamed, 0, lambda: 300)]
+    assert [len(batch) for batch in batches] == [300] * 8 + [100]
+    assert batches[0]['transaction_id'] == loaded.transactions['transaction_id'][:300]
+    assert batches[-1].columns == loaded.transactions.slice(2400, 2500).columns
+
+
+def test_streamed_file_writes_the_same_rows(tmp_path):
+    path = large_statement(tmp_path, 1200)
+    parser = StatementParser()
+
+    loaded = CreditStatementTransformer(str(tmp_path / 'loaded.libsql'))
+    loaded.process_prepared(parser.parse_file(path))
+    streamed = CreditStatementTransformer(str(tmp_path / 'streamed.libsql'))
+    commits = []
+    streamed.process_prepared(parser.parse_file(path, streaming=True), on_commit=commits.append)
+
+    assert stored_transactions(tmp_path / 'streamed.libsql') == stored_transactions(tmp_path / 'loaded.libsql')
+    assert commits[-1] == 1200 and len(commits) > 2
+
+
+def test_streamed_file_resumes_from_its_offset(tmp_path):
+    path = large_statement(tmp_path, 1200)
+    parser = StatementParser()
+    CreditStatementTransformer(str(tmp_path / 'loaded.libsql')).process_prepared(parser.parse_file(path))
+    db_path = str(tmp_path / 'db.libsql')
+
+    def interrupt_after_first_batch(offset):
+        if offset:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        CreditStatementTransformer(db_path).process_prepared(
+            parser.parse_file(path, streaming=True), on_commit=interrupt_after_first_batch
+        )
+    written = len(stored_transactions(db_path))
+    assert 0 < written < 1200
+
+    commits = []
+    resumed = CreditStatementTransformer(db_path, resume=True)
+    resumed.process_prepared(parser.parse_file(path, streaming=True), written, True, commits.append)
+
+    assert stored_transactions(db_path) == stored_transactions(tmp_path / 'loaded.libsql')
+    assert commits[-1] == 1200
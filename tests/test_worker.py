@@ -0,0 +1,32 @@
+import os
+import shutil
+import sqlite3
+
+from refiner.config import settings
+from refiner.models.job import RefinementJob
+from refiner.worker import RefinementWorker
+
+SAMPLE_STATEMENT = os.path.join(os.path.dirname(__file__), '..', 'input', 'credit_statement.json')
+
+
+def test_jobs_do_not_share_a_duplicate_filter(tmp_path, monkeypatch, offline_ipfs):
+    filter_path = tmp_path / 'seen.bloom'
+    monkeypatch.setattr(settings, 'DEDUP_FILTER_PATH', str(filter_path))
+    worker = RefinementWorker()
+
+    transactions = []
+    for user in ('user-1', 'user-2'):
+        input_dir = tmp_path / user / 'input'
+        os.makedirs(input_dir)
+        shutil.copy(SAMPLE_STATEMENT, input_dir)
+        output_dir = tmp_path / user / 'output'
+        output = worker.run_job(RefinementJob(
+            input_dir=str(input_dir), output_dir=str(output_dir), encryption_key='key', job_id=user
+        ))
+        assert output.deduplication['cross_run_duplicates'] == 0
+        connection = sqlite3.connect(output_dir / 'db.libsql')
+        transactions.append(connection.execute('SELECT COUNT(*) FROM transactions').fetchone()[0])
+        connection.close()
+
+    assert transactions[0] == transactions[1] > 0
+    assert not filter_path.exists()